@@ -37,13 +37,14 @@ class OrderFlowersIntent(IntentProperty):
     def initialize(self):
         self.name = "OrderFlowers"
         self.description = "Order Beautiful Flowers"
+        flower_type = FlowerTypeIntentSlot()
         self.sampleUtterances = [
-            "I would like to order {{{0}}}".format(FlowerTypeIntentSlot().name),
-            "I would like to order some {{{0}}}".format(FlowerTypeIntentSlot().name),
+            "I would like to order {{{0}}}".format(flower_type.name),
+            "I would like to order some {{{0}}}".format(flower_type.name),
         ]
         self.fulfillmentActivity.type = 'CodeHook'
         self.fulfillmentActivity.codeHook.messageVersion = '1.0'
-        self.add_slot(FlowerTypeIntentSlot())
+        self.add_slot(flower_type)
 
 
 class OrderFlowersBot(BotProperty):
@@ -1 +1,4 @@
-from props import IntentProperty, BotProperty, SlotProperty, IntentSlotProperty, AmazonSlotProperty
+from .props import IntentProperty, BotProperty, SlotProperty, IntentSlotProperty, AmazonSlotProperty
+from .concurrency import DeployError, DeployReport
+from .enumerations import EnumerationStore
+from .orchestrator import Orchestrator
@@ -0,0 +1,76 @@
+"""
+Support of the asyncio deploy API.
+
+boto3 calls block, so the coroutines of the API run them on a bounded thread pool shared by every event loop:
+
+    async def main():
+        aio.configure(max_workers=20)
+        await asyncio.gather(FlowersBot().create_async(), HotelBot().create_async(), other_work())
+
+    asyncio.run(main())
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_WORKERS = 10
+
+
+class BlockingExecutor(object):
+    """
+    Thread pool the blocking calls of the asyncio API run on, created on first use.
+    configure() applies to the pool created afterwards, calls already submitted finish on the old one
+
+    :param max_workers: blocking calls running at the same time, across every event loop
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def configure(self, max_workers):
+        with self._lock:
+            self.max_workers = max_workers
+            previous, self._executor = self._executor, None
+        if previous is not None:
+            previous.shutdown(wait=False)
+
+    def get(self):
+        """
+        :rtype: ThreadPoolExecutor
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='pylexbuilder')
+            return self._executor
+
+
+executor = BlockingExecutor()
+
+
+def configure(max_workers):
+    executor.configure(max_workers)
+
+
+async def run_blocking(function, *args, **kwargs):
+    """
+    Runs a blocking callable on the executor and waits for it without blocking the event loop
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor.get(), functools.partial(function, *args, **kwargs))
+
+
+def run(coroutine):
+    """
+    Runs a coroutine of the asyncio API to completion from synchronous code.
+    Coroutines already running in an event loop must await it instead
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    coroutine.close()
+    raise RuntimeError("Can't deploy synchronously from a running event loop, await the *_async method instead")
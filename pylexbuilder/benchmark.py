@@ -0,0 +1,375 @@
+"""
+Deploy benchmark against the in-process fake backend.
+
+    python -m pylexbuilder.benchmark --sizes 10 100 1000 --output results.json
+    python -m pylexbuilder.benchmark --sizes 10 100 --baseline results.json
+
+Synthetic bots of each size are built, serialized, packaged and deployed twice (the second deploy finds nothing
+changed). Every phase reports its wall time, the API calls it made and its peak memory, as JSON with sorted keys
+so two runs can be diffed or compared with --baseline.
+"""
+import argparse
+import contextlib
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from . import packaging, props, utils, waiters
+from .fake import FakeBackend
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (10, 100, 1000)
+BUILTIN_SLOT_TYPES = ('AMAZON.NUMBER', 'AMAZON.DATE', 'AMAZON.TIME', 'AMAZON.US_CITY')
+
+
+def alpha(number):
+    """
+    Lex names can't contain digits: 0 -> 'A', 25 -> 'Z', 26 -> 'BA'
+    """
+    letters = ''
+    while True:
+        number, remainder = divmod(number, 26)
+        letters = chr(ord('A') + remainder) + letters
+        if not number:
+            return letters
+
+
+def make_slot_type_class(index, enumeration_size):
+    name = 'BenchmarkType{}'.format(alpha(index))
+
+    def initialize(self):
+        self.name = name
+        self.load_enumerations(('{} value {}'.format(name, alpha(value)), ['{} synonym {}'.format(name, alpha(value))])
+                               for value in range(enumeration_size))
+
+    return type(name, (props.SlotProperty,), {'initialize': initialize})
+
+
+def make_slot_class(name, slot_type_class=None, builtin=None):
+    def initialize(self):
+        self.name = name
+        self.slotConstraint = 'Required'
+        if builtin:
+            self.slotType = builtin
+        super(slot_class, self).initialize()
+        self.add_prompt('What is the {}?'.format(name))
+
+    attributes = {'initialize': initialize}
+    if slot_type_class is not None:
+        attributes['SlotProperty'] = slot_type_class
+        slot_class = type(name, (props.IntentSlotProperty,), attributes)
+    else:
+        slot_class = type(name, (props.IntentSlotPropertyBase,), attributes)
+    return slot_class
+
+
+class BenchmarkIntent(props.IntentProperty):
+    def update_uri(self, lambda_arn):
+        self.fulfillmentActivity.codeHook.uri = lambda_arn
+
+    def is_lambda(self):
+        return self.fulfillmentActivity.type == 'CodeHook'
+
+
+def make_intent(index, slot_classes, utterance_count):
+    intent = BenchmarkIntent()
+    intent.name = 'BenchmarkIntent{}'.format(alpha(index))
+    intent.fulfillmentActivity.type = 'CodeHook'
+    intent.fulfillmentActivity.codeHook.messageVersion = '1.0'
+    slots = [slot_class() for slot_class in slot_classes]
+    for slot in slots:
+        intent.add_slot(slot)
+    references = ' '.join('{{{}}}'.format(slot.name) for slot in slots)
+    intent.generate_utterances(['{{I want|I would like|can I get}} {{the|a}} {} {{please|}} {}'.format(
+        intent.name, references)], limit=utterance_count)
+    return intent
+
+
+def make_bot_class(intent_count, max_slots=5, enumeration_size=50, utterances=10, slot_type_count=None,
+                   package_path=None, deploy_state_path=None, max_workers=1, seed=0):
+    """
+    :param max_slots: intents get between 0 and max_slots slots, half of them of custom slot types
+    :param slot_type_count: custom slot types shared by the intents, one per 10 intents by default
+    :return: a BotProperty subclass with intent_count intents
+    """
+    rng = random.Random(seed)
+    slot_type_classes = [make_slot_type_class(i, enumeration_size)
+                         for i in range(slot_type_count or max(1, intent_count // 10))]
+    intents = []
+    for i in range(intent_count):
+        slot_classes = []
+        for j in range(rng.randint(0, max_slots)):
+            name = 'Slot{}'.format(alpha(j))
+            if rng.random() < 0.5:
+                slot_classes.append(make_slot_class(name, slot_type_class=rng.choice(slot_type_classes)))
+            else:
+                slot_classes.append(make_slot_class(name, builtin=rng.choice(BUILTIN_SLOT_TYPES)))
+        intents.append(make_intent(i, slot_classes, utterances))
+
+    class BenchmarkBot(props.BotProperty):
+        class IntentMeta(props.BotProperty.IntentMeta):
+            pass
+
+        def initialize(self):
+            self.name = 'BenchmarkBot'
+            self.childDirected = False
+            self.abortStatement.add_message("Sorry, I couldn't understand")
+            self.clarificationPrompt.add_message('How can I help you?')
+
+        @property
+        def package_path(self):
+            return package_path
+
+        @property
+        def deploy_state_path(self):
+            return deploy_state_path
+
+        @property
+        def max_workers(self):
+            return max_workers
+
+    BenchmarkBot.IntentMeta.intents = intents
+    return BenchmarkBot
+
+
+def write_package(directory, file_count=100, file_size=16 * 1024, seed=0):
+    """
+    Lambda package of a handler and file_count modules of half random, half repetitive content
+    """
+    rng = random.Random(seed)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(os.path.join(directory, 'handler.py'), 'w') as handler:
+        handler.write('def index(event, context):\n    return {}\n')
+    for i in range(file_count):
+        module_directory = os.path.join(directory, 'lib', alpha(i % 10).lower())
+        if not os.path.exists(module_directory):
+            os.makedirs(module_directory)
+        random_part = bytearray(rng.getrandbits(8) for _ in range(file_size // 2))
+        with open(os.path.join(module_directory, 'module_{}.py'.format(i)), 'wb') as module:
+            module.write(bytes(random_part) + b'# padding\n' * (file_size // 20))
+
+
+def get_max_rss():
+    """
+    Peak resident memory of the process in bytes, None where unavailable
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+class _InstantTime(object):
+    """
+    Stand-in of the time module for the waiters: the fake backend settles after a number of polls, not seconds
+    """
+
+    @staticmethod
+    def sleep(seconds):
+        pass
+
+
+async def _no_sleep(seconds):
+    pass
+
+
+@contextlib.contextmanager
+def instant_waits():
+    original_time, original_sleep_async = waiters.time, waiters.sleep_async
+    waiters.time = _InstantTime()
+    waiters.sleep_async = _no_sleep
+    try:
+        yield
+    finally:
+        waiters.time, waiters.sleep_async = original_time, original_sleep_async
+
+
+@contextlib.contextmanager
+def isolated_caches():
+    """
+    Points the package manifest and the dependency cache to a fresh directory, so runs don't reuse each other's
+    work, and restores them on exit. The temp directory of the process is left alone
+    """
+    directory = tempfile.mkdtemp(prefix='pylexbuilder-benchmark-')
+    original_cache_dir, original_dependency_cache = packaging.cache_dir, utils.dependency_cache
+    packaging.cache_dir = os.path.join(directory, 'cache')
+    utils.dependency_cache = packaging.DependencyCache(os.path.join(packaging.cache_dir, 'dependencies'))
+    try:
+        yield directory
+    finally:
+        packaging.cache_dir, utils.dependency_cache = original_cache_dir, original_dependency_cache
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class Recorder(object):
+    """
+    Records the wall time, API calls and peak memory of the phases of a run
+    """
+
+    def __init__(self, backend, trace_memory=True):
+        self.backend = backend
+        self.trace_memory = trace_memory and tracemalloc is not None
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        calls_before = dict(self.backend.calls)
+        gc.collect()
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.time()
+        try:
+            yield
+        finally:
+            seconds = time.time() - start
+            peak = None
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            calls = {}
+            for (service, operation), count in self.backend.calls.items():
+                count -= calls_before.get((service, operation), 0)
+                if count:
+                    calls['{}.{}'.format(service, operation)] = count
+            self.phases[name] = {'seconds': round(seconds, 6), 'calls': calls,
+                                 'call_count': sum(calls.values()), 'peak_memory_bytes': peak}
+
+
+def run(intent_count, max_slots=5, enumeration_size=50, utterances=10, package_files=100, max_workers=1,
+        latency=0.0, seed=0, trace_memory=True):
+    """
+    :param trace_memory: measure the peak memory of every phase with tracemalloc (python 3), which slows them down
+    :return: results of the phases of one bot size
+    """
+    backend = FakeBackend(latency=latency, seed=seed)
+    recorder = Recorder(backend, trace_memory)
+    with isolated_caches() as directory, instant_waits():
+        backend.install()
+        try:
+            package_path = os.path.join(directory, 'package')
+            write_package(package_path, file_count=package_files, seed=seed)
+            deploy_state_path = os.path.join(directory, 'state', 'bot.json')
+
+            with recorder.phase('build'):
+                bot_class = make_bot_class(intent_count, max_slots=max_slots, enumeration_size=enumeration_size,
+                                           utterances=utterances, package_path=package_path,
+                                           deploy_state_path=deploy_state_path, max_workers=max_workers, seed=seed)
+                bot = bot_class()
+            with recorder.phase('serialize'):
+                for intent in bot.IntentMeta.intents:
+                    intent.to_primitive()
+                for slot_type in bot.get_slot_types().values():
+                    slot_type.to_primitive()
+                bot.to_primitive()
+            with recorder.phase('prepare_package'):
+                utils.prepare_python_package(package_path)
+            with recorder.phase('zip'):
+                zip_path = utils.zipdir(package_path)
+            with recorder.phase('hash'):
+                utils.hashfile(zip_path)
+            with recorder.phase('deploy'):
+                bot.create()
+            with recorder.phase('redeploy'):
+                bot_class().create()
+        finally:
+            backend.uninstall()
+
+    return {
+        'intents': intent_count,
+        'slots': sum(len(intent.slots) for intent in bot.IntentMeta.intents),
+        'slot_types': len(bot.get_slot_types()),
+        'enumeration_values': enumeration_size,
+        'max_workers': max_workers,
+        'latency': latency,
+        'phases': recorder.phases,
+        'total_seconds': round(sum(phase['seconds'] for phase in recorder.phases.values()), 6),
+        'max_rss_bytes': get_max_rss(),
+    }
+
+
+def run_all(sizes=DEFAULT_SIZES, **kwargs):
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': [run(size, **kwargs) for size in sizes],
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    :return: descriptions of the phases at least threshold (a fraction) slower, or making more calls, than baseline
+    """
+    regressions = []
+    baseline_results = {result['intents']: result for result in baseline['results']}
+    for result in current['results']:
+        previous = baseline_results.get(result['intents'])
+        if previous is None:
+            continue
+        for name, phase in sorted(result['phases'].items()):
+            old = previous['phases'].get(name)
+            if old is None:
+                continue
+            if phase['seconds'] > old['seconds'] * (1 + threshold) and phase['seconds'] - old['seconds'] > 0.01:
+                regressions.append('{} intents, {}: {:.3f}s -> {:.3f}s'.format(result['intents'], name,
+                                                                            old['seconds'], phase['seconds']))
+            if phase['call_count'] > old['call_count']:
+                regressions.append('{} intents, {}: {} -> {} calls'.format(result['intents'], name,
+                                                                         old['call_count'], phase['call_count']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='intents per bot')
+    parser.add_argument('--max-slots', type=int, default=5)
+    parser.add_argument('--enumeration-size', type=int, default=50)
+    parser.add_argument('--utterances', type=int, default=10)
+    parser.add_argument('--package-files', type=int, default=100)
+    parser.add_argument('--max-workers', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds every fake API call takes')
+    parser.add_argument('--no-memory', action='store_true', help="don't trace memory, for undisturbed timings")
+    parser.add_argument('--output', help='JSON file to write, stdout by default')
+    parser.add_argument('--baseline', help='JSON of a previous run to compare with, exits 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown reported as a regression')
+    args = parser.parse_args(argv)
+
+    results = run_all(args.sizes, max_slots=args.max_slots, enumeration_size=args.enumeration_size,
+                      utterances=args.utterances, package_files=args.package_files, max_workers=args.max_workers,
+                      latency=args.latency, trace_memory=not args.no_memory)
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        for regression in regressions:
+            sys.stderr.write('Regression: {}\n'.format(regression))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
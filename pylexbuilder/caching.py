@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+_clock = getattr(time, 'monotonic', time.time)
+
+
+def default_key(*args, **kwargs):
+    if kwargs:
+        return args, tuple(sorted(kwargs.items()))
+    return args
+
+
+class MemoCache(object):
+    """
+    Thread safe LRU cache with optional expiry, the storage behind memoize.
+
+    Concurrent callers of a key being computed wait for that computation instead of repeating it. Errors are
+    not cached.
+
+    :param maxsize: entries kept before the least recently used is evicted, None keeps everything
+    :param ttl: seconds an entry is valid for, None never expires
+    """
+
+    def __init__(self, maxsize=128, ttl=None, clock=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock or _clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        while True:
+            with self._lock:
+                entry = self._entries.pop(key, None)
+                if entry is not None and (entry[0] is None or entry[0] > self.clock()):
+                    self._entries[key] = entry
+                    self.hits += 1
+                    return entry[1]
+                pending = self._pending.get(key)
+                if pending is None:
+                    event = threading.Event()
+                    self._pending[key] = (threading.current_thread(), event)
+                    self.misses += 1
+                    break
+            owner, event = pending
+            if owner is threading.current_thread():
+                raise RuntimeError("Recursive call of a memoized function with key {!r}".format(key))
+            event.wait()
+
+        try:
+            value = compute()
+            with self._lock:
+                self._entries[key] = (self.clock() + self.ttl if self.ttl is not None else None, value)
+                while self.maxsize is not None and len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            return value
+        finally:
+            with self._lock:
+                del self._pending[key]
+            event.set()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def memoize(maxsize=128, ttl=None, key=None):
+    """
+    Caches the results of a function, see MemoCache.
+
+    :param key: callable with the function's signature returning the hashable cache key, the default uses the
+    arguments themselves. Also the way to make results depend on state outside the arguments, like the profile
+    :return: decorator; the decorated function gets cache, invalidate(*args, **kwargs) and cache_clear()
+    """
+    make_key = key or default_key
+
+    def decorator(function):
+        cache = MemoCache(maxsize=maxsize, ttl=ttl)
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            return cache.get_or_compute(make_key(*args, **kwargs), lambda: function(*args, **kwargs))
+
+        wrapper.cache = cache
+        wrapper.invalidate = lambda *args, **kwargs: cache.invalidate(make_key(*args, **kwargs))
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
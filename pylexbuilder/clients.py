@@ -0,0 +1,121 @@
+import threading
+
+import boto3
+from botocore.config import Config
+
+from . import instrumentation, transfer
+from .caching import memoize
+
+
+class ClientFactory(object):
+    """
+    Creates boto3 clients on first use and caches them per (service, region, profile).
+
+    Settings apply to clients created afterwards; configure() drops the cached clients so they are
+    recreated with the new settings.
+
+    :param region: default region, None uses the region of the boto3 session
+    :param profile: default profile, None uses the default credentials chain
+    :param max_pool_connections: connection pool size of every client, see pool_sizes for per service sizes
+    :param retry_mode: botocore retry mode ('legacy', 'standard' or 'adaptive'), None keeps botocore's default
+    :param max_attempts: botocore retry attempts, None keeps botocore's default
+    """
+
+    def __init__(self, region=None, profile=None, max_pool_connections=10, pool_sizes=None, retry_mode=None,
+                 max_attempts=None):
+        self.region = region
+        self.profile = profile
+        self.max_pool_connections = max_pool_connections
+        self.pool_sizes = pool_sizes or {}
+        self.retry_mode = retry_mode
+        self.max_attempts = max_attempts
+        self._sessions = {}
+        self._clients = {}
+        # boto3 sessions are not thread safe, clients are created under this lock
+        self._lock = threading.RLock()
+
+    def configure(self, **kwargs):
+        with self._lock:
+            for key, value in kwargs.items():
+                if not hasattr(self, key) or key.startswith('_'):
+                    raise TypeError("Unknown client setting '{}'".format(key))
+                setattr(self, key, value)
+            self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+            self._clients.clear()
+
+    def get_session(self, profile=None):
+        """
+        :rtype: boto3.session.Session
+        """
+        profile = profile or self.profile
+        with self._lock:
+            if profile not in self._sessions:
+                self._sessions[profile] = boto3.session.Session(profile_name=profile)
+            return self._sessions[profile]
+
+    def get_config(self, service):
+        retries = {}
+        if self.retry_mode:
+            retries['mode'] = self.retry_mode
+        if self.max_attempts is not None:
+            retries['max_attempts'] = self.max_attempts
+        return Config(max_pool_connections=self.pool_sizes.get(service, self.max_pool_connections),
+                      retries=retries or None)
+
+    def get_region(self, profile=None):
+        return self.region or self.get_session(profile).region_name
+
+    def get(self, service, region=None, profile=None):
+        """
+        :return: the cached client, recording its calls while an instrumentation.Tracer is installed
+        """
+        key = (service, region or self.region, profile or self.profile)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self.get_session(profile).client(service, region_name=region or self.region,
+                                                              config=self.get_config(service))
+                    self._clients[key] = client
+        return instrumentation.instrument(client, service)
+
+    def set(self, service, client, region=None, profile=None):
+        """
+        Uses the given client for a service, e.g. a stub in tests
+        """
+        with self._lock:
+            self._clients[(service, region or self.region, profile or self.profile)] = client
+
+
+# s3 needs a connection per concurrent multipart part
+factory = ClientFactory(pool_sizes={'s3': transfer.MAX_CONCURRENCY})
+
+
+def get_client(service, region=None, profile=None):
+    return factory.get(service, region, profile)
+
+
+@memoize(maxsize=8, key=lambda: (factory.region, factory.profile))
+def get_region():
+    return factory.get_region()
+
+
+class LazyClient(object):
+    """
+    Module level client that resolves to the factory's client for the current settings on every use,
+    so nothing is created at import time
+    """
+
+    def __init__(self, service):
+        self._service = service
+
+    def __getattr__(self, name):
+        return getattr(factory.get(self._service), name)
+
+    def __repr__(self):
+        return '<LazyClient {}>'.format(self._service)
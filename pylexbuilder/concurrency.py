@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceResult(object):
+    def __init__(self, kind, name, value=None, error=None):
+        self.kind = kind
+        self.name = name
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = 'ok' if self.ok else 'failed: {!r}'.format(self.error)
+        return '<ResourceResult {} {} {}>'.format(self.kind, self.name, status)
+
+
+class DeployError(Exception):
+    def __init__(self, report):
+        self.report = report
+        failures = ', '.join('{} {}'.format(result.kind, result.name) for result in report.failures)
+        super(DeployError, self).__init__("Failed to deploy: {}".format(failures))
+
+
+class DeployReport(object):
+    """
+    Per resource outcome of a deploy. Every task adds exactly one ResourceResult, successful or not,
+    so a failure of one resource never hides the outcome of the others.
+    """
+
+    def __init__(self):
+        self.results = []
+        """ :type : list[ResourceResult] """
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        with self._lock:
+            self.results.append(result)
+        return result
+
+    def get(self, kind, name):
+        for result in self.results:
+            if result.kind == kind and result.name == name:
+                return result
+
+    @property
+    def failures(self):
+        return [result for result in self.results if not result.ok]
+
+    def failed_names(self, kind):
+        return set(result.name for result in self.failures if result.kind == kind)
+
+    def raise_for_failures(self):
+        if self.failures:
+            raise DeployError(self)
+
+
+def _run_task(kind, name, function):
+    try:
+        with instrumentation.span(kind, 'task', resource=name):
+            return ResourceResult(kind, name, value=function())
+    except Exception as e:
+        logger.warning("Failed to deploy {} {}".format(kind, name), exc_info=1)
+        return ResourceResult(kind, name, error=e)
+
+
+def run_tasks(tasks, max_workers=1, report=None):
+    """
+    Run independent deploy tasks and collect one result per task.
+
+    :param tasks: iterable of (kind, name, callable) tuples
+    :param max_workers: size of the worker pool, 1 runs the tasks serially in the calling thread
+    :type report: DeployReport
+    :rtype: DeployReport
+    """
+    report = report if report is not None else DeployReport()
+    tasks = list(tasks)
+    if max_workers <= 1 or len(tasks) <= 1:
+        for kind, name, function in tasks:
+            report.add(_run_task(kind, name, function))
+        return report
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+        futures = [executor.submit(_run_task, kind, name, function) for kind, name, function in tasks]
+        for future in futures:
+            report.add(future.result())
+    return report
+
+
+async def _run_task_async(kind, name, coroutine_function, semaphore):
+    async with semaphore:
+        try:
+            with instrumentation.span(kind, 'task', resource=name):
+                return ResourceResult(kind, name, value=await coroutine_function())
+        except Exception as e:
+            logger.warning("Failed to deploy {} {}".format(kind, name), exc_info=1)
+            return ResourceResult(kind, name, error=e)
+
+
+async def run_tasks_async(tasks, max_workers=1, report=None):
+    """
+    run_tasks of the asyncio API.
+
+    :param tasks: iterable of (kind, name, coroutine function) tuples
+    :param max_workers: tasks running at the same time
+    :type report: DeployReport
+    :rtype: DeployReport
+    """
+    report = report if report is not None else DeployReport()
+    semaphore = asyncio.Semaphore(max(max_workers, 1))
+    results = await asyncio.gather(*[_run_task_async(kind, name, coroutine_function, semaphore)
+                                     for kind, name, coroutine_function in tasks])
+    for result in results:
+        report.add(result)
+    return report
@@ -0,0 +1,130 @@
+import csv
+import json
+import os
+
+
+def read_csv(path, encoding='utf-8', header=False):
+    """
+    Yields (value, synonyms) rows of a CSV file whose first column is the value and the other columns synonyms
+    """
+    with open(path, newline='', encoding=encoding) as csv_file:
+        rows = csv.reader(csv_file)
+        if header:
+            next(rows, None)
+        for row in rows:
+            cells = [cell.strip() for cell in row]
+            if cells and cells[0]:
+                yield cells[0], [cell for cell in cells[1:] if cell]
+
+
+def read_jsonl(path, encoding='utf-8'):
+    """
+    Yields the enumerations of a JSON lines file, one value per line:
+    either a string or {"value": "string", "synonyms": ["string"]}
+    """
+    with open(path, encoding=encoding) as jsonl_file:
+        for line in jsonl_file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_file(path, **kwargs):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return read_csv(path, **kwargs)
+    if extension in ('.jsonl', '.ndjson'):
+        return read_jsonl(path, **kwargs)
+    raise ValueError("Can't load enumerations from {}, expected a .csv or .jsonl file".format(path))
+
+
+class EnumerationStore(object):
+    """
+    Slot type enumeration values kept as parallel lists, deduplicated as they are added.
+    Synonyms of a value added again are merged into the first one.
+    Nothing is converted to the put_slot_type format until to_primitive()
+    """
+
+    def __init__(self, enumerations=None):
+        self._values = []
+        self._synonyms = []
+        self._index = {}
+        if enumerations is not None:
+            self.extend(enumerations)
+
+    def add(self, value, synonyms=None):
+        position = self._index.get(value)
+        if position is None:
+            self._index[value] = len(self._values)
+            self._values.append(value)
+            self._synonyms.append(self._unique_synonyms(value, synonyms, ()) if synonyms else None)
+        elif synonyms:
+            existing = self._synonyms[position] or ()
+            new_synonyms = self._unique_synonyms(value, synonyms, existing)
+            if new_synonyms:
+                self._synonyms[position] = existing + new_synonyms
+        return self
+
+    @staticmethod
+    def _unique_synonyms(value, synonyms, existing):
+        seen = set(existing)
+        seen.add(value)
+        unique = []
+        for synonym in synonyms:
+            if synonym not in seen:
+                seen.add(synonym)
+                unique.append(synonym)
+        return tuple(unique)
+
+    def extend(self, enumerations):
+        """
+        :param enumerations: iterable of values, (value, synonyms) pairs or {'value': ..., 'synonyms': [...]} dicts,
+        consumed lazily so generators of any size are fine
+        """
+        add = self.add
+        for enumeration in enumerations:
+            if isinstance(enumeration, dict):
+                add(enumeration['value'], enumeration.get('synonyms'))
+            elif isinstance(enumeration, (tuple, list)):
+                add(enumeration[0], enumeration[1] if len(enumeration) > 1 else None)
+            else:
+                add(enumeration)
+        return self
+
+    def load(self, source, **kwargs):
+        """
+        :param source: path of a .csv or .jsonl file, see read_csv and read_jsonl, or an iterable for extend
+        """
+        if isinstance(source, str):
+            return self.extend(read_file(source, **kwargs))
+        return self.extend(source)
+
+    def get_synonyms(self, value):
+        position = self._index.get(value)
+        if position is None:
+            raise KeyError(value)
+        return list(self._synonyms[position] or ())
+
+    def __contains__(self, value):
+        return value in self._index
+
+    def __len__(self):
+        return len(self._values)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def to_primitive(self, exclude=()):
+        """
+        :param exclude: values already defined elsewhere
+        :return: the enumerationValues of put_slot_type
+        """
+        primitive = []
+        for value, synonyms in zip(self._values, self._synonyms):
+            if value in exclude:
+                continue
+            if synonyms:
+                primitive.append({'value': value, 'synonyms': list(synonyms)})
+            else:
+                primitive.append({'value': value})
+        return primitive
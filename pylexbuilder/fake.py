@@ -0,0 +1,681 @@
+"""
+In-process stand-ins of the AWS clients pylexbuilder uses, to deploy without network nor credentials.
+
+    backend = FakeBackend(latency=0.05, throttle_rate=0.01)
+    backend.install()
+    OrderFlowersBot().create()
+    print(backend.calls)
+
+The fakes keep the state of lex-models, cloudformation, s3, lambda and sts in memory and follow the service
+semantics pylexbuilder depends on: checksums of $LATEST, numbered versions, the defaults Lex fills in, versions
+that can't be deleted while something uses them, bot builds and stack and change set operations that stay in
+progress for a few polls, and throttling. Every call can be slowed down by a fixed latency, per service or per
+operation, so deploy throughput can be measured and profiled offline.
+"""
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from botocore.exceptions import ClientError
+
+ACCOUNT = '123456789012'
+REGION = 'us-east-1'
+SERVICES = ('lex-models', 'cloudformation', 's3', 'lambda', 'sts')
+
+
+def client_error(code, message, operation_name, status_code=400):
+    return ClientError({'Error': {'Code': code, 'Message': message},
+                        'ResponseMetadata': {'HTTPStatusCode': status_code}}, operation_name)
+
+
+def new_checksum():
+    return uuid.uuid4().hex
+
+
+def paginate_list(items, key, maxResults=None, nextToken=None, **response):
+    start = int(nextToken or 0)
+    end = start + (maxResults or 50)
+    response[key] = items[start:end]
+    if end < len(items):
+        response['nextToken'] = str(end)
+    return response
+
+
+class FakeBackend(object):
+    """
+    :param latency: seconds every call takes
+    :param latencies: seconds per service ('lex-models') or operation ('lex-models.put_intent'), over latency
+    :param throttle_rate: probability of a call failing with a throttling error
+    :param max_concurrent_calls: calls a service serves at the same time, the others are throttled. None is unbounded
+    :param pending_polls: describe/get calls a build, stack or change set operation stays in progress for
+    :param seed: seed of the throttling
+    """
+
+    def __init__(self, latency=0.0, latencies=None, throttle_rate=0.0, max_concurrent_calls=None, pending_polls=2,
+                 seed=None, account=ACCOUNT, region=REGION, sleep=None):
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.throttle_rate = throttle_rate
+        self.max_concurrent_calls = max_concurrent_calls
+        self.pending_polls = pending_polls
+        self.account = account
+        self.region = region
+        self.sleep = sleep
+        self.calls = Counter()
+        self.throttled = Counter()
+        self.lock = threading.RLock()
+        self._random = random.Random(seed)
+        self._in_flight = Counter()
+        self.clients = {
+            'lex-models': FakeLexModels(self),
+            'cloudformation': FakeCloudFormation(self),
+            's3': FakeS3(self),
+            'lambda': FakeLambda(self),
+            'sts': FakeSTS(self),
+        }
+        self._previous_region = None
+
+    def get_client(self, service):
+        return self.clients[service]
+
+    def install(self, factory=None):
+        """
+        Makes the client factory hand out the fakes
+        :type factory: clients.ClientFactory
+        """
+        from . import clients, utils
+        factory = factory or clients.factory
+        self._previous_region = factory.region
+        factory.configure(region=self.region)
+        for service, client in self.clients.items():
+            factory.set(service, client)
+        utils.get_account_number.cache_clear()
+        utils.get_stack_output_dict.cache_clear()
+        return self
+
+    def uninstall(self, factory=None):
+        from . import clients, utils
+        factory = factory or clients.factory
+        factory.configure(region=self._previous_region)
+        utils.get_account_number.cache_clear()
+        utils.get_stack_output_dict.cache_clear()
+
+    def get_latency(self, service, operation):
+        return self.latencies.get('{}.{}'.format(service, operation), self.latencies.get(service, self.latency))
+
+    def call(self, service, operation, function, *args, **kwargs):
+        """
+        Runs one API call: counts it, throttles it and waits its latency
+        """
+        with self.lock:
+            self.calls[(service, operation)] += 1
+            throttled = self.throttle_rate and self._random.random() < self.throttle_rate
+            if self.max_concurrent_calls is not None and self._in_flight[service] >= self.max_concurrent_calls:
+                throttled = True
+            if throttled:
+                self.throttled[(service, operation)] += 1
+            else:
+                self._in_flight[service] += 1
+        if throttled:
+            code = 'LimitExceededException' if service == 'lex-models' else 'Throttling'
+            raise client_error(code, 'Rate exceeded', operation, 429)
+        try:
+            latency = self.get_latency(service, operation)
+            if latency:
+                (self.sleep or time.sleep)(latency)
+            with self.lock:
+                return function(*args, **kwargs)
+        finally:
+            with self.lock:
+                self._in_flight[service] -= 1
+
+    def count(self, service=None, operation=None):
+        return sum(count for (call_service, call_operation), count in self.calls.items()
+                   if service in (None, call_service) and operation in (None, call_operation))
+
+
+class FakeClient(object):
+    """
+    Routes public method calls through FakeBackend.call
+    """
+    service = None
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattribute__(self, name):
+        attribute = object.__getattribute__(self, name)
+        if name.startswith('_') or not callable(attribute) or name in ('service', 'backend'):
+            return attribute
+        backend = object.__getattribute__(self, 'backend')
+        return lambda *args, **kwargs: backend.call(self.service, name, attribute, *args, **kwargs)
+
+
+class PendingStatus(object):
+    """
+    Status that stays pending for a number of reads before settling
+    """
+
+    def __init__(self, pending, final, polls):
+        self.pending = pending
+        self.final = final
+        self.polls_left = polls
+
+    def read(self):
+        if self.polls_left > 0:
+            self.polls_left -= 1
+            return self.pending
+        return self.final
+
+
+class FakeLexModels(FakeClient):
+    service = 'lex-models'
+
+    kinds = {
+        'slot_type': ('SlotType', 'slotTypes'),
+        'intent': ('Intent', 'intents'),
+        'bot': ('Bot', 'bots'),
+    }
+
+    # Fields Lex fills in when a put leaves them out
+    defaults = {
+        'slot_type': {'valueSelectionStrategy': 'ORIGINAL_VALUE'},
+        'intent': {'sampleUtterances': []},
+        'bot': {'idleSessionTTLInSeconds': 300, 'detectSentiment': False, 'enableModelImprovements': True},
+    }
+    # Put arguments Lex acts on but doesn't store
+    put_only = ('processBehavior', 'createVersion')
+
+    def __init__(self, backend):
+        super(FakeLexModels, self).__init__(backend)
+        # kind -> name -> {'$LATEST': resource, '1': resource, ...}
+        self._resources = {kind: {} for kind in self.kinds}
+        self._aliases = {}
+        self._builds = {}
+
+    # Generic resources
+
+    def _get(self, kind, name, version, operation):
+        versions = self._resources[kind].get(name)
+        if not versions or version not in versions:
+            raise client_error('NotFoundException', 'The {} {} version {} does not exist'.format(
+                self.kinds[kind][0], name, version), operation, 404)
+        return versions[version]
+
+    def _put(self, kind, operation, name, checksum=None, **fields):
+        versions = self._resources[kind].setdefault(name, {})
+        latest = versions.get('$LATEST')
+        if latest is not None and checksum != latest['checksum']:
+            raise client_error('PreconditionFailedException', 'The checksum of {} {} does not match'.format(
+                self.kinds[kind][0], name), operation, 412)
+        if latest is None and checksum is not None:
+            raise client_error('PreconditionFailedException', "{} {} doesn't exist, it can't have a checksum".format(
+                self.kinds[kind][0], name), operation, 412)
+        now = datetime.utcnow()
+        fields = dict(self.defaults[kind], **{key: value for key, value in fields.items()
+                                              if key not in self.put_only})
+        resource = dict(fields, name=name, version='$LATEST', checksum=new_checksum(), lastUpdatedDate=now,
+                        createdDate=latest['createdDate'] if latest else now)
+        versions['$LATEST'] = resource
+        return dict(resource)
+
+    def _create_version(self, kind, operation, name, checksum=None):
+        latest = self._get(kind, name, '$LATEST', operation)
+        if checksum is not None and checksum != latest['checksum']:
+            raise client_error('PreconditionFailedException', 'The checksum of {} {} does not match'.format(
+                self.kinds[kind][0], name), operation, 412)
+        versions = self._resources[kind][name]
+        numbers = sorted(int(version) for version in versions if version != '$LATEST')
+        if numbers and self._content(versions[str(numbers[-1])]) == self._content(latest):
+            return dict(versions[str(numbers[-1])])
+        version = str(numbers[-1] + 1 if numbers else 1)
+        versions[version] = dict(latest, version=version, checksum=new_checksum())
+        return dict(versions[version])
+
+    @staticmethod
+    def _content(resource):
+        return {key: value for key, value in resource.items()
+                if key not in ('version', 'checksum', 'lastUpdatedDate', 'createdDate', 'status')}
+
+    def _list(self, kind, key, maxResults=None, nextToken=None, nameContains=None):
+        items = [{'name': name, 'version': '$LATEST', 'description': versions['$LATEST'].get('description'),
+                  'lastUpdatedDate': versions['$LATEST']['lastUpdatedDate'],
+                  'createdDate': versions['$LATEST']['createdDate']}
+                 for name, versions in sorted(self._resources[kind].items())
+                 if '$LATEST' in versions and (not nameContains or nameContains in name)]
+        return paginate_list(items, key, maxResults, nextToken)
+
+    def _list_versions(self, kind, key, name, maxResults=None, nextToken=None):
+        versions = self._resources[kind].get(name, {})
+        ordered = sorted(versions, key=lambda version: -1 if version == '$LATEST' else int(version))
+        items = [{'name': name, 'version': version, 'lastUpdatedDate': versions[version]['lastUpdatedDate'],
+                  'createdDate': versions[version]['createdDate']} for version in ordered]
+        return paginate_list(items, key, maxResults, nextToken)
+
+    def _is_used(self, kind, name, version):
+        """
+        Whether a version of an intent (slot type) is referenced by a version of a bot (intent)
+        """
+        if kind == 'intent':
+            user_kind, key, name_key, version_key = 'bot', 'intents', 'intentName', 'intentVersion'
+        elif kind == 'slot_type':
+            user_kind, key, name_key, version_key = 'intent', 'slots', 'slotType', 'slotTypeVersion'
+        else:
+            return False
+        return any(item.get(name_key) == name and item.get(version_key) == version
+                   for versions in self._resources[user_kind].values() for resource in versions.values()
+                   for item in resource.get(key) or ())
+
+    def _delete_version(self, kind, operation, name, version):
+        self._get(kind, name, version, operation)
+        if version == '$LATEST':
+            raise client_error('BadRequestException', 'Delete $LATEST with the delete call of the resource',
+                               operation)
+        if self._is_used(kind, name, version):
+            raise client_error('ResourceInUseException', '{} {} version {} is in use'.format(
+                self.kinds[kind][0], name, version), operation)
+        del self._resources[kind][name][version]
+        return {}
+
+    # Slot types
+
+    def put_slot_type(self, name, **kwargs):
+        if 'enumerationValues' in kwargs:
+            kwargs['enumerationValues'] = [dict({'synonyms': []}, **value) for value in kwargs['enumerationValues']]
+        return self._put('slot_type', 'PutSlotType', name, **kwargs)
+
+    def get_slot_type(self, name, version):
+        return dict(self._get('slot_type', name, version, 'GetSlotType'))
+
+    def create_slot_type_version(self, name, checksum=None):
+        return self._create_version('slot_type', 'CreateSlotTypeVersion', name, checksum)
+
+    def get_slot_types(self, **kwargs):
+        return self._list('slot_type', 'slotTypes', **kwargs)
+
+    def get_slot_type_versions(self, name, **kwargs):
+        return self._list_versions('slot_type', 'slotTypes', name, **kwargs)
+
+    def delete_slot_type_version(self, name, version):
+        return self._delete_version('slot_type', 'DeleteSlotTypeVersion', name, version)
+
+    # Intents
+
+    def put_intent(self, name, **kwargs):
+        for slot in kwargs.get('slots', []):
+            if not slot.get('slotType', '').startswith('AMAZON.'):
+                self._get('slot_type', slot['slotType'], slot.get('slotTypeVersion', '$LATEST'), 'PutIntent')
+        if 'slots' in kwargs:
+            kwargs['slots'] = [dict({'priority': i + 1, 'obfuscationSetting': 'NONE', 'sampleUtterances': []}, **slot)
+                               for i, slot in enumerate(kwargs['slots'])]
+        return self._put('intent', 'PutIntent', name, **kwargs)
+
+    def get_intent(self, name, version):
+        return dict(self._get('intent', name, version, 'GetIntent'))
+
+    def create_intent_version(self, name, checksum=None):
+        return self._create_version('intent', 'CreateIntentVersion', name, checksum)
+
+    def get_intents(self, **kwargs):
+        return self._list('intent', 'intents', **kwargs)
+
+    def get_intent_versions(self, name, **kwargs):
+        return self._list_versions('intent', 'intents', name, **kwargs)
+
+    def delete_intent_version(self, name, version):
+        return self._delete_version('intent', 'DeleteIntentVersion', name, version)
+
+    # Bots
+
+    def _start_build(self, name, version, process_behavior='BUILD'):
+        if process_behavior == 'BUILD':
+            self._builds[(name, version)] = PendingStatus('BUILDING', 'READY', self.backend.pending_polls)
+        else:
+            self._builds[(name, version)] = PendingStatus('NOT_BUILT', 'NOT_BUILT', 0)
+
+    def _get_bot(self, name, version_or_alias, operation):
+        alias = self._aliases.get((name, version_or_alias))
+        version = alias['botVersion'] if alias else version_or_alias
+        bot = dict(self._get('bot', name, version, operation))
+        build = self._builds.get((name, version))
+        bot['status'] = build.read() if build else 'READY'
+        return bot
+
+    def put_bot(self, name, **kwargs):
+        for intent in kwargs.get('intents', []):
+            try:
+                self._get('intent', intent['intentName'], intent['intentVersion'], 'PutBot')
+            except ClientError:
+                raise client_error('BadRequestException', 'Intent {} version {} does not exist'.format(
+                    intent['intentName'], intent['intentVersion']), 'PutBot')
+        response = self._put('bot', 'PutBot', name, **kwargs)
+        self._start_build(name, '$LATEST', kwargs.get('processBehavior', 'BUILD'))
+        return dict(response, status=self._builds[(name, '$LATEST')].read())
+
+    def get_bot(self, name, versionOrAlias):
+        return self._get_bot(name, versionOrAlias, 'GetBot')
+
+    def create_bot_version(self, name, checksum=None):
+        response = self._create_version('bot', 'CreateBotVersion', name, checksum)
+        if (name, response['version']) not in self._builds:
+            self._start_build(name, response['version'])
+        return dict(response, status=self._builds[(name, response['version'])].read())
+
+    def get_bots(self, **kwargs):
+        return self._list('bot', 'bots', **kwargs)
+
+    def get_bot_versions(self, name, **kwargs):
+        return self._list_versions('bot', 'bots', name, **kwargs)
+
+    def delete_bot_version(self, name, version):
+        if any(alias['botVersion'] == version for (bot_name, _), alias in self._aliases.items() if bot_name == name):
+            raise client_error('ResourceInUseException', 'Version {} of bot {} is used by an alias'.format(
+                version, name), 'DeleteBotVersion')
+        return self._delete_version('bot', 'DeleteBotVersion', name, version)
+
+    # Aliases
+
+    def put_bot_alias(self, name, botName, botVersion, checksum=None, **kwargs):
+        self._get('bot', botName, botVersion, 'PutBotAlias')
+        existing = self._aliases.get((botName, name))
+        if (existing and checksum != existing['checksum']) or (not existing and checksum is not None):
+            raise client_error('PreconditionFailedException', 'The checksum of alias {} does not match'.format(name),
+                               'PutBotAlias', 412)
+        now = datetime.utcnow()
+        alias = dict(kwargs, name=name, botName=botName, botVersion=botVersion, checksum=new_checksum(),
+                     lastUpdatedDate=now, createdDate=existing['createdDate'] if existing else now)
+        self._aliases[(botName, name)] = alias
+        return dict(alias)
+
+    def get_bot_alias(self, name, botName):
+        alias = self._aliases.get((botName, name))
+        if alias is None:
+            raise client_error('NotFoundException', 'Alias {} of bot {} does not exist'.format(name, botName),
+                               'GetBotAlias', 404)
+        return dict(alias)
+
+    def get_bot_aliases(self, botName, maxResults=None, nextToken=None, nameContains=None):
+        items = [dict(alias) for (bot_name, name), alias in sorted(self._aliases.items())
+                 if bot_name == botName and (not nameContains or nameContains in name)]
+        return paginate_list(items, 'BotAliases', maxResults, nextToken)
+
+
+class FakeStackWaiter(object):
+    def __init__(self, client, success_status):
+        self.client = client
+        self.success_status = success_status
+
+    def wait(self, StackName, WaiterConfig=None):
+        config = WaiterConfig or {}
+        for _ in range(config.get('MaxAttempts', 120)):
+            stack = self.client.describe_stacks(StackName=StackName)['Stacks'][0]
+            if stack['StackStatus'] == self.success_status:
+                return
+            if not stack['StackStatus'].endswith('_IN_PROGRESS'):
+                raise Exception('Waiter encountered a terminal failure state: {}'.format(stack['StackStatus']))
+        raise Exception('Max attempts exceeded')
+
+
+class FakeCloudFormation(FakeClient):
+    service = 'cloudformation'
+
+    def __init__(self, backend):
+        super(FakeCloudFormation, self).__init__(backend)
+        self._stacks = {}
+        self._operations = {}
+        self._change_sets = {}
+
+    def _get_stack(self, name, operation):
+        stack = self._stacks.get(name)
+        if stack is None:
+            raise client_error('ValidationError', 'Stack with id {} does not exist'.format(name), operation)
+        return stack
+
+    def _read_template(self, TemplateBody=None, TemplateURL=None, operation=None):
+        if TemplateURL:
+            bucket, key = TemplateURL.split('://', 1)[1].split('.s3.amazonaws.com/', 1)
+            TemplateBody = self.backend.clients['s3']._get_body(bucket, key, operation).decode('utf-8')
+        try:
+            return json.loads(TemplateBody)
+        except ValueError:
+            raise client_error('ValidationError', 'Template format error: JSON not well-formed', operation)
+
+    def _describe(self, stack):
+        operation = self._operations.get(stack['StackName'])
+        if operation is not None:
+            stack['StackStatus'] = operation.read()
+            if operation.polls_left == 0 and stack['StackStatus'] == operation.final:
+                del self._operations[stack['StackName']]
+        description = {key: value for key, value in stack.items() if key not in ('Template', 'Resources')}
+        description['Outputs'] = [dict(output) for output in stack['Outputs']]
+        return description
+
+    def describe_stacks(self, StackName=None, NextToken=None):
+        if StackName is None:
+            return {'Stacks': [self._describe(stack) for _, stack in sorted(self._stacks.items())]}
+        return {'Stacks': [self._describe(self._get_stack(StackName, 'DescribeStacks'))]}
+
+    def list_stacks(self, StackStatusFilter=None, NextToken=None):
+        summaries = [{'StackName': name, 'StackId': stack['StackId'], 'StackStatus': stack['StackStatus'],
+                      'CreationTime': stack['CreationTime']} for name, stack in sorted(self._stacks.items())
+                     if not StackStatusFilter or stack['StackStatus'] in StackStatusFilter]
+        start = int(NextToken or 0)
+        response = {'StackSummaries': summaries[start:start + 100]}
+        if start + 100 < len(summaries):
+            response['NextToken'] = str(start + 100)
+        return response
+
+    def validate_template(self, **kwargs):
+        template = self._read_template(operation='ValidateTemplate', **kwargs)
+        return {'Parameters': [{'ParameterKey': key} for key in template.get('Parameters', {})],
+                'Description': template.get('Description', '')}
+
+    def get_template(self, StackName, TemplateStage='Original', ChangeSetName=None):
+        stack = self._get_stack(StackName, 'GetTemplate')
+        return {'TemplateBody': stack['Template'], 'StagesAvailable': ['Original', 'Processed']}
+
+    def describe_stack_resource(self, StackName, LogicalResourceId):
+        stack = self._get_stack(StackName, 'DescribeStackResource')
+        if LogicalResourceId not in stack['Resources']:
+            raise client_error('ValidationError', 'Resource {} does not exist for stack {}'.format(
+                LogicalResourceId, StackName), 'DescribeStackResource')
+        return {'StackResourceDetail': dict(stack['Resources'][LogicalResourceId], StackName=StackName,
+                                            LogicalResourceId=LogicalResourceId)}
+
+    def _new_stack(self, name, status):
+        stack = {'StackName': name, 'StackStatus': status, 'CreationTime': datetime.utcnow(), 'Outputs': [],
+                 'StackId': 'arn:aws:cloudformation:{}:{}:stack/{}/{}'.format(
+                     self.backend.region, self.backend.account, name, uuid.uuid4()),
+                 'Template': None, 'Resources': {}}
+        self._stacks[name] = stack
+        return stack
+
+    def _apply(self, stack, template, action):
+        stack['Template'] = template
+        resources = {}
+        for logical_id, resource in template.get('Resources', {}).items():
+            previous = stack['Resources'].get(logical_id)
+            resources[logical_id] = previous or {
+                'PhysicalResourceId': '{}-{}-{}'.format(stack['StackName'], logical_id, uuid.uuid4().hex[:12]),
+                'ResourceType': resource.get('Type'), 'ResourceStatus': '{}_COMPLETE'.format(action)}
+        stack['Resources'] = resources
+        stack['Outputs'] = [{'OutputKey': key, 'OutputValue': output['Value']}
+                            for key, output in template.get('Outputs', {}).items()
+                            if not isinstance(output.get('Value'), dict)]
+        stack['StackStatus'] = '{}_IN_PROGRESS'.format(action)
+        self._operations[stack['StackName']] = PendingStatus('{}_IN_PROGRESS'.format(action),
+                                                             '{}_COMPLETE'.format(action), self.backend.pending_polls)
+
+    def create_stack(self, StackName, TemplateBody=None, TemplateURL=None, **kwargs):
+        if StackName in self._stacks:
+            raise client_error('AlreadyExistsException', 'Stack [{}] already exists'.format(StackName), 'CreateStack')
+        template = self._read_template(TemplateBody, TemplateURL, 'CreateStack')
+        stack = self._new_stack(StackName, 'CREATE_IN_PROGRESS')
+        self._apply(stack, template, 'CREATE')
+        return {'StackId': stack['StackId']}
+
+    def create_change_set(self, StackName, ChangeSetName, ChangeSetType='UPDATE', TemplateBody=None,
+                          TemplateURL=None, **kwargs):
+        template = self._read_template(TemplateBody, TemplateURL, 'CreateChangeSet')
+        stack = self._stacks.get(StackName)
+        if ChangeSetType == 'CREATE':
+            if stack is not None and stack['StackStatus'] != 'REVIEW_IN_PROGRESS':
+                raise client_error('ValidationError', 'Stack [{}] already exists and cannot be created again with '
+                                                      'the changeSet [{}].'.format(StackName, ChangeSetName),
+                                   'CreateChangeSet')
+            stack = stack or self._new_stack(StackName, 'REVIEW_IN_PROGRESS')
+        else:
+            stack = self._get_stack(StackName, 'CreateChangeSet')
+        empty = stack['Template'] == template
+        self._change_sets[(StackName, ChangeSetName)] = {
+            'ChangeSetName': ChangeSetName, 'StackName': StackName, 'Template': template, 'Type': ChangeSetType,
+            'ChangeSetId': 'arn:aws:cloudformation:{}:{}:changeSet/{}/{}'.format(
+                self.backend.region, self.backend.account, ChangeSetName, uuid.uuid4()),
+            'Operation': PendingStatus('CREATE_IN_PROGRESS', 'FAILED' if empty else 'CREATE_COMPLETE',
+                                       self.backend.pending_polls),
+            'StatusReason': "The submitted information didn't contain changes. Submit different information to "
+                            "create a change set." if empty else None,
+        }
+        return {'Id': self._change_sets[(StackName, ChangeSetName)]['ChangeSetId'], 'StackId': stack['StackId']}
+
+    def _get_change_set(self, StackName, ChangeSetName, operation):
+        change_set = self._change_sets.get((StackName, ChangeSetName))
+        if change_set is None:
+            raise client_error('ChangeSetNotFound', 'ChangeSet [{}] does not exist'.format(ChangeSetName), operation,
+                               404)
+        return change_set
+
+    def describe_change_set(self, StackName, ChangeSetName, NextToken=None):
+        change_set = self._get_change_set(StackName, ChangeSetName, 'DescribeChangeSet')
+        status = change_set['Operation'].read()
+        description = {'ChangeSetName': ChangeSetName, 'ChangeSetId': change_set['ChangeSetId'],
+                       'StackName': StackName, 'Status': status,
+                       'ExecutionStatus': 'AVAILABLE' if status == 'CREATE_COMPLETE' else 'UNAVAILABLE',
+                       'Changes': []}
+        if status == 'FAILED':
+            description['StatusReason'] = change_set['StatusReason']
+        return description
+
+    def delete_change_set(self, StackName, ChangeSetName):
+        self._get_change_set(StackName, ChangeSetName, 'DeleteChangeSet')
+        del self._change_sets[(StackName, ChangeSetName)]
+        return {}
+
+    def execute_change_set(self, StackName, ChangeSetName):
+        change_set = self._get_change_set(StackName, ChangeSetName, 'ExecuteChangeSet')
+        if change_set['Operation'].read() != 'CREATE_COMPLETE':
+            raise client_error('InvalidChangeSetStatus', 'ChangeSet [{}] cannot be executed in its current '
+                                                         'status'.format(ChangeSetName), 'ExecuteChangeSet')
+        del self._change_sets[(StackName, ChangeSetName)]
+        self._apply(self._stacks[StackName], change_set['Template'],
+                    'CREATE' if change_set['Type'] == 'CREATE' else 'UPDATE')
+        return {}
+
+    def get_waiter(self, name):
+        return FakeStackWaiter(self, {'stack_create_complete': 'CREATE_COMPLETE',
+                                      'stack_update_complete': 'UPDATE_COMPLETE'}[name])
+
+
+class FakeS3(FakeClient):
+    service = 's3'
+
+    def __init__(self, backend):
+        super(FakeS3, self).__init__(backend)
+        self._buckets = {}
+
+    def _get_bucket(self, bucket, operation):
+        if bucket not in self._buckets:
+            raise client_error('NoSuchBucket', 'The specified bucket does not exist', operation, 404)
+        return self._buckets[bucket]
+
+    def _get_body(self, bucket, key, operation):
+        objects = self._get_bucket(bucket, operation)
+        if key not in objects:
+            raise client_error('NoSuchKey', 'The specified key does not exist.', operation, 404)
+        return objects[key]
+
+    def create_bucket(self, Bucket, **kwargs):
+        self._buckets.setdefault(Bucket, {})
+        return {'Location': '/{}'.format(Bucket)}
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        if hasattr(Body, 'read'):
+            Body = Body.read()
+        if not isinstance(Body, bytes):
+            Body = Body.encode('utf-8')
+        self._get_bucket(Bucket, 'PutObject')[Key] = Body
+        return {'ETag': '"{}"'.format(hashlib.md5(Body).hexdigest())}
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        with io.open(Filename, 'rb') as upload:
+            body = upload.read()
+        self._get_bucket(Bucket, 'PutObject')[Key] = body
+        if Callback:
+            Callback(len(body))
+
+    def head_object(self, Bucket, Key, **kwargs):
+        try:
+            body = self._get_body(Bucket, Key, 'HeadObject')
+        except ClientError:
+            # HEAD responses have no body, botocore only has the status code
+            raise client_error('404', 'Not Found', 'HeadObject', 404)
+        return {'ContentLength': len(body), 'ETag': '"{}"'.format(hashlib.md5(body).hexdigest())}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        body = self._get_body(Bucket, Key, 'GetObject')
+        return {'Body': io.BytesIO(body), 'ContentLength': len(body)}
+
+    def list_objects(self, Bucket, **kwargs):
+        objects = self._get_bucket(Bucket, 'ListObjects')
+        return {'Name': Bucket, 'Contents': [{'Key': key, 'Size': len(body)} for key, body in sorted(objects.items())]}
+
+
+class FakeLambda(FakeClient):
+    service = 'lambda'
+
+    def __init__(self, backend):
+        super(FakeLambda, self).__init__(backend)
+        self._policies = {}
+
+    def get_policy(self, FunctionName, Qualifier=None):
+        statements = self._policies.get(FunctionName)
+        if not statements:
+            raise client_error('ResourceNotFoundException', 'The resource you requested does not exist.',
+                               'GetPolicy', 404)
+        return {'Policy': json.dumps({'Version': '2012-10-17', 'Id': 'default', 'Statement': list(statements.values())}),
+                'RevisionId': new_checksum()}
+
+    def add_permission(self, FunctionName, StatementId, Action, Principal, SourceArn=None, **kwargs):
+        statements = self._policies.setdefault(FunctionName, {})
+        if StatementId in statements:
+            raise client_error('ResourceConflictException', 'The statement id ({}) provided already exists. Please '
+                                                            'provide a new statement id, or remove the existing '
+                                                            'statement.'.format(StatementId), 'AddPermission', 409)
+        statement = {'Sid': StatementId, 'Effect': 'Allow', 'Principal': {'Service': Principal}, 'Action': Action,
+                     'Resource': FunctionName}
+        if SourceArn:
+            statement['Condition'] = {'ArnLike': {'AWS:SourceArn': SourceArn}}
+        statements[StatementId] = statement
+        return {'Statement': json.dumps(statement)}
+
+    def remove_permission(self, FunctionName, StatementId, **kwargs):
+        statements = self._policies.get(FunctionName, {})
+        if StatementId not in statements:
+            raise client_error('ResourceNotFoundException', 'The resource you requested does not exist.',
+                               'RemovePermission', 404)
+        del statements[StatementId]
+        return {}
+
+
+class FakeSTS(FakeClient):
+    service = 'sts'
+
+    def get_caller_identity(self):
+        return {'Account': self.backend.account, 'UserId': 'AIDAFAKE',
+                'Arn': 'arn:aws:iam::{}:user/pylexbuilder'.format(self.backend.account)}
@@ -0,0 +1,278 @@
+"""
+Deploy instrumentation: spans around the phases of a deploy and a record of every AWS API call.
+
+    tracer = Tracer()
+    with tracer:
+        bot.create()
+    tracer.write_json('deploy.json')
+    tracer.write_chrome_trace('deploy.trace.json')  # chrome://tracing or https://ui.perfetto.dev
+
+Nothing is recorded, and clients aren't wrapped, while no tracer is installed.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pprint import pformat
+
+from botocore.exceptions import ClientError
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+# Installed tracer, see Tracer.install
+_active = None
+
+# Client attributes returned as they are: they aren't API calls
+PASSTHROUGH = frozenset(['can_paginate', 'get_paginator', 'get_waiter', 'generate_presigned_url',
+                         'generate_presigned_post'])
+
+
+class Pretty(object):
+    """
+    pformat of value, computed only if the log record is emitted:
+    logger.info("put_bot: %s", Pretty(response))
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return pformat(self.value)
+
+
+def payload_size(value):
+    """
+    Approximate size in bytes of the JSON of an API payload. Streams and other objects count as 0
+    """
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, type(u''))):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(key) + payload_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(payload_size(item) for item in value)
+    if isinstance(value, (bool, int, float)):
+        return len(str(value))
+    return 0
+
+
+def get_retries(response):
+    """
+    :return: retries botocore made before the response, from its ResponseMetadata
+    """
+    try:
+        return response['ResponseMetadata'].get('RetryAttempts', 0)
+    except (KeyError, TypeError, AttributeError):
+        return 0
+
+
+class Span(object):
+    __slots__ = ('name', 'category', 'start', 'duration', 'thread', 'args')
+
+    def __init__(self, name, category, start, duration, thread, args):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = duration
+        self.thread = thread
+        self.args = args
+
+    def to_dict(self):
+        return {'name': self.name, 'category': self.category, 'start': round(self.start, 6),
+                'duration': round(self.duration, 6), 'thread': self.thread, 'args': self.args}
+
+
+class Tracer(object):
+    """
+    Collects the spans of the phases and of the API calls of the threads of a deploy.
+    Span start times are seconds since the tracer was created
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.origin = _clock()
+        self._lock = threading.Lock()
+        self._previous = None
+
+    def install(self):
+        global _active
+        self._previous = _active
+        _active = self
+        return self
+
+    def uninstall(self):
+        global _active
+        if _active is self:
+            _active = self._previous
+        self._previous = None
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc_info):
+        self.uninstall()
+
+    def add(self, name, category, start, end, **args):
+        span = Span(name, category, start - self.origin, end - start, threading.current_thread().name, args)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextlib.contextmanager
+    def span(self, name, category='phase', **args):
+        """
+        Records the duration of the with block, and the exception that escaped it if any
+        """
+        start = _clock()
+        try:
+            yield args
+        except BaseException as e:
+            args['error'] = repr(e)
+            raise
+        finally:
+            self.add(name, category, start, _clock(), **args)
+
+    def call(self, service, operation, function, *args, **kwargs):
+        """
+        Runs and records one API call: its duration, the retries botocore made and the size of its payloads
+        """
+        start = _clock()
+        response = None
+        details = {'request_bytes': payload_size(kwargs)}
+        try:
+            response = function(*args, **kwargs)
+            return response
+        except ClientError as e:
+            details['error'] = e.response.get('Error', {}).get('Code', 'ClientError')
+            details['retries'] = get_retries(e.response)
+            raise
+        except Exception as e:
+            details['error'] = type(e).__name__
+            raise
+        finally:
+            end = _clock()
+            if 'error' not in details:
+                details['retries'] = get_retries(response)
+                details['response_bytes'] = payload_size(response)
+            self.add('{}.{}'.format(service, operation), 'api', start, end, **details)
+
+    def get_spans(self, category=None):
+        with self._lock:
+            spans = list(self.spans)
+        return [span for span in spans if category is None or span.category == category]
+
+    def summary(self):
+        """
+        :return: totals per span name: count, seconds, and for API calls retries, errors and payload bytes
+        """
+        totals = OrderedDict()
+        for span in sorted(self.get_spans(), key=lambda span: span.start):
+            total = totals.get(span.name)
+            if total is None:
+                total = totals[span.name] = {'category': span.category, 'count': 0, 'seconds': 0.0}
+                if span.category == 'api':
+                    total.update(retries=0, errors=0, request_bytes=0, response_bytes=0)
+            total['count'] += 1
+            total['seconds'] += span.duration
+            if span.category == 'api':
+                total['retries'] += span.args.get('retries', 0)
+                total['errors'] += 1 if 'error' in span.args else 0
+                total['request_bytes'] += span.args['request_bytes']
+                total['response_bytes'] += span.args.get('response_bytes', 0)
+        for total in totals.values():
+            total['seconds'] = round(total['seconds'], 6)
+        return totals
+
+    def to_dict(self):
+        return {'spans': [span.to_dict() for span in sorted(self.get_spans(), key=lambda span: span.start)],
+                'summary': self.summary()}
+
+    def to_chrome_trace(self):
+        """
+        :return: the spans as complete events of the Chrome trace event format
+        """
+        threads = {}
+        events = []
+        for span in sorted(self.get_spans(), key=lambda span: span.start):
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append({'name': span.name, 'cat': span.category, 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                           'ts': int(span.start * 1e6), 'dur': int(span.duration * 1e6), 'args': span.args})
+        for thread, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                           'args': {'name': thread}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+def get_tracer():
+    """
+    :rtype: Tracer
+    """
+    return _active
+
+
+class _NoSpan(object):
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, category='phase', **args):
+    """
+    Span of the installed tracer, a no-op without one. The with block gets the span's args dict,
+    to add details known only at its end
+    """
+    tracer = _active
+    if tracer is None:
+        return _NO_SPAN
+    return tracer.span(name, category, **args)
+
+
+class InstrumentedClient(object):
+    """
+    boto3 client proxy recording its API calls in a tracer
+    """
+
+    def __init__(self, client, service, tracer):
+        self._client = client
+        self._service = service
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if name.startswith('_') or name in PASSTHROUGH or not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            return self._tracer.call(self._service, name, attribute, *args, **kwargs)
+
+        return call
+
+    def __repr__(self):
+        return '<InstrumentedClient {!r}>'.format(self._client)
+
+
+def instrument(client, service):
+    """
+    :return: client recording its calls in the installed tracer, client itself without one
+    """
+    tracer = _active
+    if tracer is None or isinstance(client, InstrumentedClient):
+        return client
+    return InstrumentedClient(client, service, tracer)
@@ -0,0 +1,205 @@
+"""
+Deploys many bots at once.
+
+    report = Orchestrator([FlowersBot(), HotelBot(), CarBot()], max_workers=4).deploy()
+    for result in report.results:
+        print(result.name, result.ok, result.value or result.error)
+
+Coroutines await Orchestrator(bots).deploy_async() instead.
+
+Bots are deployed concurrently, at most max_workers at a time. What they have in common is done once per
+deployment: the stack and remote Lex listings, each distinct lambda package (prepared, zipped and uploaded once
+per bucket) and the slot types and intents several bots define identically.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from . import aio, clients, instrumentation, packaging, utils
+from .caching import MemoCache
+from .concurrency import DeployReport, ResourceResult, run_tasks_async
+from .remote import RemoteState
+from .stacks import StackIndex
+from .validation import ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceConflictError(Exception):
+    pass
+
+
+class SharedArtifacts(object):
+    """
+    Lambda packages of a deployment: each distinct package directory is prepared and fingerprinted once, zipped
+    once and uploaded once per bucket, however many bots use it
+    :type manifest: packaging.ManifestCache
+    """
+
+    def __init__(self, manifest=None):
+        self.manifest = manifest or packaging.ManifestCache.load()
+        self._packages = MemoCache(maxsize=None)
+        self._zips = MemoCache(maxsize=None)
+        self._uploads = MemoCache(maxsize=None)
+        self._buckets = MemoCache(maxsize=None)
+        self._directory = None
+        self._lock = threading.Lock()
+
+    def get_fingerprint(self, package_path, runtime=None):
+        def prepare():
+            utils.prepare_python_package(package_path, runtime=runtime)
+            with instrumentation.span('hash', path=package_path):
+                return self.manifest.fingerprint(package_path)
+
+        return self._packages.get_or_compute((package_path, runtime), prepare)
+
+    def get_zip(self, package_path, fingerprint, workers=1):
+        """
+        :return: path of the zip and its base64 sha256
+        """
+
+        def make_zip():
+            with self._lock:
+                if self._directory is None:
+                    self._directory = tempfile.mkdtemp(prefix='pylexbuilder-artifacts-')
+            # Packages with the same directory name don't overwrite each other's zip
+            return utils.zipdir_with_sha256(package_path, workers, dist_dir=tempfile.mkdtemp(dir=self._directory))
+
+        return self._zips.get_or_compute(fingerprint, make_zip)
+
+    def upload(self, bucket_name, package_path, runtime=None, workers=1):
+        """
+        upload_lambda of a deployment
+        :return: S3 key of the package
+        """
+        package_path = os.path.realpath(package_path)
+        fingerprint = self.get_fingerprint(package_path, runtime)
+
+        def upload():
+            s3_key = self.manifest.get_artifact(fingerprint, bucket_name)
+            if s3_key:
+                logger.info("Skipping packaging of '{}', unchanged since it was uploaded as '{}'".format(
+                    package_path, s3_key))
+                return s3_key
+            self._buckets.get_or_compute(bucket_name, lambda: utils.s3.create_bucket(Bucket=bucket_name))
+            zip_path, sha256 = self.get_zip(package_path, fingerprint, workers)
+            s3_key = utils.get_package_key(package_path, sha256)
+            utils.upload_zip_to_s3(zip_path, bucket_name, s3_key)
+            self.manifest.set_artifact(fingerprint, bucket_name, s3_key)
+            return s3_key
+
+        return self._uploads.get_or_compute((fingerprint, bucket_name), upload)
+
+    def close(self):
+        """
+        Saves the manifest and removes the zips
+        """
+        self.manifest.save()
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+
+class SharedResources(object):
+    """
+    Slot types and intents of a deployment, keyed by kind and name. A resource several bots define identically
+    is deployed by the first of them, the others reuse its version. Bots defining different resources under the
+    same name fail with ResourceConflictError, as they would overwrite each other in Lex
+    """
+
+    def __init__(self):
+        self._hashes = {}
+        self._deployed = MemoCache(maxsize=None)
+        self._lock = threading.Lock()
+
+    def create(self, kind, resource, state=None, remote=None, **kwargs):
+        """
+        :param kind: 'slot_type' or 'intent'
+        :type resource: props.SlotProperty | props.IntentProperty
+        :type state: state.DeployState
+        :param kwargs: passed to resource.create
+        """
+        resource_hash = resource.get_content_hash()
+        key = (kind, resource.name)
+        with self._lock:
+            known_hash = self._hashes.setdefault(key, resource_hash)
+        if known_hash != resource_hash:
+            raise ResourceConflictError("{} {} is defined differently by several bots".format(kind, resource.name))
+
+        def deploy():
+            resource.create(state=state, remote=remote, **kwargs)
+            return resource.version, resource.checksum
+
+        version, checksum = self._deployed.get_or_compute(key, deploy)
+        resource.version = version
+        resource.checksum = checksum
+        if state is not None and version and version != '$LATEST':
+            state.record(kind, resource.name, resource_hash, checksum, version)
+        return resource
+
+
+class Orchestrator(object):
+    """
+    :param bots: BotProperty instances, with distinct names
+    :param max_workers: number of bots deployed at the same time. Each bot deploys its own slot types and
+    intents with its max_workers, every blocking call of every bot runs on the aio executor
+    """
+
+    def __init__(self, bots, max_workers=4):
+        duplicates = sorted(name for name, count in Counter(bot.name for bot in bots).items() if count > 1)
+        if duplicates:
+            raise ValueError("Bots {} are defined more than once".format(', '.join(duplicates)))
+        self.bots = list(bots)
+        self.max_workers = max_workers
+
+    async def deploy_bot(self, bot, **shared):
+        """
+        :type bot: props.BotProperty
+        :return: version and deploy time of the bot
+        """
+        start = time.time()
+        await bot.create_async(**shared)
+        return {'version': bot.version, 'seconds': round(time.time() - start, 3)}
+
+    def deploy(self):
+        """
+        Blocking deploy_async
+        :rtype: concurrency.DeployReport
+        """
+        return aio.run(self.deploy_async())
+
+    async def deploy_async(self):
+        """
+        :return: one 'bot' result per bot, failed or not
+        :rtype: concurrency.DeployReport
+        """
+        # Invalid bots fail before anything is deployed
+        report = DeployReport()
+        bots = []
+        for bot in self.bots:
+            problems = bot.check()
+            if problems:
+                report.add(ResourceResult('bot', bot.name, error=ValidationError(problems)))
+            else:
+                bots.append(bot)
+
+        stack_index = StackIndex()
+        await aio.run_blocking(stack_index.prefetch, [bot.stack_name for bot in bots])
+        remote = await aio.run_blocking(RemoteState.fetch, clients.get_client('lex-models'),
+                                        bot_names=[bot.name for bot in bots])
+        artifacts = SharedArtifacts()
+        resources = SharedResources()
+        try:
+            await run_tasks_async([('bot', bot.name,
+                                    lambda bot=bot: self.deploy_bot(bot, stack_index=stack_index, remote=remote,
+                                                                    artifacts=artifacts, shared=resources,
+                                                                    validate=False))
+                                   for bot in bots], max_workers=self.max_workers, report=report)
+        finally:
+            artifacts.close()
+        logger.info("Deployed {} of {} bots".format(len(report.results) - len(report.failures), len(report.results)))
+        return report
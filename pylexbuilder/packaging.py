@@ -0,0 +1,483 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import stat
+import struct
+import tempfile
+import threading
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Fixed entry timestamp (the earliest a zip can hold) so archives don't depend on when files were written
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# Already compressed formats, stored as they are instead of being deflated again
+STORED_EXTENSIONS = ('.zip', '.whl', '.egg', '.jar', '.gz', '.tgz', '.bz2', '.xz', '.7z',
+                     '.png', '.jpg', '.jpeg', '.gif', '.webp', '.mp3', '.mp4', '.ogg')
+# Compressed entries bigger than this are spooled to disk instead of being held in memory
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+cache_dir = None
+""" Directory of the manifest and of the dependency cache, <tempdir>/pylexbuilder when None """
+
+
+def get_cache_dir():
+    return cache_dir or os.path.join(tempfile.gettempdir(), 'pylexbuilder')
+
+
+def hash_file(path, chunk_size=CHUNK_SIZE):
+    """
+    sha256 of a file read in chunks
+    """
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256
+
+
+def sha256_of_file(path, chunk_size=CHUNK_SIZE):
+    return hash_file(path, chunk_size).hexdigest()
+
+
+class HashingWriter(object):
+    """
+    Write-only file wrapper hashing the bytes on their way to disk.
+
+    It refuses to seek: the zip is written sequentially, so the hash is that of the final file.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.position = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.fileobj.write(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def seek(self, *args):
+        raise io.UnsupportedOperation("HashingWriter is not seekable")
+
+    def seekable(self):
+        return False
+
+    def flush(self):
+        self.fileobj.flush()
+
+
+def walk_files(directory_path):
+    """
+    Yields (path, path relative to directory_path) of every file below directory_path, sorted
+    """
+    for root, dirs, files in os.walk(directory_path):
+        dirs.sort()
+        for file in sorted(files):
+            path = os.path.join(root, file)
+            yield path, os.path.relpath(path, directory_path).replace(os.sep, '/')
+
+
+def make_zip_info(path, arcname, compress_type=zipfile.ZIP_DEFLATED):
+    """
+    ZipInfo with a fixed timestamp and permissions normalized to 644, or 755 for executables
+    """
+    info = zipfile.ZipInfo(arcname, date_time=ZIP_DATE_TIME)
+    info.compress_type = compress_type
+    info.create_system = 3
+    mode = 0o755 if os.stat(path).st_mode & stat.S_IXUSR else 0o644
+    info.external_attr = (stat.S_IFREG | mode) << 16
+    return info
+
+
+def get_compress_type(arcname, compress_type, stored_extensions):
+    if stored_extensions and arcname.lower().endswith(tuple(stored_extensions)):
+        return zipfile.ZIP_STORED
+    return compress_type
+
+
+def write_zip(zip_path, entries, compress_type=zipfile.ZIP_DEFLATED, workers=1, stored_extensions=STORED_EXTENSIONS):
+    """
+    Writes a reproducible zip: entries sorted by name, fixed timestamps and permissions, so the same
+    files always give a byte-identical archive, whatever the number of workers.
+
+    :param entries: iterable of (path, arcname)
+    :param workers: number of threads compressing entries, see write_zip_parallel. 1 compresses on the calling thread
+    :param stored_extensions: file extensions stored without compression
+    :return: sha256 digest of the zip, computed while it is written
+    """
+    entries = sorted(entries, key=lambda entry: entry[1])
+    with open(zip_path, 'wb') as f:
+        writer = HashingWriter(f)
+        write_zip_parallel(writer, entries, compress_type, workers, stored_extensions)
+    return writer.sha256.digest()
+
+
+def compress_entry(path, info, chunk_size=CHUNK_SIZE):
+    """
+    Compresses one file into a spooled buffer, filling the CRC and sizes of its ZipInfo
+    :type info: zipfile.ZipInfo
+    :return: the buffer, positioned at its start
+    """
+    compressor = None
+    if info.compress_type == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    crc = 0
+    file_size = 0
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    with open(path, 'rb') as src:
+        for chunk in iter(lambda: src.read(chunk_size), b''):
+            crc = zlib.crc32(chunk, crc)
+            file_size += len(chunk)
+            spool.write(compressor.compress(chunk) if compressor else chunk)
+    if compressor:
+        spool.write(compressor.flush())
+    info.CRC = crc & 0xffffffff
+    info.file_size = file_size
+    info.compress_size = spool.tell()
+    spool.seek(0)
+    return spool
+
+
+def _encode_arcname(info):
+    if isinstance(info.filename, bytes):
+        return info.filename, info.flag_bits
+    try:
+        return info.filename.encode('ascii'), info.flag_bits
+    except UnicodeError:
+        return info.filename.encode('utf-8'), info.flag_bits | 0x800
+
+
+def _dos_date_time(date_time):
+    dosdate = (date_time[0] - 1980) << 9 | date_time[1] << 5 | date_time[2]
+    dostime = date_time[3] << 11 | date_time[4] << 5 | (date_time[5] // 2)
+    return dosdate, dostime
+
+
+def _compress_entries(entries, infos, workers, chunk_size=CHUNK_SIZE):
+    """
+    Yields the spool of every entry, in order. Entries are compressed on a thread pool when workers > 1,
+    with a bounded window in flight so finished spools don't pile up in memory
+    """
+    if workers <= 1:
+        for (path, _), info in zip(entries, infos):
+            yield compress_entry(path, info, chunk_size)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        window = workers * 2
+        futures = [executor.submit(compress_entry, path, info, chunk_size)
+                   for (path, _), info in zip(entries[:window], infos[:window])]
+        for i in range(len(infos)):
+            spool = futures[i].result()
+            futures[i] = None
+            if i + window < len(entries):
+                futures.append(executor.submit(compress_entry, entries[i + window][0], infos[i + window],
+                                               chunk_size))
+            yield spool
+
+
+def write_zip_parallel(writer, entries, compress_type=zipfile.ZIP_DEFLATED, workers=4,
+                       stored_extensions=STORED_EXTENSIONS, chunk_size=CHUNK_SIZE):
+    """
+    Compresses entries on a thread pool (zlib releases the GIL) and assembles them into a zip in the
+    order given. Local headers carry the final CRC and sizes, so nothing is ever seeked back to and no entry
+    needs a data descriptor. The bytes don't depend on workers. Archives above the 4GB zip32 limit are not supported.
+
+    :param writer: file object the zip is written to
+    :param entries: sorted list of (path, arcname)
+    """
+    infos = [make_zip_info(path, arcname, get_compress_type(arcname, compress_type, stored_extensions))
+             for path, arcname in entries]
+    central_directory = []
+    for info, spool in zip(infos, _compress_entries(entries, infos, workers, chunk_size)):
+        info.header_offset = writer.tell()
+        filename, flag_bits = _encode_arcname(info)
+        dosdate, dostime = _dos_date_time(info.date_time)
+        writer.write(struct.pack(zipfile.structFileHeader, zipfile.stringFileHeader, info.extract_version,
+                                 info.reserved, flag_bits, info.compress_type, dostime, dosdate, info.CRC,
+                                 info.compress_size, info.file_size, len(filename), 0))
+        writer.write(filename)
+        with spool:
+            shutil.copyfileobj(spool, writer, chunk_size)
+        central_directory.append(struct.pack(
+            zipfile.structCentralDir, zipfile.stringCentralDir, info.create_version, info.create_system,
+            info.extract_version, info.reserved, flag_bits, info.compress_type, dostime, dosdate, info.CRC,
+            info.compress_size, info.file_size, len(filename), 0, 0, 0, info.internal_attr,
+            info.external_attr, info.header_offset) + filename)
+
+    central_directory_offset = writer.tell()
+    for record in central_directory:
+        writer.write(record)
+    central_directory_size = writer.tell() - central_directory_offset
+    writer.write(struct.pack(zipfile.structEndArchive, zipfile.stringEndArchive, 0, 0, len(infos), len(infos),
+                             central_directory_size, central_directory_offset, 0))
+
+
+def requirements_key(requirements_path, runtime=None):
+    """
+    Cache key of the dependencies built from a requirements file for a lambda runtime
+    """
+    sha256 = hash_file(requirements_path)
+    sha256.update('\0{}'.format(runtime or '').encode('utf-8'))
+    return sha256.hexdigest()
+
+
+def _remove(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def _makedirs(directory):
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+
+
+class DependencyCache(object):
+    """
+    Built dependency trees, one directory per requirements key under <tempdir>/pylexbuilder/dependencies.
+
+    Every build runs in its own temporary directory, which is renamed into place once complete, so
+    builds of different requirements run in parallel and a half built tree is never restored.
+    Builds of the same key in one process wait for each other instead of building twice.
+
+    The key and the top level entries restored into a target are recorded under <root>/restored, not in the
+    target, so nothing but the dependencies ends up in the lambda package. A restore replaces the entries of the
+    previous one and leaves the other files of the target alone, so dependencies can be restored into the lambda
+    source directory itself. Restores copy the files: the target can be edited without touching the cache.
+
+    :param root: directory of the cache, <get_cache_dir()>/dependencies at the time of use by default
+    """
+    markers_directory = 'restored'
+
+    def __init__(self, root=None):
+        self._root = root
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def root(self):
+        return self._root or os.path.join(get_cache_dir(), 'dependencies')
+
+    def get_path(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        path = self.get_path(key)
+        return path if os.path.isdir(path) else None
+
+    def _get_key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get_or_build(self, key, build):
+        """
+        :param build: callable(directory) installing the dependencies into an empty directory
+        :return: directory of the built dependencies
+        """
+        with self._get_key_lock(key):
+            path = self.get(key)
+            if path:
+                return path
+            _makedirs(self.root)
+            build_path = tempfile.mkdtemp(prefix='{}.'.format(key), dir=self.root)
+            try:
+                build(build_path)
+                os.rename(build_path, self.get_path(key))
+            except OSError:
+                # Another process finished the same build first
+                if not self.get(key):
+                    raise
+            finally:
+                shutil.rmtree(build_path, ignore_errors=True)
+            return self.get_path(key)
+
+    def get_marker_path(self, target):
+        target_hash = hashlib.sha256(os.path.abspath(target).encode('utf-8')).hexdigest()
+        return os.path.join(self.root, self.markers_directory, target_hash)
+
+    def read_marker(self, target):
+        """
+        :return: the {'key', 'entries'} last restored into target, None if nothing was
+        """
+        marker = self.get_marker_path(target)
+        if not os.path.exists(marker):
+            return None
+        try:
+            with open(marker) as f:
+                return json.load(f)
+        except ValueError:
+            return None
+
+    def is_restored(self, key, target):
+        restored = self.read_marker(target)
+        if not restored or restored.get('key') != key:
+            return False
+        return all(os.path.lexists(os.path.join(target, entry)) for entry in restored.get('entries', []))
+
+    def restore(self, key, target, build):
+        """
+        Copies the dependencies of key into target, building them first on a cache miss.
+        Entries of the previous restore are replaced, other files of target are left alone
+        """
+        if self.is_restored(key, target):
+            logger.info("Dependencies in {} are up to date".format(target))
+            return
+        path = self.get_or_build(key, build)
+        logger.info("Restoring dependencies {} into {}".format(key, target))
+        marker = self.get_marker_path(target)
+        previous = self.read_marker(target)
+        entries = sorted(os.listdir(path))
+        if not os.path.isdir(target):
+            os.makedirs(target)
+        for entry in set(previous.get('entries', []) if previous else []) | set(entries):
+            _remove(os.path.join(target, entry))
+        _makedirs(os.path.dirname(marker))
+        # The marker goes first, a failed copy is cleaned up by the next restore
+        with open(marker, 'w') as f:
+            json.dump({'key': None, 'entries': entries}, f)
+        for entry in entries:
+            source = os.path.join(path, entry)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(target, entry))
+            else:
+                shutil.copy2(source, os.path.join(target, entry))
+        with open(marker, 'w') as f:
+            json.dump({'key': key, 'entries': entries}, f)
+
+
+# Serializes the saves of the ManifestCache instances of this process
+_manifest_lock = threading.Lock()
+
+
+class ManifestCache(object):
+    """
+    Local cache of source tree fingerprints and of the S3 keys their packages were uploaded as.
+
+        {
+            'files': {'/abs/path/handler.py': [size, mtime, sha256]},
+            'artifacts': {'<fingerprint>': {'<bucket>': '<s3 key>'}}
+        }
+
+    A fingerprint covers the relative path, size and content hash of every file. Content hashes are
+    reused while a file's size and mtime don't change, so fingerprinting an unchanged tree only stats it.
+
+    Every bot of a deployment may load its own instance of the same file: save merges with what the file holds,
+    so instances saved one after the other keep each other's entries.
+    """
+
+    def __init__(self, path=None, files=None, artifacts=None):
+        self.path = path
+        self.files = files or {}
+        self.artifacts = artifacts or {}
+        self._forgotten = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def read(path):
+        """
+        :return: the content of a manifest file, {} when it is missing or corrupt
+        :rtype: dict
+        """
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    return json.load(f)
+            except ValueError:
+                logger.warning("Ignoring corrupt manifest cache {}".format(path))
+        return {}
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or os.path.join(get_cache_dir(), 'manifest.json')
+        data = cls.read(path)
+        return cls(path, data.get('files'), data.get('artifacts'))
+
+    def merge(self, data):
+        """
+        Adds the entries of data, the content of a manifest file, that this instance doesn't hold.
+        The entries of this instance win, the files its fingerprints forgot stay forgotten
+        """
+        with self._lock:
+            files = {path: entry for path, entry in (data.get('files') or {}).items() if path not in self._forgotten}
+            files.update(self.files)
+            artifacts = {fingerprint: dict(keys) for fingerprint, keys in (data.get('artifacts') or {}).items()}
+            for fingerprint, keys in self.artifacts.items():
+                artifacts.setdefault(fingerprint, {}).update(keys)
+            self.files = files
+            self.artifacts = artifacts
+
+    def save(self):
+        """
+        Merges the file with this instance and writes the result atomically. Saves of this process are serialized,
+        a save of another process between the read and the replace loses its entries, which only costs that process
+        hashing or uploading again
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            _makedirs(directory)
+        with _manifest_lock:
+            self.merge(self.read(self.path))
+            fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.', suffix='.tmp',
+                                             dir=directory or None)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    with self._lock:
+                        json.dump({'files': self.files, 'artifacts': self.artifacts}, f)
+                        self._forgotten.clear()
+                os.replace(temp_path, self.path)
+            except BaseException:
+                _remove(temp_path)
+                raise
+
+    def file_hash(self, path, stat=None):
+        stat = stat or os.stat(path)
+        with self._lock:
+            cached = self.files.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime:
+            return cached[2]
+        sha256 = sha256_of_file(path)
+        with self._lock:
+            self.files[path] = [stat.st_size, stat.st_mtime, sha256]
+        return sha256
+
+    def fingerprint(self, directory_path):
+        directory_path = os.path.abspath(directory_path)
+        fingerprint = hashlib.sha256()
+        seen = set()
+        for path, arcname in walk_files(directory_path):
+            seen.add(path)
+            stat = os.stat(path)
+            fingerprint.update('{}\0{}\0{}\n'.format(arcname, stat.st_size,
+                                                     self.file_hash(path, stat)).encode('utf-8'))
+        # Forget files that were deleted from the tree
+        prefix = directory_path + os.sep
+        with self._lock:
+            for path in [path for path in self.files if path.startswith(prefix) and path not in seen]:
+                del self.files[path]
+                self._forgotten.add(path)
+        return fingerprint.hexdigest()
+
+    def get_artifact(self, fingerprint, bucket_name):
+        with self._lock:
+            return self.artifacts.get(fingerprint, {}).get(bucket_name)
+
+    def set_artifact(self, fingerprint, bucket_name, s3_key):
+        with self._lock:
+            self.artifacts.setdefault(fingerprint, {})[bucket_name] = s3_key
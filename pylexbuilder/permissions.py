@@ -0,0 +1,109 @@
+import json
+import logging
+import random
+import time
+
+from botocore.exceptions import ClientError
+
+from .concurrency import run_tasks
+from .waiters import THROTTLING_ERROR_CODES
+
+logger = logging.getLogger(__name__)
+
+LEX_PRINCIPAL = 'lex.amazonaws.com'
+
+
+def get_statement_id(intent_name):
+    return '{}PermissionToLexProduction'.format(intent_name)
+
+
+def get_intent_arn(region, account, intent_name):
+    return 'arn:aws:lex:{}:{}:intent:{}:*'.format(region, account, intent_name)
+
+
+def get_policy_statements(client, function_name):
+    """
+    :type client: pyboto3.lambda_
+    :return: statements of the function's resource policy by Sid, empty when the function has no policy yet
+    :rtype: dict
+    """
+    try:
+        response = client.get_policy(FunctionName=function_name)
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ResourceNotFoundException':
+            return {}
+        raise
+    return {statement.get('Sid'): statement for statement in json.loads(response['Policy']).get('Statement', [])}
+
+
+def get_source_arn(statement):
+    for condition in statement.get('Condition', {}).values():
+        if 'AWS:SourceArn' in condition:
+            return condition['AWS:SourceArn']
+    return None
+
+
+class PermissionReconciler(object):
+    """
+    Grants Lex the permission to invoke a lambda function for every intent, adding only the statements the
+    function policy is missing. The policy is read once per reconcile.
+
+    :param function_name: function ARN, qualified with the alias the intents invoke
+    :param retries: attempts of an add_permission rejected because of concurrent policy updates or throttling
+    """
+
+    def __init__(self, client, function_name, region, account, retries=5):
+        self.client = client
+        self.function_name = function_name
+        self.region = region
+        self.account = account
+        self.retries = retries
+
+    def get_missing(self, intent_names, statements=None):
+        """
+        :return: names of the intents without a statement allowing them to invoke the function
+        """
+        if statements is None:
+            statements = get_policy_statements(self.client, self.function_name)
+        missing = []
+        for intent_name in intent_names:
+            statement = statements.get(get_statement_id(intent_name))
+            if not statement or get_source_arn(statement) != get_intent_arn(self.region, self.account, intent_name):
+                missing.append(intent_name)
+        return missing
+
+    def add(self, intent_name, replace=False):
+        statement_id = get_statement_id(intent_name)
+        if replace:
+            logger.info("Replacing outdated lambda permission {}".format(statement_id))
+            self.client.remove_permission(FunctionName=self.function_name, StatementId=statement_id)
+        for attempt in range(self.retries):
+            try:
+                return self.client.add_permission(FunctionName=self.function_name,
+                                                  StatementId=statement_id,
+                                                  Action='lambda:InvokeFunction',
+                                                  SourceArn=get_intent_arn(self.region, self.account, intent_name),
+                                                  Principal=LEX_PRINCIPAL)
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                message = e.response['Error'].get('Message', '')
+                if code == 'ResourceConflictException' and 'already exists' in message:
+                    return None
+                if code not in THROTTLING_ERROR_CODES + ('ResourceConflictException',) \
+                        or attempt == self.retries - 1:
+                    raise
+                time.sleep(random.uniform(0, 0.2 * 2 ** attempt))
+
+    def reconcile(self, intent_names, max_workers=1):
+        """
+        :return: one result per added permission
+        :rtype: concurrency.DeployReport
+        """
+        statements = get_policy_statements(self.client, self.function_name)
+        missing = self.get_missing(intent_names, statements)
+        logger.info("Adding {} of {} lambda permissions".format(len(missing), len(intent_names)))
+        tasks = [('permission', intent_name,
+                  lambda intent_name=intent_name: self.add(intent_name,
+                                                           replace=get_statement_id(intent_name) in statements))
+                 for intent_name in missing]
+        return run_tasks(tasks, max_workers=max_workers)
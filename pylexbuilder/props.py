@@ -1,29 +1,88 @@
+import asyncio
 import inspect
+import itertools
 import logging
 import os
 import subprocess
-import time
-from pprint import pformat
 
-import boto3
 from botocore.exceptions import ClientError
 from schematics import types, models
+from schematics.exceptions import ValidationError
 from troposphere import AWS_REGION, AWS_ACCOUNT_ID, Ref
 
-from . import utils
+from . import aio, clients, instrumentation, serialization, stacks, utils, validation, versions
+from .concurrency import DeployReport, ResourceResult, run_tasks_async
+from .enumerations import EnumerationStore
+from . import utterances as generated_utterances
+from .permissions import PermissionReconciler
+from .remote import RemoteState
+from .state import DeployState, content_hash
+from . import waiters
 
-lex_model = boto3.client('lex-models')
+lex_model = clients.LazyClient('lex-models')
 """ :type : pyboto3.lexmodelbuildingservice """
 
 
 class BaseModel(models.Model):
+    _fields = serialization.FieldsDescriptor()
+
     def __init__(self, *args, **kwargs):
-        super(BaseModel, self).__init__(*args, **kwargs)
+        # Models built without data skip schematics' conversion, see serialization
+        if args or kwargs or not serialization.init_model(self):
+            super(BaseModel, self).__init__(*args, **kwargs)
         self.initialize()
 
     def initialize(self):
         pass
 
+    def to_primitive(self, role=None, app_data=None, **kwargs):
+        if role is None and app_data is None and not kwargs:
+            primitive = serialization.to_primitive(self)
+            if primitive is not None:
+                return primitive
+        return super(BaseModel, self).to_primitive(role=role, app_data=app_data, **kwargs)
+
+    def get_content_hash(self, primitive=None):
+        """
+        Hash of the model primitive without the checksum and version assigned by Lex
+        :param primitive: to_primitive() of the model, when the caller already has it
+        """
+        primitive = dict(primitive if primitive is not None else self.to_primitive())
+        primitive.pop('checksum', None)
+        primitive.pop('version', None)
+        return content_hash(primitive)
+
+    def get_put_kwargs(self, primitive):
+        """
+        :param primitive: to_primitive() of the model taken before its checksum was updated
+        :return: the primitive with the current checksum
+        """
+        kwargs = dict(primitive)
+        kwargs.pop('checksum', None)
+        if self.checksum is not None:
+            kwargs['checksum'] = self.checksum
+        return kwargs
+
+    def get_reusable_version(self, kind, primitive, state=None, remote=None):
+        """
+        Newest published version when both it and $LATEST already hold primitive, see versions.
+        Lex is only asked when the deploy state has no record of the resource, a recorded resource whose hash
+        changed was modified since its last version
+        :type state: DeployState
+        :type remote: RemoteState
+        :rtype: dict
+        """
+        if state is not None and state.get(kind, self.name) is not None:
+            return None
+        if remote is not None and not remote.exists(kind, self.name):
+            return None
+        return versions.get_reusable_version(lex_model, kind, self.name, primitive, remote)
+
+    def reuse_version(self, kind, reusable):
+        logging.info("{} {} is already published, reusing version {}".format(kind, self.name, reusable['version']))
+        self.checksum = reusable['checksum']
+        self.version = reusable['version']
+
 
 class CodeHookProperty(BaseModel):
     uri = types.StringType(serialize_when_none=False)
@@ -31,7 +90,8 @@ class CodeHookProperty(BaseModel):
 
 
 def assertFulfilmentType(val):
-    assert val == 'ReturnIntent' or val == 'CodeHook'
+    if val not in validation.FULFILLMENT_TYPES:
+        raise ValidationError("Invalid fulfillment type {!r}".format(val))
 
 
 class FulfilmentActivityProperty(BaseModel):
@@ -41,7 +101,8 @@ class FulfilmentActivityProperty(BaseModel):
 
 
 def assertContentType(val):
-    assert val == 'PlainText' or 'SSML'
+    if val not in validation.CONTENT_TYPES:
+        raise ValidationError("Invalid content type {!r}".format(val))
 
 
 class MessageProperty(BaseModel):
@@ -105,43 +166,121 @@ class SlotProperty(BaseModel):
     version = types.StringType(serialize_when_none=False)
     valueSelectionStrategy = types.StringType(serialize_when_none=False)
 
-    def get_slot_type_checksum(self):
+    def get_slot_type_checksum(self, remote=None):
+        """
+        :type remote: RemoteState
+        """
+        if remote is not None:
+            return remote.get_checksum('slot_type', self.name)
         checksum = None
         try:
             response = lex_model.get_slot_type(name=self.name, version='$LATEST')
-            logging.debug("get_slot_type: {}".format(pformat(response)))
+            logging.debug("get_slot_type: {} checksum {}".format(self.name, response.get('checksum')))
             checksum = response.get('checksum')
         except ClientError as e:
             if e.response['Error']['Code'] != 'NotFoundException':
                 raise
         return checksum
 
-    def create(self):
-        logging.info("Creating slot: {}".format(self.name))
-        self.checksum = self.get_slot_type_checksum()
-        kwargs = self.to_primitive()
-        # Put the slot
-        response = lex_model.put_slot_type(**kwargs)
-        logging.debug("put_slot_type: {}".format(pformat(response)))
-        self.version = response['version']
-        self.checksum = response['checksum']
-        try:
+    def create(self, state=None, remote=None):
+        """
+        :type state: DeployState
+        :type remote: RemoteState
+        """
+        primitive = self.to_primitive()
+        resource_hash = self.get_content_hash(primitive)
+        deployed = state.get_unchanged('slot_type', self.name, resource_hash, remote) if state else None
+        if deployed:
+            logging.info("Slot type {} is unchanged, reusing version {}".format(self.name, deployed['version']))
+            self.checksum = deployed['checksum']
+            self.version = deployed['version']
+            return
+        reusable = self.get_reusable_version('slot_type', primitive, state, remote)
+        if reusable:
+            self.reuse_version('slot_type', reusable)
+        else:
+            logging.info("Creating slot: {}".format(self.name))
+            self.checksum = self.get_slot_type_checksum(remote)
+            kwargs = self.get_put_kwargs(primitive)
+            # Put the slot
+            response = lex_model.put_slot_type(**kwargs)
+            logging.debug("put_slot_type: %s", instrumentation.Pretty(response))
+            self.version = response['version']
+            self.checksum = response['checksum']
+            if remote is not None:
+                remote.set_checksum('slot_type', self.name, self.checksum)
             version_response = lex_model.create_slot_type_version(name=self.name, checksum=self.checksum)
             self.version = version_response['version']
             self.checksum = version_response['checksum']
-        except ClientError as e:
-            logging.warning('Failed to create new slot type version ', exc_info=1)
+        if state:
+            state.record('slot_type', self.name, resource_hash, self.checksum, self.version)
+
+    async def create_async(self, state=None, remote=None):
+        """
+        create on the blocking executor
+        """
+        return await aio.run_blocking(self.create, state=state, remote=remote)
+
+    def get_enumerations(self):
+        """
+        Values added with add_enumeration and load_enumerations, sent along with enumerationValues
+        :rtype: EnumerationStore
+        """
+        enumerations = self.__dict__.get('_enumerations')
+        if enumerations is None:
+            enumerations = self._enumerations = EnumerationStore()
+        return enumerations
+
+    def add_enumeration(self, value, synonyms=None):
+        self.get_enumerations().add(value, synonyms)
+        return self
 
-    def add_enumeration(self, value):
-        enum = EnumerationProperty()
-        enum.value = value
-        if not self.enumerationValues:
-            self.enumerationValues = [enum]
-        else:
-            self.enumerationValues = self.enumerationValues + [enum]
+    def load_enumerations(self, source, **kwargs):
+        """
+        :param source: path of a .csv or .jsonl file, or an iterable of enumerations, see EnumerationStore.extend
+        """
+        self.get_enumerations().load(source, **kwargs)
+        return self
+
+    def to_primitive(self, role=None, app_data=None, **kwargs):
+        primitive = super(SlotProperty, self).to_primitive(role=role, app_data=app_data, **kwargs)
+        enumerations = self.__dict__.get('_enumerations')
+        if enumerations:
+            defined = primitive.get('enumerationValues', [])
+            primitive['enumerationValues'] = defined + enumerations.to_primitive(
+                exclude={enumeration.get('value') for enumeration in defined})
+        return primitive
+
+
+class PropertyWithUtterances(BaseModel):
+    sampleUtterances = types.ListType(types.StringType, serialize_when_none=False)
+    """ :type : list[str] """
+
+    def add_utterance(self, utterance):
+        if self.sampleUtterances is None:
+            self.sampleUtterances = []
+        self.sampleUtterances.append(utterance)
+        return self
+
+    def add_utterances(self, utterances):
+        """
+        Adds many utterances at once, skipping duplicates
+        :param utterances: iterable, e.g. utterances.generate(...)
+        """
+        self.sampleUtterances = list(generated_utterances.unique(
+            itertools.chain(self.sampleUtterances or [], utterances)))
+        return self
+
+    def generate_utterances(self, templates, **kwargs):
+        """
+        Adds the utterances expanded from templates, see utterances.generate for the options.
+        A limit counts the added utterances, the ones already there are excluded first
+        """
+        kwargs.setdefault('exclude', self.sampleUtterances or ())
+        return self.add_utterances(generated_utterances.generate(templates, **kwargs))
 
 
-class IntentSlotPropertyBase(BaseModel):
+class IntentSlotPropertyBase(PropertyWithUtterances):
     """
         {
             'name': 'string',
@@ -174,18 +313,19 @@ class IntentSlotPropertyBase(BaseModel):
     valueElicitationPrompt = types.ModelType(ValueElicitationPromptProperty, default=ValueElicitationPromptProperty())
     """:type: ValueElicitationPromptProperty"""
     priority = types.IntType(serialize_when_none=False)
-    sampleUtterances = types.ListType(types.StringType, serialize_when_none=False)
-    """ :type : list[str] """
     responseCard = types.StringType(serialize_when_none=False)
 
-    def add_utterance(self, utterance):
-        self.sampleUtterances.append(utterance)
-        return self
-
     def add_prompt(self, prompt):
         self.valueElicitationPrompt.add_message(prompt)
 
-    def create(self):
+    def get_slot_type(self):
+        """
+        :return: the custom slot type this slot depends on, None for built-in slot types
+        :rtype: SlotProperty
+        """
+        return None
+
+    def create(self, state=None, remote=None):
         pass
 
 def AmazonSlotProperty(slot_type, name=None, required=False, prompt=None):
@@ -205,11 +345,18 @@ class IntentSlotProperty(IntentSlotPropertyBase):
 
     def initialize(self):
         super(IntentSlotProperty, self).initialize()
-        self.slotType = self.SlotProperty().name
-
-    def create(self):
-        slotToCreate = self.SlotProperty()
-        slotToCreate.create()
+        self.slotType = self.get_slot_type().name
+
+    def get_slot_type(self):
+        # Built once per slot, it's only a definition
+        slot_type = self.__dict__.get('_slot_type')
+        if slot_type is None:
+            slot_type = self._slot_type = self.SlotProperty()
+        return slot_type
+
+    def create(self, state=None, remote=None):
+        slotToCreate = self.get_slot_type()
+        slotToCreate.create(state=state, remote=remote)
         self.slotTypeVersion = slotToCreate.version
 
 
@@ -228,15 +375,12 @@ class FollowUpPromptProperty(BaseModel):
     """ :type : RejectionStatmentProperty """
 
 
-class IntentProperty(BaseModel):
+class IntentProperty(PropertyWithUtterances):
     name = types.StringType()
     description = types.StringType(serialize_when_none=False)
     slots = types.ListType(types.ModelType(IntentSlotProperty), serialize_when_none=False, default=[])
     """ :type : list[IntentSlotProperty] """
 
-    sampleUtterances = types.ListType(types.StringType, serialize_when_none=False)
-    """ :type : list[str] """
-
     confirmationPrompt = types.ModelType(PromptProperty, serialize_when_none=False)
     """ :type : PromptProperty """
 
@@ -261,15 +405,16 @@ class IntentProperty(BaseModel):
     def add_slot(self, slot_prop):
         self.slots.append(slot_prop)
 
-    def add_utterance(self, utterance):
-        self.sampleUtterances = self.sampleUtterances + [utterance]
-        return self
-
-    def get_intent_checksum(self, version='$LATEST'):
+    def get_intent_checksum(self, version='$LATEST', remote=None):
+        """
+        :type remote: RemoteState
+        """
+        if remote is not None and version == '$LATEST':
+            return remote.get_checksum('intent', self.name)
         checksum = None
         try:
             response = lex_model.get_intent(name=self.name, version=version)
-            logging.info("get_intent: {}".format(pformat(response)))
+            logging.debug("get_intent: {} checksum {}".format(self.name, response.get('checksum')))
             checksum = response.get('checksum')
         except ClientError as e:
             if e.response['Error']['Code'] != 'NotFoundException':
@@ -277,30 +422,54 @@ class IntentProperty(BaseModel):
 
         return checksum
 
-    def create_slots(self):
+    def create_slots(self, state=None, remote=None):
         for slot in self.slots:
-            slot.create()
-
-    def create(self):
-        logging.info("Creating intent: {}".format(self.name))
-        self.create_slots()
-        # Create the intent and get the old checksum if it exists
-        self.checksum = self.get_intent_checksum()
-        kwargs = self.to_primitive()
-        # Put the new/updated intent
-        response = lex_model.put_intent(**kwargs)
-        logging.info("put_intent: {}".format(pformat(response)))
-
-        self.checksum = response.get('checksum')
-        try:
+            slot.create(state=state, remote=remote)
+
+    def create(self, with_slots=True, state=None, remote=None):
+        """
+        :type state: DeployState
+        :type remote: RemoteState
+        """
+        if with_slots:
+            self.create_slots(state=state, remote=remote)
+        primitive = self.to_primitive()
+        resource_hash = self.get_content_hash(primitive)
+        deployed = state.get_unchanged('intent', self.name, resource_hash, remote) if state else None
+        if deployed:
+            logging.info("Intent {} is unchanged, reusing version {}".format(self.name, deployed['version']))
+            self.checksum = deployed['checksum']
+            self.version = deployed['version']
+            return self
+        reusable = self.get_reusable_version('intent', primitive, state, remote)
+        if reusable:
+            self.reuse_version('intent', reusable)
+        else:
+            logging.info("Creating intent: {}".format(self.name))
+            # Create the intent and get the old checksum if it exists
+            self.checksum = self.get_intent_checksum(remote=remote)
+            kwargs = self.get_put_kwargs(primitive)
+            # Put the new/updated intent
+            response = lex_model.put_intent(**kwargs)
+            logging.info("put_intent: %s", instrumentation.Pretty(response))
+
+            self.checksum = response.get('checksum')
+            if remote is not None:
+                remote.set_checksum('intent', self.name, self.checksum)
             version_response = lex_model.create_intent_version(name=self.name, checksum=self.checksum)
-            logging.info("create_intent_version: {}".format(pformat(version_response)))
+            logging.info("create_intent_version: %s", instrumentation.Pretty(version_response))
             self.version = version_response.get('version')
             self.checksum = version_response.get('checksum')
-        except ClientError as e:
-            logging.warning('Failed to create new intent version ', exc_info=1)
+        if state:
+            state.record('intent', self.name, resource_hash, self.checksum, self.version)
         return self
 
+    async def create_async(self, with_slots=True, state=None, remote=None):
+        """
+        create on the blocking executor
+        """
+        return await aio.run_blocking(self.create, with_slots=with_slots, state=state, remote=remote)
+
 
 class BotIntentProperty(BaseModel):
     intentName = types.StringType(serialize_when_none=False)
@@ -329,12 +498,120 @@ class BotProperty(BaseModel):
         """ :type: list[IntentProperty] """
         existing_intents = []
 
-    def create_all_intents(self, lambda_arn):
+    @property
+    def max_workers(self):
+        """
+        Number of slot types/intents deployed concurrently. 1 deploys them one at a time
+        """
+        return 1
+
+    @property
+    def keep_versions(self):
+        """
+        Versions of the bot, its intents and its slot types retained after a deploy, on top of the ones aliases
+        still use. None never deletes a version
+        """
+        return None
+
+    def get_slot_types(self):
+        """
+        Unique custom slot types referenced by the intents of this bot, keyed by name
+        :rtype: dict[str, SlotProperty]
+        """
+        slot_types = {}
+        for intent in self.IntentMeta.intents:
+            for slot in intent.slots:
+                slot_type = slot.get_slot_type()
+                if slot_type is not None and slot_type.name not in slot_types:
+                    slot_types[slot_type.name] = slot_type
+        return slot_types
+
+    @property
+    def deploy_state_path(self):
+        """
+        JSON file remembering what was last deployed, so unchanged slot types and intents are not put again.
+        One file per account and region, so a deploy elsewhere doesn't trust what was deployed here.
+        None disables change detection
+        """
+        return os.path.join('.pylexbuilder', utils.get_account_number(), clients.get_region(),
+                            '{}.json'.format(self.name))
+
+    def load_deploy_state(self):
+        """
+        :rtype: DeployState
+        """
+        if self.deploy_state_path:
+            return DeployState.load(self.deploy_state_path)
+        return None
+
+    def fetch_remote_state(self):
+        """
+        :rtype: RemoteState
+        """
+        return RemoteState.fetch(lex_model, bot_names=[self.name])
+
+    def create_all_intents(self, lambda_arn, max_workers=None, state=None, remote=None, shared=None):
+        """
+        Blocking create_all_intents_async
+        :rtype: DeployReport
+        """
+        return aio.run(self.create_all_intents_async(lambda_arn, max_workers=max_workers, state=state,
+                                                     remote=remote, shared=shared))
+
+    async def create_all_intents_async(self, lambda_arn, max_workers=None, state=None, remote=None, shared=None):
+        """
+        Deploys the slot types first, then the intents that reference their versions.
+        Every resource is attempted, failures are collected and raised together once both phases ran
+
+        :param max_workers: slot types, then intents, deployed at the same time
+        :type state: DeployState
+        :type remote: RemoteState
+        :param shared: resources of a multi-bot deployment, deploying the ones several bots define only once
+        :type shared: orchestrator.SharedResources
+        :rtype: DeployReport
+        """
+        max_workers = max_workers or self.max_workers
+        report = DeployReport()
         for intent in self.IntentMeta.intents:
             if intent.is_lambda():
                 intent.update_uri(lambda_arn)
-            intent.create()
 
+        if shared is not None:
+            create_slot_type = lambda slot_type: aio.run_blocking(shared.create, 'slot_type', slot_type,
+                                                                  state=state, remote=remote)
+            create_intent = lambda intent: aio.run_blocking(shared.create, 'intent', intent, state=state,
+                                                            remote=remote, with_slots=False)
+        else:
+            create_slot_type = lambda slot_type: slot_type.create_async(state=state, remote=remote)
+            create_intent = lambda intent: intent.create_async(with_slots=False, state=state, remote=remote)
+
+        slot_types = self.get_slot_types()
+        with instrumentation.span('slot_types', count=len(slot_types)):
+            await run_tasks_async([('slot_type', name, lambda slot_type=slot_type: create_slot_type(slot_type))
+                                   for name, slot_type in slot_types.items()],
+                                  max_workers=max_workers, report=report)
+        failed_slot_types = report.failed_names('slot_type')
+
+        intent_tasks = []
+        for intent in self.IntentMeta.intents:
+            failed_dependencies = []
+            for slot in intent.slots:
+                if slot.slotType not in slot_types:
+                    continue
+                if slot.slotType in failed_slot_types:
+                    failed_dependencies.append(slot.slotType)
+                else:
+                    slot.slotTypeVersion = slot_types[slot.slotType].version
+            if failed_dependencies:
+                error = Exception("Slot types {} failed to deploy".format(', '.join(failed_dependencies)))
+                report.add(ResourceResult('intent', intent.name, error=error))
+            else:
+                intent_tasks.append(('intent', intent.name, lambda intent=intent: create_intent(intent)))
+        with instrumentation.span('intents', count=len(intent_tasks)):
+            await run_tasks_async(intent_tasks, max_workers=max_workers, report=report)
+
+        report.raise_for_failures()
+        return report
 
     def add_all_intents(self):
         for intent in self.get_all_intents():
@@ -352,30 +629,47 @@ class BotProperty(BaseModel):
         return self
 
     @classmethod
-    def wait_for_bot_build(cls, bot_name, version_name):
-        build_status = 'BUILDING'
-        response = {}
-        while build_status == 'BUILDING':
-            time.sleep(1)
-            response = lex_model.get_bot(name=bot_name, versionOrAlias=version_name)
-            logging.debug("get_bot: {}".format(pformat(response)))
-            build_status = response.get('status')
-
+    def is_bot_building(cls, response):
+        build_status = response.get('status')
         if build_status == 'FAILED' or build_status == 'NOT_BUILT':
-            raise Exception("Couldn't build {}. build_status: {}. failureReason: {}".format(bot_name, build_status,
+            raise Exception("Couldn't build {}. build_status: {}. failureReason: {}".format(response.get('name'),
+                                                                                            build_status,
                                                                                             response.get(
                                                                                                 'failureReason')))
-        return response
+        return build_status == 'BUILDING'
+
+    @classmethod
+    def get_build_poller(cls, bot_name, version_name, on_change=None, timeout=900):
+        """
+        :rtype: waiters.Poller
+        """
+        return waiters.Poller('bot', bot_name,
+                              poll=lambda: lex_model.get_bot(name=bot_name, versionOrAlias=version_name),
+                              is_pending=cls.is_bot_building, on_change=on_change, timeout=timeout)
+
+    @classmethod
+    def wait_for_bot_build(cls, bot_name, version_name, on_change=None, timeout=900):
+        return waiters.wait(cls.get_build_poller(bot_name, version_name, on_change=on_change, timeout=timeout))
+
+    @classmethod
+    async def wait_for_bot_build_async(cls, bot_name, version_name, on_change=None, timeout=900):
+        return await waiters.wait_async(cls.get_build_poller(bot_name, version_name, on_change=on_change,
+                                                             timeout=timeout))
 
     def delete_bot(self):
         raise NotImplementedError()
 
     @classmethod
-    def get_bot_alias_checksum(cls, bot_name, alias_name):
+    def get_bot_alias_checksum(cls, bot_name, alias_name, remote=None):
+        """
+        :type remote: RemoteState
+        """
+        if remote is not None:
+            return remote.get_alias_checksum(bot_name, alias_name)
         checksum = None
         try:
             response = lex_model.get_bot_alias(name=alias_name, botName=bot_name)
-            logging.info("get_bot_alias: {}".format(pformat(response)))
+            logging.debug("get_bot_alias: {} checksum {}".format(alias_name, response.get('checksum')))
             checksum = response.get('checksum')
         except ClientError as e:
             if e.response['Error']['Code'] != 'NotFoundException':
@@ -384,51 +678,153 @@ class BotProperty(BaseModel):
         return checksum
 
     @classmethod
-    def get_bot_checksum(cls, bot_name, versionOrAlias):
+    def get_bot_checksum(cls, bot_name, versionOrAlias, remote=None):
+        """
+        :type remote: RemoteState
+        """
+        if remote is not None and versionOrAlias == '$LATEST':
+            return remote.get_checksum('bot', bot_name)
         checksum = None
         try:
             response = lex_model.get_bot(name=bot_name, versionOrAlias=versionOrAlias)
-            logging.info("get_bot: {}".format(pformat(response)))
+            logging.debug("get_bot: {} checksum {}".format(bot_name, response.get('checksum')))
             checksum = response.get('checksum')
         except ClientError as e:
             if e.response['Error']['Code'] != 'NotFoundException':
                 raise
         return checksum
 
-    def create_alias(self, version, alias='prod'):
-        checksum = self.get_bot_alias_checksum(self.name, alias)
+    def create_alias(self, version, alias='prod', remote=None):
+        checksum = self.get_bot_alias_checksum(self.name, alias, remote)
         kwargs = utils.get_kwargs(checksum)
         response = lex_model.put_bot_alias(name=alias, botVersion=version, botName=self.name, **kwargs)
-        logging.info("put_bot_alias: {}".format(pformat(response)))
-
-    def create(self, async=False):
-        lambda_arn = self.deploy_cloudformation()
-        self.create_all_intents(lambda_arn)
-        self.add_all_intents()
+        logging.info("put_bot_alias: %s", instrumentation.Pretty(response))
+        if remote is not None:
+            remote.set_alias_checksum(self.name, alias, response.get('checksum'))
+
+    async def create_aliases_async(self, version, remote=None):
+        """
+        Points the dev alias to $LATEST and the prod alias to version
+        """
+        await asyncio.gather(aio.run_blocking(self.create_alias, '$LATEST', 'dev', remote),
+                             aio.run_blocking(self.create_alias, version, 'prod', remote))
+
+    def put_bot(self, primitive, remote=None, state=None):
+        """
+        Puts the bot and publishes a version of it, unless its newest version already holds primitive
+        :type remote: RemoteState
+        :type state: DeployState
+        """
+        reusable = self.get_reusable_version('bot', primitive, state, remote)
+        if reusable:
+            self.reuse_version('bot', reusable)
+            return
         logging.info("Creating bot: {}".format(self.name))
         # Get the old bot checksum if available
-        self.checksum = self.get_bot_checksum(self.name, '$LATEST')
+        self.checksum = self.get_bot_checksum(self.name, '$LATEST', remote)
 
-        kwargs = self.to_primitive()
+        kwargs = self.get_put_kwargs(primitive)
         # Build/Update the bot
         response = lex_model.put_bot(
             **kwargs
         )
         self.version = response.get('version')
-        logging.info("put_bot: {}".format(pformat(response)))
+        logging.info("put_bot: %s", instrumentation.Pretty(response))
         self.checksum = response.get('checksum')
-        try:
-            version_response = lex_model.create_bot_version(name=self.name, checksum=self.checksum)
-            logging.info("create_bot_version: {}".format(pformat(response)))
-            self.version = version_response.get('version')
-            self.checksum = version_response.get('checksum')
-        except ClientError as e:
-            logging.warning("Failed to create Bot Version", exc_info=1)
-
-        if not async:
-            self.wait_for_bot_build(self.name, self.version)
-            self.create_alias('$LATEST', 'dev')
-            self.create_alias(self.version, 'prod')
+        version_response = lex_model.create_bot_version(name=self.name, checksum=self.checksum)
+        logging.info("create_bot_version: %s", instrumentation.Pretty(version_response))
+        self.version = version_response.get('version')
+        self.checksum = version_response.get('checksum')
+
+    def collect_versions(self, keep=None, max_workers=None):
+        """
+        Blocking collect_versions_async
+        :rtype: DeployReport
+        """
+        return aio.run(self.collect_versions_async(keep=keep, max_workers=max_workers))
+
+    async def collect_versions_async(self, keep=None, max_workers=None):
+        """
+        Deletes the old versions of the bot, its intents and its slot types, see versions.VersionCollector
+        :param keep: newest versions retained, keep_versions by default
+        :rtype: DeployReport
+        """
+        collector = versions.VersionCollector(lex_model, keep=keep or self.keep_versions or versions.DEFAULT_KEEP,
+                                              max_workers=max_workers or self.max_workers)
+        return await collector.collect_async(self.name, [intent.name for intent in self.IntentMeta.intents],
+                                             list(self.get_slot_types()))
+
+    def check(self, limits=None):
+        """
+        Offline check of the whole definition against the Lex constraints, see validation.
+        Not named validate, which is schematics' field validation and is called by schematics itself
+        :return: every problem found, an empty list when the bot can be deployed
+        :rtype: list[validation.Problem]
+        """
+        return validation.validate_bot(self, limits)
+
+    def create(self, wait=True, max_workers=None, stack_index=None, remote=None, artifacts=None, shared=None,
+               validate=True):
+        """
+        Blocking create_async
+        """
+        return aio.run(self.create_async(wait=wait, max_workers=max_workers, stack_index=stack_index,
+                                         remote=remote, artifacts=artifacts, shared=shared, validate=validate))
+
+    async def create_async(self, wait=True, max_workers=None, stack_index=None, remote=None, artifacts=None,
+                           shared=None, validate=True):
+        """
+        Deploys the lambda stack, the slot types, the intents and the bot, then waits for the build and points the
+        aliases to the new version. Blocking calls run on the aio executor, so many bots can be awaited together.
+        Arguments after max_workers share work between the bots of a deployment, see orchestrator.Orchestrator
+
+        :param wait: False returns once the bot version is created, without waiting for the build or updating
+        the aliases
+        :param validate: raise validation.ValidationError before any packaging or API call when the definition
+        is invalid
+        :type stack_index: stacks.StackIndex
+        :type remote: RemoteState
+        :type artifacts: orchestrator.SharedArtifacts
+        :type shared: orchestrator.SharedResources
+        """
+        if validate:
+            with instrumentation.span('validate'):
+                validation.check_bot(self)
+        with instrumentation.span('deploy', bot=self.name):
+            lambda_arn = await aio.run_blocking(self.deploy_cloudformation, stack_index=stack_index,
+                                                artifacts=artifacts)
+            state = self.load_deploy_state()
+            if remote is None:
+                with instrumentation.span('remote_state'):
+                    remote = await aio.run_blocking(self.fetch_remote_state)
+            try:
+                await self.create_all_intents_async(lambda_arn, max_workers=max_workers, state=state,
+                                                    remote=remote, shared=shared)
+            finally:
+                if state:
+                    state.save()
+            self.add_all_intents()
+            primitive = self.to_primitive()
+            resource_hash = self.get_content_hash(primitive)
+            deployed = state.get_unchanged('bot', self.name, resource_hash, remote) if state else None
+            if deployed:
+                logging.info("Bot {} is unchanged, reusing version {}".format(self.name, deployed['version']))
+                self.checksum = deployed['checksum']
+                self.version = deployed['version']
+                return
+
+            with instrumentation.span('put_bot'):
+                await aio.run_blocking(self.put_bot, primitive, remote, state)
+            if wait:
+                with instrumentation.span('build_wait', version=self.version):
+                    await self.wait_for_bot_build_async(self.name, self.version)
+                with instrumentation.span('aliases'):
+                    await self.create_aliases_async(self.version, remote)
+                if state:
+                    state.record('bot', self.name, resource_hash, self.checksum, self.version)
+                    state.save()
+                if self.keep_versions:
+                    await self.collect_versions_async(max_workers=max_workers)
 
     @property
     def environment_variables(self):
@@ -450,53 +846,49 @@ class BotProperty(BaseModel):
     def lambda_alias(self):
         return 'production'
 
+    @property
+    def packaging_workers(self):
+        """
+        Number of threads compressing the lambda package. 1 compresses one file after the other
+        """
+        return 1
+
     @property
     def package_path(self):
         filepath = inspect.getfile(self.__class__)
         return os.path.dirname(filepath)
 
-    def deploy_cloudformation(self):
-        file_name = utils.upload_lambda(self.s3_bucket_name, self.package_path)
+    def deploy_cloudformation(self, stack_index=None, artifacts=None):
+        """
+        :type stack_index: stacks.StackIndex
+        :param artifacts: packages of a multi-bot deployment, uploading each distinct package only once
+        :type artifacts: orchestrator.SharedArtifacts
+        """
+        with instrumentation.span('package', path=self.package_path):
+            if artifacts is not None:
+                file_name = artifacts.upload(self.s3_bucket_name, self.package_path,
+                                             runtime=self.runtime, workers=self.packaging_workers)
+            else:
+                file_name = utils.upload_lambda(self.s3_bucket_name, self.package_path,
+                                                workers=self.packaging_workers, runtime=self.runtime)
         t = self.get_cloudformation_template(file_name)
-        template_path = 'template.json'
-        with open(template_path, 'w') as f:
-            f.write(t.to_json())
-
-        try:
-            utils.call(
-                'aws cloudformation deploy --template-file {} --stack-name {} --capabilities CAPABILITY_IAM --no-fail-on-empty-changeset'.format(
-                    template_path, self.stack_name))
-        except Exception as e:
-            pass
-
+        with instrumentation.span('stack_deploy', stack=self.stack_name):
+            stacks.deploy_stack(self.stack_name, t.to_json(), capabilities=['CAPABILITY_IAM'],
+                                bucket_name=self.s3_bucket_name, index=stack_index)
 
         lambda_func_id = utils.cloudformation.describe_stack_resource(StackName=self.stack_name,
                                                                       LogicalResourceId=self.name)[
             'StackResourceDetail']['PhysicalResourceId']
-        region = boto3.session.Session().region_name
+        region = clients.get_region()
         account = utils.get_account_number()
         lambda_arn = 'arn:aws:lambda:{region}:{account_id}:function:{resource_id}'.format(region=region,
                                                                                           account_id=account,
                                                                                           resource_id=lambda_func_id)
-        boto3session = boto3.session.Session()
-        awslambda = boto3.client('lambda')
-        """ :type : pyboto3.lambda_ """
-
-        for i, intent in enumerate(self.get_all_intents()):
-            try:
-                awslambda.add_permission(FunctionName='{}:{}'.format(lambda_arn, self.lambda_alias),
-                                     StatementId='{}PermissionToLexProduction'.format(intent.name),
-                                     Action='lambda:InvokeFunction',
-                                     SourceArn='arn:aws:lex:{aws_region}:{aws_account_id}:intent:{intent_name}:*'.format(
-                                         aws_region=boto3session.region_name,
-                                         aws_account_id=boto3.client('sts').get_caller_identity().get('Account'),
-                                         intent_name=intent.name
-                                     ),
-                                     Principal="lex.amazonaws.com",
-                                     )
-            except ClientError as e:
-                if e.response['Error']['Code'] != 'ResourceConflictException':
-                    raise
+        reconciler = PermissionReconciler(clients.get_client('lambda'),
+                                          '{}:{}'.format(lambda_arn, self.lambda_alias), region, account)
+        with instrumentation.span('lambda_permissions'):
+            reconciler.reconcile([intent.name for intent in self.get_all_intents()],
+                                 max_workers=self.max_workers).raise_for_failures()
         return lambda_arn
 
     def get_cloudformation_template(self, lambda_filename):
@@ -505,8 +897,9 @@ class BotProperty(BaseModel):
         from troposphere.awslambda import Permission
         from troposphere.serverless import Function
         t = Template()
-        t.add_description("Built with WavyCloud's pylexbuilder")
-        t.add_transform('AWS::Serverless-2016-10-31')
+        # troposphere 3 renamed add_description and add_transform
+        (getattr(t, 'set_description', None) or t.add_description)("Built with WavyCloud's pylexbuilder")
+        (getattr(t, 'set_transform', None) or t.add_transform)('AWS::Serverless-2016-10-31')
         lambda_func = t.add_resource(
             Function(
                 self.name,
@@ -0,0 +1,133 @@
+import logging
+import threading
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+
+def paginate(method, key, **kwargs):
+    """
+    Yields every item of a paged lex-models list call, e.g. paginate(lex_model.get_intents, 'intents')
+    """
+    kwargs.setdefault('maxResults', 50)
+    while True:
+        response = method(**kwargs)
+        for item in response.get(key, []):
+            yield item
+        next_token = response.get('nextToken')
+        if not next_token:
+            break
+        kwargs['nextToken'] = next_token
+
+
+def _get_slot_type(client, name):
+    return client.get_slot_type(name=name, version='$LATEST')
+
+
+def _get_intent(client, name):
+    return client.get_intent(name=name, version='$LATEST')
+
+
+def _get_bot(client, name):
+    return client.get_bot(name=name, versionOrAlias='$LATEST')
+
+
+class RemoteState(object):
+    """
+    Index by name of the slot types, intents, bots and bot aliases that exist in Lex, built from the
+    paged list APIs at the start of a deploy.
+
+    The list APIs return checksums for bot aliases only. For the other resources the index answers
+    whether they exist: resources that don't exist need no checksum at all, the $LATEST checksum of
+    existing ones is fetched on first use and cached for the rest of the deploy.
+    """
+    getters = {
+        'slot_type': _get_slot_type,
+        'intent': _get_intent,
+        'bot': _get_bot,
+    }
+
+    def __init__(self, client):
+        """
+        :type client: pyboto3.lexmodelbuildingservice
+        """
+        self.client = client
+        self.resources = {'slot_type': {}, 'intent': {}, 'bot': {}}
+        """ :type : dict[str, dict[str, dict]] """
+        self.bot_aliases = {}
+        """ :type : dict[str, dict[str, dict]] """
+        self._checksums = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def fetch(cls, client, bot_names=()):
+        """
+        :type client: pyboto3.lexmodelbuildingservice
+        :param bot_names: bots whose aliases are indexed as well
+        :rtype: RemoteState
+        """
+        remote = cls(client)
+        remote.resources['slot_type'] = {item['name']: item for item in paginate(client.get_slot_types, 'slotTypes')}
+        remote.resources['intent'] = {item['name']: item for item in paginate(client.get_intents, 'intents')}
+        remote.resources['bot'] = {item['name']: item for item in paginate(client.get_bots, 'bots')}
+        for bot_name in bot_names:
+            if bot_name in remote.resources['bot']:
+                aliases = paginate(client.get_bot_aliases, 'BotAliases', botName=bot_name)
+                remote.bot_aliases[bot_name] = {item['name']: item for item in aliases}
+        logger.info("Fetched remote state: {} slot types, {} intents, {} bots".format(
+            len(remote.resources['slot_type']), len(remote.resources['intent']), len(remote.resources['bot'])))
+        return remote
+
+    def exists(self, kind, name):
+        return name in self.resources[kind]
+
+    def confirms(self, kind, name, version):
+        """
+        Whether a version recorded in the deploy state can still be trusted: the resource exists, and a bot has an
+        alias pointing to version. The list APIs don't return the numbered versions of slot types and intents, their
+        existence is all the index can tell without a call per resource
+        """
+        if not self.exists(kind, name):
+            return False
+        if kind == 'bot':
+            aliases = self.bot_aliases.get(name, {}).values()
+            return any(alias.get('botVersion') == version for alias in aliases)
+        return True
+
+    def get_checksum(self, kind, name):
+        """
+        $LATEST checksum of a slot type, intent or bot, None if it doesn't exist
+        """
+        key = (kind, name)
+        with self._lock:
+            if key in self._checksums:
+                return self._checksums[key]
+        if not self.exists(kind, name):
+            return None
+        checksum = None
+        try:
+            checksum = self.getters[kind](self.client, name).get('checksum')
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NotFoundException':
+                raise
+        logger.debug("{} {} checksum: {}".format(kind, name, checksum))
+        self.set_checksum(kind, name, checksum)
+        return checksum
+
+    def set_checksum(self, kind, name, checksum):
+        """
+        Records the checksum returned by a put so the index stays valid for the rest of the deploy
+        """
+        with self._lock:
+            self._checksums[(kind, name)] = checksum
+            self.resources[kind].setdefault(name, {'name': name})
+
+    def get_alias_checksum(self, bot_name, alias_name):
+        alias = self.bot_aliases.get(bot_name, {}).get(alias_name)
+        return alias.get('checksum') if alias else None
+
+    def set_alias_checksum(self, bot_name, alias_name, checksum):
+        with self._lock:
+            aliases = self.bot_aliases.setdefault(bot_name, {})
+            aliases.setdefault(alias_name, {'name': alias_name, 'botName': bot_name})['checksum'] = checksum
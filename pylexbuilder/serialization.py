@@ -0,0 +1,270 @@
+"""
+Compiled construction and serialization of the definition models.
+
+schematics converts every field through its generic import and export loops, which dominates the time spent
+building and serializing bots with thousands of intents and slots. For models made of plain fields (strings,
+numbers, booleans, lists and nested models) the same results are produced here by per-class plans compiled on
+first use. Models using anything else (roles, setters, other field types) keep going through schematics.
+"""
+import threading
+
+from schematics.models import Model, ModelDict
+from schematics.types import BaseType, ListType, ModelType
+from schematics.undefined import Undefined
+
+try:
+    from schematics.common import DROP, NONEMPTY, NOT_NONE, DEFAULT
+except ImportError:
+    DROP, NONEMPTY, NOT_NONE, DEFAULT = 0, 1, 2, 10
+
+_MISSING = object()
+
+
+class _ExportContext(object):
+    export_level = None
+
+
+_EXPORT_CONTEXT = _ExportContext()
+
+
+class Unsupported(Exception):
+    pass
+
+
+def _unbound(method):
+    return getattr(method, '__func__', method)
+
+
+def is_plain_field(field):
+    return not getattr(field, 'is_compound', False) and \
+        _unbound(type(field).to_primitive) is _unbound(BaseType.to_primitive)
+
+
+def get_model_fields(model_class):
+    """
+    :return: (name, field) of every field, raising Unsupported when the model can't be compiled
+    """
+    schema = model_class._schema
+    options = getattr(schema, 'options', None) or schema._options
+    if options.roles or getattr(options, 'export_order', False):
+        raise Unsupported(model_class)
+    fields = []
+    for name, field in schema.fields.items():
+        if getattr(field, 'fset', None) is not None or field.serialized_name:
+            raise Unsupported(model_class)
+        fields.append((name, field))
+    return fields
+
+
+def flatten(data):
+    """
+    :param data: model data, a chain of the unsafe, converted and valid dicts
+    :return: dict with the values the model sees, without a ChainMap lookup per field
+    """
+    maps = getattr(data, 'maps', None)
+    if maps is None:
+        return data
+    maps = [mapping for mapping in maps if len(mapping)]
+    if len(maps) == 1 and isinstance(maps[0], dict):
+        return maps[0]
+    flat = {}
+    for mapping in reversed(maps):
+        flat.update(mapping)
+    return flat
+
+
+class FieldsDescriptor(object):
+    """
+    Model._fields without schematics' deprecation warning. Field assignments look it up every time
+    """
+
+    def __get__(self, instance, owner):
+        return owner._schema.fields
+
+
+# Exporters
+
+def compile_exporter(field):
+    """
+    :return: callable(value) -> primitive of a non None value of field
+    """
+    if isinstance(field, ModelType):
+        model_class = field.model_class
+
+        def export_model(value):
+            is_model = isinstance(value, Model)
+            serializer = get_serializer(type(value) if is_model else model_class)
+            if serializer is None:
+                return field.to_primitive(value)
+            return serializer(value._data if is_model else value)
+        return export_model
+
+    if isinstance(field, ListType):
+        export_item = compile_exporter(field.field)
+        level = field.field.get_export_level(_EXPORT_CONTEXT)
+        is_compound = getattr(field.field, 'is_compound', False)
+        if level == DROP:
+            return lambda value: []
+
+        def export_list(value):
+            data = []
+            for item in value:
+                shaped = export_item(item) if item is not None else None
+                if shaped is None:
+                    if level <= NOT_NONE:
+                        continue
+                elif is_compound and len(shaped) == 0:
+                    if level <= NONEMPTY:
+                        continue
+                data.append(shaped)
+            return data
+        return export_list
+
+    if is_plain_field(field):
+        return lambda value: value
+    raise Unsupported(field)
+
+
+def compile_serializer(model_class):
+    plan = []
+    for name, field in get_model_fields(model_class):
+        level = field.get_export_level(_EXPORT_CONTEXT)
+        if level != DROP:
+            plan.append((name, compile_exporter(field), level, getattr(field, 'is_compound', False)))
+
+    def serialize(data):
+        """
+        :param data: the model's data, or a dict standing in for the model
+        """
+        get = flatten(data).get
+        result = {}
+        for name, export, level, is_compound in plan:
+            value = get(name, _MISSING)
+            if value is _MISSING or value is Undefined:
+                if level <= DEFAULT:
+                    continue
+                value = None
+            elif value is None:
+                if level <= NOT_NONE:
+                    continue
+            else:
+                value = export(value)
+                if is_compound and len(value) == 0 and level <= NONEMPTY:
+                    continue
+            result[name] = value
+        return result
+    return serialize
+
+
+# Defaults
+
+def copy_value(field, value):
+    """
+    Copy of a default value as schematics' conversion makes it: nested models and lists are new objects
+    """
+    if value is None or value is Undefined:
+        return None
+    if isinstance(field, ModelType):
+        if isinstance(value, Model):
+            return copy_model(value)
+        return field.model_class(value)
+    if isinstance(field, ListType):
+        return [copy_value(field.field, item) for item in value]
+    return value
+
+
+def copy_model(model):
+    model_class = type(model)
+    defaults = get_defaults_builder(model_class)
+    if defaults is None:
+        return model_class(model)
+    data = flatten(model._data)
+    converted = {}
+    for name, field in model_class._schema.fields.items():
+        value = data.get(name, _MISSING)
+        converted[name] = copy_value(field, field.default if value is _MISSING else value)
+    clone = model_class.__new__(model_class)
+    clone._data = ModelDict(converted=converted)
+    initialize = getattr(clone, 'initialize', None)
+    if initialize is not None:
+        initialize()
+    return clone
+
+
+def compile_defaults_builder(model_class):
+    fields = get_model_fields(model_class)
+    for name, field in fields:
+        if not (isinstance(field, (ModelType, ListType)) or is_plain_field(field)):
+            raise Unsupported(field)
+
+    constants = {}
+    copied = []
+    for name, field in fields:
+        default = field._default
+        if callable(default) or isinstance(field, (ModelType, ListType)):
+            copied.append((name, field))
+        else:
+            constants[name] = None if default is Undefined else default
+
+    def build():
+        data = dict(constants)
+        for name, field in copied:
+            data[name] = copy_value(field, field.default)
+        return data
+    return build
+
+
+# Per class plans
+
+_serializers = {}
+_defaults_builders = {}
+_lock = threading.Lock()
+
+
+def _get_plan(plans, compile_plan, model_class):
+    try:
+        return plans[model_class]
+    except KeyError:
+        pass
+    try:
+        plan = compile_plan(model_class)
+    except Unsupported:
+        plan = None
+    with _lock:
+        return plans.setdefault(model_class, plan)
+
+
+def get_serializer(model_class):
+    """
+    :return: callable(data) -> the to_primitive() of a model of model_class given its data, None if unsupported
+    """
+    return _get_plan(_serializers, compile_serializer, model_class)
+
+
+def get_defaults_builder(model_class):
+    """
+    :return: callable() -> data of a model of model_class built without arguments, None if unsupported
+    """
+    return _get_plan(_defaults_builders, compile_defaults_builder, model_class)
+
+
+def init_model(model):
+    """
+    Initializes a model built without arguments with fresh copies of its defaults.
+    :return: False when the model has to be initialized by schematics
+    """
+    build = get_defaults_builder(type(model))
+    if build is None:
+        return False
+    model._data = ModelDict(converted=build())
+    return True
+
+
+def to_primitive(model):
+    """
+    Same as model.to_primitive() without role nor app_data
+    """
+    serializer = get_serializer(type(model))
+    if serializer is None:
+        return None
+    return serializer(model._data)
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from . import utils, waiters
+
+logger = logging.getLogger(__name__)
+
+# Bigger template bodies have to be passed as an S3 TemplateURL
+TEMPLATE_BODY_LIMIT = 51200
+
+
+class StackDeployError(Exception):
+    pass
+
+
+def canonical_template(template):
+    """
+    :param template: template body, as a JSON string or as the dict get_template returns for JSON templates
+    :return: JSON with sorted keys and no insignificant whitespace
+    """
+    if not isinstance(template, dict):
+        template = json.loads(template)
+    return json.dumps(template, sort_keys=True, separators=(',', ':'))
+
+
+def template_hash(template):
+    return hashlib.sha256(canonical_template(template).encode('utf-8')).hexdigest()
+
+
+def describe_stack(stack_name):
+    """
+    :return: the stack description, None if the stack doesn't exist
+    """
+    try:
+        return utils.cloudformation.describe_stacks(StackName=stack_name)['Stacks'][0]
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ValidationError' and 'does not exist' in e.response['Error']['Message']:
+            return None
+        raise
+
+
+class StackIndex(object):
+    """
+    Answers whether a stack exists and what its status is with one describe_stacks call per stack, cached
+    until invalidated. Create one per deploy session; full listings go through utils.list_stacks.
+    """
+
+    def __init__(self):
+        self._stacks = {}
+        self._lock = threading.Lock()
+
+    def get(self, stack_name, refresh=False):
+        """
+        :return: the stack description, None if the stack doesn't exist
+        """
+        with self._lock:
+            if not refresh and stack_name in self._stacks:
+                return self._stacks[stack_name]
+        description = describe_stack(stack_name)
+        self.update(stack_name, description)
+        return description
+
+    def update(self, stack_name, description):
+        with self._lock:
+            self._stacks[stack_name] = description
+
+    def invalidate(self, stack_name=None):
+        with self._lock:
+            if stack_name is None:
+                self._stacks.clear()
+            else:
+                self._stacks.pop(stack_name, None)
+
+    def exists(self, stack_name):
+        description = self.get(stack_name)
+        return description is not None and description['StackStatus'] != 'DELETE_COMPLETE'
+
+    def get_status(self, stack_name):
+        description = self.get(stack_name)
+        return description['StackStatus'] if description else None
+
+    def prefetch(self, stack_names):
+        """
+        Indexes stack_names from one paged describe_stacks of every stack, instead of one call per stack.
+        Worth it when a deploy session is about many stacks
+        """
+        stack_names = set(stack_names)
+        found = {}
+        kwargs = {}
+        while True:
+            response = utils.cloudformation.describe_stacks(**kwargs)
+            for description in response.get('Stacks', []):
+                if description['StackName'] in stack_names:
+                    found[description['StackName']] = description
+            kwargs['NextToken'] = response.get('NextToken')
+            if not kwargs['NextToken']:
+                break
+        with self._lock:
+            for stack_name in stack_names:
+                self._stacks[stack_name] = found.get(stack_name)
+
+    def list(self, status_filter=None):
+        """
+        Every stack summary, paginated. Only for when a full listing is really needed
+        """
+        return list(utils.list_stacks(status_filter))
+
+
+def get_deployed_template_hash(stack_name):
+    response = utils.cloudformation.get_template(StackName=stack_name, TemplateStage='Original')
+    try:
+        return template_hash(response['TemplateBody'])
+    except ValueError:
+        # Not a JSON template, it can't match one of ours
+        return None
+
+
+def is_stack_in_progress(description):
+    status = description['StackStatus']
+    if status.endswith('_FAILED') or status in ('ROLLBACK_COMPLETE', 'UPDATE_ROLLBACK_COMPLETE'):
+        raise StackDeployError("Stack {} failed: {}. {}".format(description['StackName'], status,
+                                                                 description.get('StackStatusReason', '')))
+    return status.endswith('_IN_PROGRESS')
+
+
+def get_stack_poller(stack_name, on_change=None, timeout=3600, raise_on_failure=True):
+    """
+    :param raise_on_failure: raise StackDeployError when the stack ends failed or rolled back
+    :rtype: waiters.Poller
+    """
+    if raise_on_failure:
+        is_pending = is_stack_in_progress
+    else:
+        is_pending = lambda description: description['StackStatus'].endswith('_IN_PROGRESS')
+    return waiters.Poller('stack', stack_name,
+                          poll=lambda: utils.cloudformation.describe_stacks(StackName=stack_name)['Stacks'][0],
+                          is_pending=is_pending,
+                          get_status=lambda description: description['StackStatus'],
+                          on_change=on_change, delay=2.0, max_delay=15.0, timeout=timeout)
+
+
+def get_template_kwargs(stack_name, template_body, bucket_name=None, template_sha256=None):
+    if len(template_body.encode('utf-8')) <= TEMPLATE_BODY_LIMIT:
+        return {'TemplateBody': template_body}
+    if not bucket_name:
+        raise StackDeployError("Template of {} is bigger than {} bytes and needs a bucket to be uploaded to".format(
+            stack_name, TEMPLATE_BODY_LIMIT))
+    key = 'templates/{}-{}.json'.format(stack_name, template_sha256 or template_hash(template_body))
+    utils.s3.put_object(Bucket=bucket_name, Key=key, Body=template_body.encode('utf-8'))
+    return {'TemplateURL': 'https://{}.s3.amazonaws.com/{}'.format(bucket_name, key)}
+
+
+def deploy_stack(stack_name, template_body, capabilities=('CAPABILITY_IAM',), parameters=None, bucket_name=None,
+                 on_change=None, timeout=3600, index=None):
+    """
+    Creates or updates a stack through a change set, waiting until it's done.
+    Nothing is done when the canonical form of the template equals the template currently deployed.
+
+    :param template_body: JSON template
+    :param bucket_name: bucket templates over TEMPLATE_BODY_LIMIT are uploaded to
+    :param on_change: status change callback of the waiters, see waiters.Poller
+    :param index: StackIndex of the deploy session, kept up to date with the deployed stack
+    :type index: StackIndex
+    :return: the stack description, None if nothing had to be deployed
+    """
+    index = index or StackIndex()
+    stack = index.get(stack_name)
+    sha256 = template_hash(template_body)
+    if stack and stack['StackStatus'].endswith('_IN_PROGRESS') and stack['StackStatus'] != 'REVIEW_IN_PROGRESS':
+        logger.info("Waiting for the ongoing {} of stack {}".format(stack['StackStatus'], stack_name))
+        stack = waiters.wait(get_stack_poller(stack_name, on_change, timeout, raise_on_failure=False))
+        index.update(stack_name, stack)
+    # Checked after the wait as well, an ongoing creation can end rolled back
+    if stack and stack['StackStatus'] == 'ROLLBACK_COMPLETE':
+        raise StackDeployError("Stack {} failed to create and must be deleted before it can be deployed".format(
+            stack_name))
+    if stack and stack['StackStatus'] != 'REVIEW_IN_PROGRESS':
+        if not parameters and get_deployed_template_hash(stack_name) == sha256:
+            logger.info("Skipping deploy of stack {}, template is unchanged".format(stack_name))
+            return None
+        changeset_type = 'UPDATE'
+    else:
+        changeset_type = 'CREATE'
+
+    changeset_name = 'pylexbuilder-{}'.format(time.strftime("%Y-%m-%dT%H-%M-%S"))
+    logger.info("Creating {} change set {} for stack {}".format(changeset_type, changeset_name, stack_name))
+    utils.cloudformation.create_change_set(StackName=stack_name, ChangeSetName=changeset_name,
+                                           ChangeSetType=changeset_type, Capabilities=list(capabilities),
+                                           Parameters=parameters or [],
+                                           **get_template_kwargs(stack_name, template_body, bucket_name, sha256))
+    description = waiters.wait(utils.get_changeset_poller(stack_name, changeset_name, on_change))
+    if utils.changset_is_empty(description):
+        logger.info("Stack {} has no changes".format(stack_name))
+        utils.cloudformation.delete_change_set(StackName=stack_name, ChangeSetName=changeset_name)
+        return index.get(stack_name, refresh=True)
+
+    utils.cloudformation.execute_change_set(StackName=stack_name, ChangeSetName=changeset_name)
+    try:
+        stack = waiters.wait(get_stack_poller(stack_name, on_change, timeout))
+    except Exception:
+        index.invalidate(stack_name)
+        raise
+    finally:
+        utils.get_stack_output_dict.invalidate(stack_name)
+    index.update(stack_name, stack)
+    return stack
@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(primitive):
+    """
+    sha256 of the canonical JSON form of a model primitive
+    :type primitive: dict
+    :rtype: str
+    """
+    canonical = json.dumps(primitive, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class DeployState(object):
+    """
+    Hash, checksum and version of every resource as it was last deployed, persisted as a JSON file:
+
+        {
+            'slot_type': {'FlowerTypes': {'hash': '...', 'checksum': '...', 'version': '3'}},
+            'intent': {...},
+            'bot': {...}
+        }
+    """
+
+    def __init__(self, path=None, resources=None):
+        self.path = path
+        self.resources = resources or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        resources = None
+        if os.path.exists(path):
+            try:
+                with open(path) as f:
+                    resources = json.load(f)
+            except ValueError:
+                logger.warning("Ignoring corrupt deploy state file {}".format(path))
+        return cls(path, resources)
+
+    def save(self, path=None):
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_path = '{}.tmp'.format(path)
+        with self._lock:
+            with open(temp_path, 'w') as f:
+                json.dump(self.resources, f, indent=4, sort_keys=True)
+        # Atomic, a crash leaves either the previous state or the new one
+        os.replace(temp_path, path)
+
+    def get(self, kind, name):
+        with self._lock:
+            return self.resources.get(kind, {}).get(name)
+
+    def get_unchanged(self, kind, name, resource_hash, remote=None):
+        """
+        :param remote: when given, the record is only trusted if Lex still has the recorded version, see
+        RemoteState.confirms
+        :type remote: remote.RemoteState
+        :return: the recorded {'hash', 'checksum', 'version'} if the resource was deployed with this hash, else None
+        """
+        record = self.get(kind, name)
+        if not record or record.get('hash') != resource_hash or not record.get('version'):
+            return None
+        if remote is not None and not remote.confirms(kind, name, record['version']):
+            logger.info("{} {} version {} is not in Lex, ignoring its deploy state".format(
+                kind, name, record['version']))
+            return None
+        return record
+
+    def record(self, kind, name, resource_hash, checksum, version):
+        with self._lock:
+            self.resources.setdefault(kind, {})[name] = {
+                'hash': resource_hash,
+                'checksum': checksum,
+                'version': version,
+            }
+
+    def forget(self, kind, name):
+        with self._lock:
+            self.resources.get(kind, {}).pop(name, None)
@@ -0,0 +1,74 @@
+import logging
+import os
+import threading
+
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+MULTIPART_THRESHOLD = 16 * MB
+MULTIPART_CHUNKSIZE = 16 * MB
+MAX_CONCURRENCY = 10
+
+
+def get_transfer_config(multipart_chunksize=MULTIPART_CHUNKSIZE, max_concurrency=MAX_CONCURRENCY,
+                        multipart_threshold=MULTIPART_THRESHOLD):
+    """
+    The client uploading with this config should have at least max_concurrency pooled connections
+    :rtype: TransferConfig
+    """
+    return TransferConfig(multipart_threshold=multipart_threshold, multipart_chunksize=multipart_chunksize,
+                          max_concurrency=max_concurrency)
+
+
+class ProgressCallback(object):
+    """
+    upload_file Callback, called from the transfer threads with the bytes sent since the last call.
+    Forwards the running total to callback(path, bytes_sent, total_bytes), or logs every 25% without one
+    """
+
+    def __init__(self, path, callback=None):
+        self.path = path
+        self.callback = callback
+        self.total = os.path.getsize(path)
+        self.sent = 0
+        self._logged_quarter = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, bytes_amount):
+        with self._lock:
+            self.sent += bytes_amount
+            sent = self.sent
+        if self.callback:
+            self.callback(self.path, sent, self.total)
+        elif self.total:
+            quarter = sent * 4 // self.total
+            if quarter > self._logged_quarter:
+                self._logged_quarter = quarter
+                logger.info("Uploaded {}% of {}".format(quarter * 25, self.path))
+
+
+def object_exists(client, bucket, key):
+    """
+    :type client: pyboto3.s3
+    """
+    try:
+        client.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+    return True
+
+
+def upload_file(client, path, bucket, key, config=None, progress=None):
+    """
+    Uploads with multipart parts sent concurrently over the client's connection pool
+    :type client: pyboto3.s3
+    :type config: TransferConfig
+    :param progress: callable(path, bytes_sent, total_bytes)
+    """
+    client.upload_file(path, bucket, key, Config=config or get_transfer_config(),
+                       Callback=ProgressCallback(path, progress))
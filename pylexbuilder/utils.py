@@ -1,4 +1,4 @@
-import hashlib
+import base64
 import json
 import logging
 import os
@@ -7,12 +7,14 @@ import shutil
 import subprocess
 import tempfile
 import time
-import zipfile
 from pprint import pformat
 
-import boto3
 from troposphere import Join, Ref, AWS_REGION, AWS_ACCOUNT_ID
 
+from . import clients, instrumentation, packaging, transfer, waiters
+from .caching import memoize
+from .packaging import ManifestCache
+
 
 def get_kwargs(checksum):
     kwargs = {}
@@ -24,9 +26,11 @@ def get_kwargs(checksum):
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-s3 = boto3.client('s3')
+s3 = clients.LazyClient('s3')
 """ :type : pyboto3.s3"""
-cloudformation = boto3.client('cloudformation')
+transfer_config = transfer.get_transfer_config()
+""" :type : boto3.s3.transfer.TransferConfig"""
+cloudformation = clients.LazyClient('cloudformation')
 """ :type : pyboto3.cloudformation"""
 
 
@@ -46,16 +50,7 @@ def create_api_endpoint_url(rest_api, stage_name):
 
 
 def hashfile(path):
-    import base64
-    base64.b64encode(open(path, 'rb').read())
-    sha256 = hashlib.sha256()
-    with open(path, 'rb') as f:
-        while True:
-            data = f.read()
-            if not data:
-                break
-            sha256.update(data)
-    return base64.b64encode(sha256.digest())
+    return base64.b64encode(packaging.hash_file(path).digest()).decode('ascii')
 
 
 def normalize_arcname(arcname):
@@ -65,63 +60,68 @@ def normalize_arcname(arcname):
     return arcname
 
 
-def zipdir(directory_path):
-    tempdir = tempfile.gettempdir()
+def zipdir(directory_path, workers=1):
+    return zipdir_with_sha256(directory_path, workers)[0]
+
+
+def zipdir_with_sha256(directory_path, workers=1, dist_dir=None):
+    """
+    :param workers: number of threads compressing files, 1 compresses them one after the other
+    :param dist_dir: directory the zip is written to, the temp directory by default
+    :return: path of the zip and the base64 sha256 of it, hashed while the zip is written
+    """
+    tempdir = dist_dir or tempfile.gettempdir()
     file_name = '{}.zip'.format(os.path.basename(directory_path))
     dist_file_path = os.path.join(tempdir, file_name)
     logger.debug("zipping {} to {}".format(directory_path, dist_file_path))
-    with zipfile.ZipFile(dist_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        # ziph is zipfile handle
-        for root, dirs, files in os.walk(directory_path):
-            for file in files:
-                filepath = os.path.join(root, file)
-                filepath_in_zip = normalize_arcname(os.path.join(root.replace(directory_path, ''), file))
-                info = zipfile.ZipInfo(filepath_in_zip)
-                info.compress_type = zipfile.ZIP_DEFLATED
-                info.create_system = 0
-                with open(filepath, 'rb') as fp_byte:
-                    zipf.writestr(info, fp_byte.read())
-                    # logger.debug("writing {} as {}".format(filepath, filepath_in_zip))
-                    # zipf.write(filepath, filepath_in_zip)
-        return dist_file_path
+    with instrumentation.span('zip', path=directory_path) as details:
+        digest = packaging.write_zip(dist_file_path, packaging.walk_files(directory_path), workers=workers)
+        details['bytes'] = os.path.getsize(dist_file_path)
+    return dist_file_path, base64.b64encode(digest).decode('ascii')
 
 
 def object_exists_in_s3(bucket, key):
-    s3 = boto3.resource('s3')
-    import botocore.exceptions
-    try:
-        s3.Object(bucket, key).load()
-    except botocore.exceptions.ClientError as e:
-        if e.response['Error']['Code'] == "404":
-            return False
-        else:
-            raise
-    else:
-        return True
+    return transfer.object_exists(s3, bucket, key)
 
 
-def zipdir_and_upload_to_s3(directory_path, bucket_name):
-    import base64
-    zip_filepath = zipdir(directory_path)
-    sha256 = hashfile(zip_filepath)
-    dir_name = os.path.basename(directory_path)
-    s3_filename = '{}_{}.zip'.format(dir_name, base64.urlsafe_b64encode(sha256))
-    zip_dirpath = os.path.dirname(zip_filepath)
-    zip_filepath_sha256 = os.path.join(zip_dirpath, s3_filename)
+def get_package_key(directory_path, sha256):
+    """
+    :param sha256: base64 sha256 of the package zip
+    :return: S3 key of the zip of directory_path
+    """
+    return '{}_{}.zip'.format(os.path.basename(directory_path),
+                              base64.urlsafe_b64encode(sha256.encode('ascii')).decode('ascii'))
+
 
+def upload_zip_to_s3(zip_filepath, bucket_name, s3_filename, progress=None):
+    """
+    Uploads zip_filepath as s3_filename unless the bucket already has it
+    :param progress: callable(path, bytes_sent, total_bytes) called while uploading
+    """
     if object_exists_in_s3(bucket_name, s3_filename):
         logging.info(
             "Skipping upload '{}' because file already exists in s3 bucket '{}'".format(s3_filename, bucket_name))
-        return s3_filename, sha256
-    else:
-        import shutil
-        shutil.move(zip_filepath, zip_filepath_sha256)
-        logger.info("Uploading '{}' to S3 Bucket '{}' as {}".format(zip_filepath_sha256, bucket_name, s3_filename))
-        # noinspection PyArgumentList
-        s3.upload_file(zip_filepath_sha256, bucket_name, s3_filename)
+        return False
+    logger.info("Uploading '{}' to S3 Bucket '{}' as {}".format(zip_filepath, bucket_name, s3_filename))
+    with instrumentation.span('upload', key=s3_filename, bytes=os.path.getsize(zip_filepath)):
+        transfer.upload_file(s3, zip_filepath, bucket_name, s3_filename, transfer_config, progress)
+    return True
+
+
+def zipdir_and_upload_to_s3(directory_path, bucket_name, workers=1, progress=None):
+    """
+    :param progress: callable(path, bytes_sent, total_bytes) called while uploading
+    """
+    zip_filepath, sha256 = zipdir_with_sha256(directory_path, workers)
+    s3_filename = get_package_key(directory_path, sha256)
+    zip_dirpath = os.path.dirname(zip_filepath)
+    zip_filepath_sha256 = os.path.join(zip_dirpath, s3_filename)
+
+    shutil.move(zip_filepath, zip_filepath_sha256)
+    if upload_zip_to_s3(zip_filepath_sha256, bucket_name, s3_filename, progress):
         logger.debug('sha256 of {} is {}'.format(zip_filepath_sha256, sha256))
         logger.debug('S3 key of {} is {}'.format(zip_filepath_sha256, s3_filename))
-        return s3_filename, sha256
+    return s3_filename, sha256
 
 
 def get_bucket_keys_list(bucket_name):
@@ -130,64 +130,75 @@ def get_bucket_keys_list(bucket_name):
 
 
 def zip_file(file_path):
+    return zip_file_with_sha256(file_path)[0]
+
+
+def zip_file_with_sha256(file_path):
+    """
+    :return: path of the zip and the base64 sha256 of it, hashed while the zip is written
+    """
     file_name = os.path.basename(file_path)
     tempdir = tempfile.gettempdir()
     temp_zip_path = os.path.join(tempdir, '{}.zip'.format(file_name))
     logger.debug("Zipping {} into {} ".format(file_path, temp_zip_path))
-    zipf = zipfile.ZipFile(temp_zip_path, 'w', zipfile.ZIP_DEFLATED)
-    zipf.write(file_path, os.path.basename(file_path))
-    zipf.close()
-    return temp_zip_path
+    digest = packaging.write_zip(temp_zip_path, [(file_path, file_name)])
+    return temp_zip_path, base64.b64encode(digest).decode('ascii')
 
 
-def zip_and_upload_file_to(bucket_name, file_path):
+def zip_and_upload_file_to(bucket_name, file_path, progress=None):
+    """
+    :param progress: callable(path, bytes_sent, total_bytes) called while uploading
+    """
     file_name = os.path.basename(file_path)
-    temp_zip_path = zip_file(file_path)
-    sha256 = hashfile(temp_zip_path)
+    temp_zip_path, sha256 = zip_file_with_sha256(file_path)
     logger.debug('sha256 of {} is {}'.format(temp_zip_path, sha256))
     s3_file_name = '{}_{}.zip'.format(file_name, sha256)
-    # noinspection PyArgumentList
-    s3.upload_file(temp_zip_path, bucket_name, s3_file_name)
+    if object_exists_in_s3(bucket_name, s3_file_name):
+        logger.info(
+            "Skipping upload '{}' because file already exists in s3 bucket '{}'".format(s3_file_name, bucket_name))
+        return s3_file_name, sha256
+    transfer.upload_file(s3, temp_zip_path, bucket_name, s3_file_name, transfer_config, progress)
     return s3_file_name, sha256
 
 
 def run_once(function):
-    from functools import wraps
-    cache = {}
-
-    @wraps(function)
-    def wrapper(*args, **kwargs):
-        key = '{}-{}-{}'.format(id(function), str(args), str(kwargs))
-        try:
-            val = cache[key]
-            if val == 'EXECUTING':
-                raise Exception("Infinite loop might happen")
-            return val
-        except KeyError as e:
-            cache[key] = 'EXECUTING'
-            ret_val = function(*args, **kwargs)
-            cache[key] = ret_val
-            return ret_val
-
-    return wrapper
+    """
+    Caches every result of function forever. Prefer caching.memoize, which bounds the cache
+    """
+    return memoize(maxsize=None, key=lambda *args, **kwargs: (str(args), str(kwargs)))(function)
+
+
+ACTIVE_STACK_STATUSES = [
+    'CREATE_IN_PROGRESS', 'CREATE_FAILED', 'CREATE_COMPLETE', 'ROLLBACK_IN_PROGRESS', 'ROLLBACK_FAILED',
+    'ROLLBACK_COMPLETE', 'DELETE_IN_PROGRESS', 'DELETE_FAILED', 'UPDATE_IN_PROGRESS',
+    'UPDATE_COMPLETE_CLEANUP_IN_PROGRESS', 'UPDATE_COMPLETE', 'UPDATE_ROLLBACK_IN_PROGRESS',
+    'UPDATE_ROLLBACK_FAILED', 'UPDATE_ROLLBACK_COMPLETE_CLEANUP_IN_PROGRESS', 'UPDATE_ROLLBACK_COMPLETE',
+    'REVIEW_IN_PROGRESS',
+]
+
+
+def list_stacks(status_filter=None):
+    """
+    Yields the summary of every stack, following NextToken. To look up known stacks use stacks.StackIndex
+    """
+    kwargs = {'StackStatusFilter': status_filter or ACTIVE_STACK_STATUSES}
+    while True:
+        response = cloudformation.list_stacks(**kwargs)
+        for summary in response.get('StackSummaries', []):
+            yield summary
+        next_token = response.get('NextToken')
+        if not next_token:
+            break
+        kwargs['NextToken'] = next_token
 
 
 def get_stacks_by(var='StackName'):
-    StackStatusFilter = [
-        'CREATE_IN_PROGRESS', 'CREATE_FAILED', 'CREATE_COMPLETE', 'ROLLBACK_IN_PROGRESS', 'ROLLBACK_FAILED',
-        'ROLLBACK_COMPLETE', 'DELETE_IN_PROGRESS', 'DELETE_FAILED', 'DELETE_COMPLETE', 'UPDATE_IN_PROGRESS',
-        'UPDATE_COMPLETE_CLEANUP_IN_PROGRESS', 'UPDATE_COMPLETE', 'UPDATE_ROLLBACK_IN_PROGRESS',
-        'UPDATE_ROLLBACK_FAILED', 'UPDATE_ROLLBACK_COMPLETE_CLEANUP_IN_PROGRESS', 'UPDATE_ROLLBACK_COMPLETE',
-    ]
-    StackStatusFilter.remove('DELETE_COMPLETE')
-    stacks = cloudformation.list_stacks(StackStatusFilter=StackStatusFilter)
-    stacks = [stack.get(var) for stack in stacks.get('StackSummaries')]
-    return stacks
+    return [stack.get(var) for stack in list_stacks()]
 
 
 def changset_is_empty(changeset_description):
     status = changeset_description.get('StatusReason', '')
-    if re.search(r"The submitted information didn't contain changes", status, re.IGNORECASE):
+    if re.search(r"The submitted information didn't contain changes|No updates are to be performed", status, re.IGNORECASE):
         return True
     else:
         return False
@@ -219,28 +230,38 @@ def changeset_has_delete(changeset_description):
         return False
 
 
+def get_changeset_poller(stack_name, changeset_name, on_change=None, timeout=900):
+    """
+    :rtype: waiters.Poller
+    """
+    return waiters.Poller('changeset', '{}/{}'.format(stack_name, changeset_name),
+                          poll=lambda: cloudformation.describe_change_set(ChangeSetName=changeset_name,
+                                                                          StackName=stack_name),
+                          is_pending=changeset_is_pending,
+                          get_status=lambda description: description.get('Status'),
+                          on_change=on_change, timeout=timeout)
+
+
 def deploy_template(template):
     """
 
     :type template: WavycloudStack
     :return: cloudformation waiter object
     """
+    from .stacks import StackIndex
     stack_name = template.stack_name
-    logger.debug(pformat(get_stacks_by()))
-    logger.debug(pformat(json.loads(template.to_json())))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(pformat(json.loads(template.to_json())))
     policy = template.get_template_policy()
     cloudformation.validate_template(TemplateBody=template.to_json())
-    if stack_name in get_stacks_by():
+    if StackIndex().exists(stack_name):
         logger.info("Updating Stack: {}".format(stack_name))
         changeset_name = 'changeset-{}'.format(time.strftime("%Y-%m-%dT%H-%M-%S"))
         cloudformation.create_change_set(StackName=stack_name,
                                          TemplateBody=template.to_json(),
                                          ChangeSetName=changeset_name, Capabilities=['CAPABILITY_IAM'],
                                          Parameters=template.get_secret_params())
-        changeset_description = cloudformation.describe_change_set(ChangeSetName=changeset_name, StackName=stack_name)
-        while changeset_is_pending(changeset_description):
-            changeset_description = cloudformation.describe_change_set(ChangeSetName=changeset_name,
-                                                                       StackName=stack_name)
+        changeset_description = waiters.wait(get_changeset_poller(stack_name, changeset_name))
 
         if changeset_has_delete(changeset_description):
             raise Exception("Changeset '{}' has Remove action. Please review and execute change manually")
@@ -302,6 +323,8 @@ def generate_python_env(filepath, **kwargs):
         s.write(code)
 
 
+@memoize(maxsize=32, ttl=300,
+         key=lambda stack_name: (stack_name, clients.factory.region, clients.factory.profile))
 def get_stack_output_dict(stack_name):
     response = cloudformation.describe_stacks(StackName=stack_name)
     outputs = response['Stacks'][0]['Outputs']
@@ -377,33 +400,40 @@ def get_arn(resource, resource_type=None, suffix=None):
     return Join("", ['arn:aws:', service, ':', Ref(AWS_REGION), ':', Ref(AWS_ACCOUNT_ID), ':', Ref(resource)] + suffix)
 
 
-def call(cmd):
+def call(cmd, cwd=None):
     logger.info("Executing '{}'".format(cmd))
-    returncode = subprocess.call(cmd, shell=True)
+    returncode = subprocess.call(cmd, shell=True, cwd=cwd)
     if returncode != 0:
         raise subprocess.CalledProcessError(returncode, cmd)
 
 
-def install_packages(directory, packages_directory):
-    import tempfile
-    from distutils.dir_util import mkpath
+dependency_cache = packaging.DependencyCache()
+""" :type : packaging.DependencyCache, rooted in the temp directory current when it is used"""
+
+
+def pip_install(requirements, target_directory, cwd=None):
+    cache_dir = os.path.join(tempfile.gettempdir(), 'pip_cache')
+    makedirs(cache_dir)
+    call('pip install -r {} -t {} --cache-dir {} --ignore-installed --upgrade --no-compile'.format(
+        requirements, target_directory, cache_dir), cwd=cwd)
+
+
+def install_packages(directory, packages_directory, runtime=None):
+    """
+    Installs requirements.txt of directory into packages_directory from the dependency cache, which builds
+    them with pip on a miss. The cache is keyed by the content of requirements.txt and the runtime
+    """
+    directory = os.path.abspath(directory)
+    packages_directory = os.path.abspath(packages_directory)
     requirements = os.path.join(directory, 'requirements.txt')
     if not os.path.exists(requirements):
         logging.info("Package {} has no requirements.txt. Skipping pacakges install".format(directory))
         return
-    cache_dir = os.path.join(tempfile.gettempdir(), 'pip_cache')
-    mkpath(cache_dir)
-    current_cwd = os.getcwd()
-    logging.info("current working directory: {}".format(current_cwd))
-    try:
-        logging.info("Changing current working directory to: {}".format(directory))
-        os.chdir(directory)
-        call('pip install -r {} -t {} --cache-dir {} --ignore-installed --upgrade'.format(requirements,
-                                                                                          packages_directory,
-                                                                                          cache_dir))
-    finally:
-        logging.info("Reverting current working directory to: {}".format(current_cwd))
-        os.chdir(current_cwd)
+    key = packaging.requirements_key(requirements, runtime)
+    with instrumentation.span('pip_install', requirements=requirements):
+        dependency_cache.restore(key, packages_directory,
+                                 build=lambda build_directory: pip_install(requirements, build_directory,
+                                                                           cwd=directory))
 
 
 def remove_pycs(directory):
@@ -422,19 +452,20 @@ def remove_dist_and_egg(directory):
             shutil.rmtree(os.path.join(directory, file))
 
 
-def prepare_python_package(directory, subfolder='packages'):
+def prepare_python_package(directory, subfolder='packages', runtime=None):
     if subfolder:
         packages_directory = os.path.join(directory, subfolder)
         # shutil.rmtree(packages_directory, ignore_errors=True)
     else:
         packages_directory = directory
-    install_packages(directory, packages_directory)
+    install_packages(directory, packages_directory, runtime)
     # remove_dist_and_egg(packages_directory)
     remove_pycs(directory)
 
 
+@memoize(maxsize=8, key=lambda: clients.factory.profile)
 def get_account_number():
-    return boto3.client('sts').get_caller_identity().get('Account')
+    return clients.get_client('sts').get_caller_identity().get('Account')
 
 
 def remove_duplicates(seq):
@@ -444,8 +475,25 @@ def remove_duplicates(seq):
     return [x for x in seq if not (x in seen or seen_add(x))]
 
 
-def upload_lambda(bucket_name, target_dir):
-    prepare_python_package(target_dir)
+def upload_lambda(bucket_name, target_dir, manifest=None, workers=1, runtime=None):
+    """
+    Packages and uploads target_dir unless a package with the same fingerprint was already uploaded to the bucket
+    :type manifest: ManifestCache
+    :param workers: number of threads compressing the package
+    :param runtime: lambda runtime the dependencies are built for
+    :return: S3 key of the package
+    """
+    prepare_python_package(target_dir, runtime=runtime)
+    manifest = manifest or ManifestCache.load()
+    with instrumentation.span('hash', path=target_dir):
+        fingerprint = manifest.fingerprint(target_dir)
+    s3_key = manifest.get_artifact(fingerprint, bucket_name)
+    if s3_key:
+        logger.info("Skipping packaging of '{}', unchanged since it was uploaded as '{}'".format(target_dir, s3_key))
+        manifest.save()
+        return s3_key
     s3.create_bucket(Bucket=bucket_name)
-    file_name, sha256 = zipdir_and_upload_to_s3(target_dir, bucket_name=bucket_name)
+    file_name, sha256 = zipdir_and_upload_to_s3(target_dir, bucket_name=bucket_name, workers=workers)
+    manifest.set_artifact(fingerprint, bucket_name, file_name)
+    manifest.save()
     return file_name
@@ -0,0 +1,149 @@
+"""
+Sample utterances generated from templates.
+
+"I'd like {to order|to buy|} {@flowers} {FlowerType}" expands to every combination of the alternatives between
+braces, "{@flowers}" to every phrase of the synonym list named flowers, and slot references like "{FlowerType}"
+are kept as they are. Expansion is lazy: nothing but the requested utterances is ever built.
+"""
+import itertools
+import random
+import re
+import sys
+
+# Longest utterance Lex accepts
+MAX_UTTERANCE_LENGTH = 200
+
+_GROUP = re.compile(r'\{([^{}]*)\}')
+
+
+def normalize(utterance):
+    """
+    Collapses the whitespace left around empty alternatives
+    """
+    return ' '.join(utterance.split())
+
+
+def unique(utterances, key=None, exclude=()):
+    """
+    Yields the utterances in order, skipping the ones already seen
+    :param key: callable giving what makes two utterances the same, e.g. str.lower
+    :param exclude: utterances skipped as if they had been seen already
+    """
+    seen = set(key(utterance) if key else utterance for utterance in exclude)
+    seen_add = seen.add
+    for utterance in utterances:
+        marker = key(utterance) if key else utterance
+        if marker not in seen:
+            seen_add(marker)
+            yield utterance
+
+
+class Template(object):
+    """
+    :param synonyms: phrase lists referenced as {@name}, keyed by name
+    """
+
+    def __init__(self, text, synonyms=None):
+        self.text = text
+        self.parts = []
+        position = 0
+        for match in _GROUP.finditer(text):
+            if match.start() > position:
+                self.parts.append((text[position:match.start()],))
+            group = match.group(1)
+            if '|' in group:
+                self.parts.append(tuple(group.split('|')))
+            elif group.startswith('@'):
+                try:
+                    self.parts.append(tuple(synonyms[group[1:]]))
+                except (KeyError, TypeError):
+                    raise ValueError("Template '{}' uses the undefined synonym list '{}'".format(text, group[1:]))
+            else:
+                self.parts.append((match.group(0),))
+            position = match.end()
+        if position < len(text):
+            self.parts.append((text[position:],))
+
+    @property
+    def count(self):
+        """
+        Number of utterances the template expands to, before deduplication
+        """
+        count = 1
+        for alternatives in self.parts:
+            count *= len(alternatives)
+        return count
+
+    def __iter__(self):
+        for combination in itertools.product(*self.parts):
+            yield normalize(''.join(combination))
+
+    def get(self, index):
+        """
+        :return: the index-th utterance of the expansion, without expanding the others
+        """
+        chosen = []
+        for alternatives in reversed(self.parts):
+            index, choice = divmod(index, len(alternatives))
+            chosen.append(alternatives[choice])
+        return normalize(''.join(reversed(chosen)))
+
+
+def get_templates(templates, synonyms=None):
+    return [template if isinstance(template, Template) else Template(template, synonyms) for template in templates]
+
+
+def expand(templates, synonyms=None):
+    """
+    Yields every utterance of the templates, in order
+    """
+    return itertools.chain.from_iterable(get_templates(templates, synonyms))
+
+
+def sample(templates, size, synonyms=None, seed=None):
+    """
+    Yields size utterances picked at random from the expansion of the templates without building the rest of it.
+    Utterances expanded by more than one template may be picked twice
+    """
+    templates = get_templates(templates, synonyms)
+    offsets = []
+    total = 0
+    for template in templates:
+        offsets.append(total)
+        total += template.count
+    rng = random.Random(seed)
+    if total <= sys.maxsize:
+        indices = sorted(rng.sample(range(total), min(size, total)))
+    else:
+        # Too many combinations for a range, collisions are unlikely enough
+        indices = sorted(set(rng.randrange(total) for _ in range(size)))
+    template_index = 0
+    for index in indices:
+        while template_index + 1 < len(templates) and offsets[template_index + 1] <= index:
+            template_index += 1
+        yield templates[template_index].get(index - offsets[template_index])
+
+
+def generate(templates, synonyms=None, limit=None, sample_size=None, seed=None, max_length=MAX_UTTERANCE_LENGTH,
+             key=None, exclude=()):
+    """
+    Lazy pipeline of the utterances of templates: expanded (or sampled), filtered by length, deduplicated and capped
+
+    :param templates: template strings or Template instances
+    :param synonyms: phrase lists referenced as {@name}, keyed by name
+    :param limit: maximum number of utterances yielded, counted once duplicates and excluded utterances are dropped
+    :param sample_size: expand only that many randomly picked combinations instead of all of them
+    :param seed: seed of the sampling, for reproducible utterances
+    :param key: see unique
+    :param exclude: utterances that are not yielded, e.g. the ones an intent already has
+    """
+    if sample_size is not None:
+        utterances = sample(templates, sample_size, synonyms=synonyms, seed=seed)
+    else:
+        utterances = expand(templates, synonyms=synonyms)
+    if max_length:
+        utterances = (utterance for utterance in utterances if len(utterance) <= max_length)
+    utterances = unique((utterance for utterance in utterances if utterance), key=key, exclude=exclude)
+    if limit is not None:
+        utterances = itertools.islice(utterances, limit)
+    return utterances
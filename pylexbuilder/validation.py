@@ -0,0 +1,255 @@
+"""
+Offline validation of bot definitions, run before anything is packaged or sent to Lex.
+
+    problems = validation.validate_bot(bot)
+    validation.check_bot(bot)  # raises ValidationError listing every problem
+
+One pass over the serialized bot, its intents, slots and slot types, linear in their size. The limits are the
+documented Lex model building quotas; LIMITS can be changed for accounts whose quotas were raised.
+"""
+import re
+
+from .utterances import MAX_UTTERANCE_LENGTH
+
+LIMITS = {
+    'bot_name_length': 50,
+    'name_length': 100,
+    'description_length': 200,
+    'intents_per_bot': 1000,
+    'slots_per_intent': 100,
+    'utterances_per_intent': 1500,
+    'utterance_length': MAX_UTTERANCE_LENGTH,
+    'enumerations_per_slot_type': 10000,
+    'enumeration_value_length': 140,
+    'messages_per_prompt': 15,
+    'message_length': 1000,
+    'max_attempts': 5,
+}
+
+CONTENT_TYPES = ('PlainText', 'SSML', 'CustomPayload')
+SLOT_CONSTRAINTS = ('Required', 'Optional')
+FULFILLMENT_TYPES = ('ReturnIntent', 'CodeHook')
+
+_NAME = re.compile(r'^([A-Za-z]_?)+$')
+_SLOT_NAME = re.compile(r'^([A-Za-z](-|_|\.)?)+$')
+_SLOT_REFERENCE = re.compile(r'\{([^{}]*)\}')
+
+
+class Problem(object):
+    def __init__(self, path, message):
+        self.path = path
+        self.message = message
+
+    def __str__(self):
+        return '{}: {}'.format(self.path, self.message)
+
+    def __repr__(self):
+        return '<Problem {}>'.format(self)
+
+
+class ValidationError(Exception):
+    def __init__(self, problems):
+        self.problems = problems
+        super(ValidationError, self).__init__("{} problems in the bot definition:\n{}".format(
+            len(problems), '\n'.join('  {}'.format(problem) for problem in problems)))
+
+
+class Validator(object):
+    """
+    Collects the problems of a bot definition
+    :param limits: overrides of LIMITS
+    """
+
+    def __init__(self, limits=None):
+        self.limits = dict(LIMITS, **(limits or {}))
+        self.problems = []
+
+    def add(self, path, message, *args):
+        self.problems.append(Problem(path, message.format(*args) if args else message))
+
+    def check_name(self, path, name, pattern=_NAME, max_length=None):
+        if not name:
+            self.add(path, "name is missing")
+            return
+        max_length = max_length or self.limits['name_length']
+        if len(name) > max_length:
+            self.add(path, "name is longer than {} characters", max_length)
+        if not pattern.match(name):
+            self.add(path, "name '{}' must be made of letters, optionally separated by single underscores", name)
+
+    def check_description(self, path, primitive):
+        description = primitive.get('description')
+        if description and len(description) > self.limits['description_length']:
+            self.add(path, "description is longer than {} characters", self.limits['description_length'])
+
+    def check_messages(self, path, prompt, required=False):
+        """
+        :param prompt: primitive of a prompt or statement, None when it isn't set
+        """
+        messages = (prompt or {}).get('messages') or []
+        if not messages:
+            if required:
+                self.add(path, "has no message")
+            return
+        if len(messages) > self.limits['messages_per_prompt']:
+            self.add(path, "has more than {} messages", self.limits['messages_per_prompt'])
+        for i, message in enumerate(messages):
+            content = message.get('content')
+            if not content:
+                self.add(path, "message {} is empty", i + 1)
+            elif len(content) > self.limits['message_length']:
+                self.add(path, "message {} is longer than {} characters", i + 1, self.limits['message_length'])
+            if message.get('contentType') not in CONTENT_TYPES:
+                self.add(path, "message {} has the invalid contentType {!r}, expected one of {}", i + 1,
+                         message.get('contentType'), ', '.join(CONTENT_TYPES))
+        max_attempts = prompt.get('maxAttempts')
+        if max_attempts is not None and not 1 <= max_attempts <= self.limits['max_attempts']:
+            self.add(path, "maxAttempts must be between 1 and {}", self.limits['max_attempts'])
+
+    def check_utterances(self, path, utterances, slot_names, seen=None):
+        """
+        :param seen: utterances already used elsewhere in the intent, updated
+        """
+        seen = seen if seen is not None else set()
+        max_length = self.limits['utterance_length']
+        for utterance in utterances or ():
+            if len(utterance) > max_length:
+                self.add(path, "utterance '{}' is longer than {} characters", utterance, max_length)
+            normalized = utterance.lower()
+            if normalized in seen:
+                self.add(path, "utterance '{}' is duplicated", utterance)
+            seen.add(normalized)
+            for reference in _SLOT_REFERENCE.findall(utterance):
+                if reference not in slot_names:
+                    self.add(path, "utterance '{}' references the undefined slot {{{}}}", utterance, reference)
+
+    def check_slot_type(self, path, primitive):
+        self.check_name(path, primitive.get('name'))
+        self.check_description(path, primitive)
+        count = 0
+        values = set()
+        max_length = self.limits['enumeration_value_length']
+        for enumeration in primitive.get('enumerationValues') or ():
+            value = enumeration.get('value')
+            if not value:
+                self.add(path, "has an enumeration without value")
+                continue
+            if value in values:
+                self.add(path, "enumeration value '{}' is duplicated", value)
+            values.add(value)
+            synonyms = enumeration.get('synonyms') or ()
+            count += 1 + len(synonyms)
+            for text in (value,) + tuple(synonyms):
+                if len(text) > max_length:
+                    self.add(path, "enumeration '{}' is longer than {} characters", text, max_length)
+        if count > self.limits['enumerations_per_slot_type']:
+            self.add(path, "has {} enumeration values and synonyms, more than {}", count,
+                     self.limits['enumerations_per_slot_type'])
+
+    def check_slot(self, path, primitive, slot_names, utterances):
+        self.check_name(path, primitive.get('name'), pattern=_SLOT_NAME)
+        self.check_description(path, primitive)
+        if primitive.get('slotConstraint') not in SLOT_CONSTRAINTS:
+            self.add(path, "slotConstraint must be one of {}", ', '.join(SLOT_CONSTRAINTS))
+        if not primitive.get('slotType'):
+            self.add(path, "has no slotType")
+        self.check_messages('{} valueElicitationPrompt'.format(path), primitive.get('valueElicitationPrompt'),
+                            required=primitive.get('slotConstraint') == 'Required')
+        self.check_utterances(path, primitive.get('sampleUtterances'), slot_names, utterances)
+
+    def check_intent(self, path, primitive):
+        self.check_name(path, primitive.get('name'))
+        self.check_description(path, primitive)
+        slots = primitive.get('slots') or []
+        if len(slots) > self.limits['slots_per_intent']:
+            self.add(path, "has {} slots, more than {}", len(slots), self.limits['slots_per_intent'])
+        slot_names = set()
+        for slot in slots:
+            name = slot.get('name')
+            if name in slot_names:
+                self.add(path, "slot {} is defined more than once", name)
+            slot_names.add(name)
+
+        utterances = set()
+        sample_utterances = primitive.get('sampleUtterances') or []
+        if len(sample_utterances) > self.limits['utterances_per_intent']:
+            self.add(path, "has {} sample utterances, more than {}", len(sample_utterances),
+                     self.limits['utterances_per_intent'])
+        self.check_utterances(path, sample_utterances, slot_names, utterances)
+        for slot in slots:
+            self.check_slot('{} > slot {}'.format(path, slot.get('name')), slot, slot_names, set())
+
+        fulfillment_type = (primitive.get('fulfillmentActivity') or {}).get('type')
+        if fulfillment_type not in FULFILLMENT_TYPES:
+            self.add(path, "fulfillmentActivity type must be one of {}", ', '.join(FULFILLMENT_TYPES))
+        for prompt in ('confirmationPrompt', 'rejectionStatement', 'conclusionStatement'):
+            if prompt in primitive:
+                self.check_messages('{} {}'.format(path, prompt), primitive[prompt], required=True)
+        follow_up = primitive.get('followUpPrompt')
+        if follow_up:
+            self.check_messages('{} followUpPrompt'.format(path), follow_up.get('prompt'), required=True)
+            self.check_messages('{} followUpPrompt rejectionStatement'.format(path),
+                                follow_up.get('rejectionStatement'), required=True)
+        if 'confirmationPrompt' in primitive and 'rejectionStatement' not in primitive:
+            self.add(path, "has a confirmationPrompt without rejectionStatement")
+
+    def check_bot(self, bot):
+        """
+        :type bot: props.BotProperty
+        """
+        primitive = bot.to_primitive()
+        path = 'bot {}'.format(primitive.get('name'))
+        self.check_name(path, primitive.get('name'), max_length=self.limits['bot_name_length'])
+        self.check_description(path, primitive)
+        if primitive.get('childDirected') is None:
+            self.add(path, "childDirected must be set")
+        self.check_messages('{} clarificationPrompt'.format(path), primitive.get('clarificationPrompt'))
+        self.check_messages('{} abortStatement'.format(path), primitive.get('abortStatement'))
+
+        intents = bot.IntentMeta.intents
+        intent_count = len(intents) + len(bot.IntentMeta.existing_intents)
+        if intent_count > self.limits['intents_per_bot']:
+            self.add(path, "has {} intents, more than {}", intent_count, self.limits['intents_per_bot'])
+        intent_names = set()
+        slot_types = {}
+        for intent in intents:
+            if intent.name in intent_names:
+                self.add(path, "intent {} is defined more than once", intent.name)
+                continue
+            intent_names.add(intent.name)
+            self.check_intent('{} > intent {}'.format(path, intent.name), intent.to_primitive())
+            for slot in intent.slots:
+                slot_type = slot.get_slot_type()
+                if slot_type is None:
+                    continue
+                known = slot_types.get(slot_type.name)
+                if known is None:
+                    slot_types[slot_type.name] = (slot_type, None)
+                elif type(known[0]) is not type(slot_type):
+                    # Different classes may still define the same slot type, compare their content
+                    known_hash = known[1] or known[0].get_content_hash()
+                    slot_types[slot_type.name] = (known[0], known_hash)
+                    if slot_type.get_content_hash() != known_hash:
+                        self.add(path, "slot type {} is defined differently by several slots", slot_type.name)
+        for name, (slot_type, _) in slot_types.items():
+            self.check_slot_type('{} > slot type {}'.format(path, name), slot_type.to_primitive())
+        return self.problems
+
+
+def validate_bot(bot, limits=None):
+    """
+    :type bot: props.BotProperty
+    :param limits: overrides of LIMITS
+    :rtype: list[Problem]
+    """
+    return Validator(limits).check_bot(bot)
+
+
+def check_bot(bot, limits=None):
+    """
+    Raises ValidationError listing every problem of the bot definition
+    :type bot: props.BotProperty
+    """
+    problems = validate_bot(bot, limits)
+    if problems:
+        raise ValidationError(problems)
@@ -0,0 +1,287 @@
+"""
+Management of the numbered versions of Lex slot types, intents and bots.
+
+A deploy reuses the newest published version of a resource when it and $LATEST already hold the definition being
+deployed, instead of putting it again and publishing an identical version. The get responses are compared whole
+with the put arguments, once the metadata and the defaults Lex fills in are dropped, see normalize. The $LATEST
+response is recorded in the remote state as the checksum the put needs, so a changed resource costs no extra call.
+
+Every numbered version Lex keeps counts against the per-resource version limit and slows down the listings,
+VersionCollector deletes the old ones:
+
+    report = VersionCollector(lex_model, keep=5, max_workers=10).collect(
+        'OrderFlowers', intent_names=['OrderFlowers'], slot_type_names=['FlowerTypes'])
+
+Every resource keeps its last `keep` versions and the versions still referenced: the bot versions aliases point
+to, the intent versions of the retained bot versions and the slot type versions of the retained intent versions.
+Bot versions are deleted first, then intent versions, then slot type versions, so a version is never deleted while
+a retained version of this bot uses it. Deletions of a phase run in parallel.
+"""
+import asyncio
+import logging
+
+from botocore.exceptions import ClientError
+
+from . import aio, instrumentation
+from .concurrency import DeployReport, run_tasks_async
+from .remote import paginate
+
+logger = logging.getLogger(__name__)
+
+LATEST = '$LATEST'
+DEFAULT_KEEP = 5
+
+# kind -> (get operation, version argument of the get, list versions operation, list key, delete operation)
+OPERATIONS = {
+    'slot_type': ('get_slot_type', 'version', 'get_slot_type_versions', 'slotTypes', 'delete_slot_type_version'),
+    'intent': ('get_intent', 'version', 'get_intent_versions', 'intents', 'delete_intent_version'),
+    'bot': ('get_bot', 'versionOrAlias', 'get_bot_versions', 'bots', 'delete_bot_version'),
+}
+
+# Put arguments Lex doesn't return, or that it assigns itself
+IGNORED_KEYS = ('checksum', 'version', 'processBehavior', 'createVersion')
+# Fields of the get responses describing the resource rather than its definition
+METADATA_KEYS = ('checksum', 'version', 'createdDate', 'lastUpdatedDate', 'status', 'failureReason',
+                 'ResponseMetadata')
+
+ANY = object()
+""" Default of a field Lex assigns a value of its own to """
+
+# kind -> fields Lex fills in when the put leaves them out, and their value
+DEFAULTS = {
+    'slot_type': {'valueSelectionStrategy': 'ORIGINAL_VALUE'},
+    'intent': {'sampleUtterances': []},
+    'bot': {'idleSessionTTLInSeconds': 300, 'detectSentiment': False, 'enableModelImprovements': ANY,
+            'nluIntentConfidenceThreshold': ANY, 'intents': []},
+}
+
+# kind -> list field -> fields Lex fills in on every item of the list
+ITEM_DEFAULTS = {
+    'slot_type': {'enumerationValues': {'synonyms': []}},
+    'intent': {'slots': {'priority': ANY, 'obfuscationSetting': 'NONE', 'sampleUtterances': []}},
+    'bot': {},
+}
+
+
+def get_version(client, kind, name, version):
+    """
+    :type client: pyboto3.lexmodelbuildingservice
+    :return: the resource at version, None if it doesn't exist
+    """
+    operation, version_argument, _, _, _ = OPERATIONS[kind]
+    try:
+        return getattr(client, operation)(**{'name': name, version_argument: version})
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'NotFoundException':
+            raise
+    return None
+
+
+def list_versions(client, kind, name):
+    """
+    :type client: pyboto3.lexmodelbuildingservice
+    :return: the numbered versions of a resource, oldest first, without $LATEST
+    :rtype: list[str]
+    """
+    _, _, operation, key, _ = OPERATIONS[kind]
+    try:
+        items = list(paginate(getattr(client, operation), key, name=name))
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'NotFoundException':
+            raise
+        return []
+    return sorted((item['version'] for item in items if item['version'] != LATEST), key=int)
+
+
+def _strip_defaults(item, sent, defaults):
+    """
+    :param item: dict returned by Lex
+    :param sent: the dict that was put, None when there is none
+    :param defaults: fields Lex fills in, dropped from item when sent leaves them out and they hold the default
+    """
+    sent = sent if isinstance(sent, dict) else {}
+    return {key: value for key, value in item.items()
+            if key in sent or key not in defaults or (defaults[key] is not ANY and defaults[key] != value)}
+
+
+def normalize(kind, resource, definition):
+    """
+    Definition held by a resource returned by Lex: the response without its metadata, nor the fields Lex filled in
+    with their default value because definition doesn't set them
+
+    :param definition: put arguments the resource is compared with
+    :rtype: dict
+    """
+    resource = {key: value for key, value in resource.items() if key not in METADATA_KEYS and key not in IGNORED_KEYS}
+    normalized = _strip_defaults(resource, definition, DEFAULTS[kind])
+    for key, item_defaults in ITEM_DEFAULTS[kind].items():
+        if isinstance(normalized.get(key), list):
+            sent = definition.get(key) or []
+            normalized[key] = [_strip_defaults(item, sent[i] if i < len(sent) else None, item_defaults)
+                               if isinstance(item, dict) else item for i, item in enumerate(normalized[key])]
+    return normalized
+
+
+def matches(kind, resource, definition):
+    """
+    Whether a resource returned by Lex holds definition, the put arguments of a model. Both sides are compared
+    whole once Lex's metadata and defaults are dropped, so a field removed from the definition is a change
+    """
+    definition = {key: value for key, value in definition.items() if key not in IGNORED_KEYS}
+    return normalize(kind, resource, definition) == definition
+
+
+def get_reusable_version(client, kind, name, definition, remote=None):
+    """
+    Newest numbered version of a resource when both it and $LATEST hold definition, None when a put or a new
+    version is needed.
+
+    :type client: pyboto3.lexmodelbuildingservice
+    :param definition: put arguments of the resource
+    :param remote: records the $LATEST checksum fetched on the way, so the put doesn't fetch it again
+    :type remote: remote.RemoteState
+    """
+    latest = get_version(client, kind, name, LATEST)
+    if latest is None:
+        return None
+    if remote is not None:
+        remote.set_checksum(kind, name, latest.get('checksum'))
+    if not matches(kind, latest, definition):
+        return None
+    numbers = list_versions(client, kind, name)
+    if not numbers:
+        return None
+    newest = get_version(client, kind, name, numbers[-1])
+    if newest is None or not matches(kind, newest, definition):
+        return None
+    return newest
+
+
+def select_retained(versions, keep, referenced=()):
+    """
+    :param versions: numbered versions, oldest first
+    :param keep: newest versions retained
+    :param referenced: versions retained whatever their age
+    :return: (retained, deleted) versions, oldest first
+    """
+    newest = set(versions[-keep:]) if keep > 0 else set()
+    retained = [version for version in versions if version in newest or version in referenced]
+    deleted = [version for version in versions if version not in newest and version not in referenced]
+    return retained, deleted
+
+
+class VersionCollector(object):
+    """
+    Deletes the old numbered versions of a bot, its intents and its slot types, see the module docstring
+
+    :type client: pyboto3.lexmodelbuildingservice
+    :param keep: newest versions of every resource retained, on top of the referenced ones
+    :param max_workers: calls running at the same time
+    """
+
+    def __init__(self, client, keep=DEFAULT_KEEP, max_workers=1):
+        if keep < 1:
+            raise ValueError("keep must be at least 1, got {}".format(keep))
+        self.client = client
+        self.keep = keep
+        self.max_workers = max_workers
+
+    def collect(self, bot_name, intent_names=(), slot_type_names=()):
+        """
+        Blocking collect_async
+        :rtype: DeployReport
+        """
+        return aio.run(self.collect_async(bot_name, intent_names, slot_type_names))
+
+    async def collect_async(self, bot_name, intent_names=(), slot_type_names=()):
+        """
+        :return: one result per deleted version, kinds bot_version, intent_version and slot_type_version.
+        A version Lex refuses to delete because something else uses it is retained, not a failure
+        :rtype: DeployReport
+        """
+        report = DeployReport()
+        with instrumentation.span('collect_versions', bot=bot_name):
+            bot_versions = await aio.run_blocking(list_versions, self.client, 'bot', bot_name)
+            aliases = await aio.run_blocking(lambda: list(paginate(self.client.get_bot_aliases, 'BotAliases',
+                                                                   botName=bot_name)))
+            retained, deleted = select_retained(bot_versions, self.keep,
+                                                set(alias['botVersion'] for alias in aliases))
+            bots = await self.get_resources('bot', bot_name, retained + [LATEST])
+            referenced_intents = self.get_references(bots, 'intents', 'intentName', 'intentVersion')
+            await self.delete('bot', {bot_name: deleted}, report)
+
+            intent_names = list(intent_names)
+            intent_versions = await self.list_all('intent', intent_names)
+            retained_intents = {}
+            deleted_intents = {}
+            for name in intent_names:
+                retained_intents[name], deleted_intents[name] = select_retained(
+                    intent_versions[name], self.keep, referenced_intents.get(name, ()))
+            intents = await asyncio.gather(*[self.get_resources('intent', name, retained_intents[name] + [LATEST])
+                                             for name in intent_names])
+            referenced_slot_types = self.get_references(
+                [intent for versions in intents for intent in versions], 'slots', 'slotType', 'slotTypeVersion')
+            await self.delete('intent', deleted_intents, report)
+
+            slot_type_names = list(slot_type_names)
+            slot_type_versions = await self.list_all('slot_type', slot_type_names)
+            deleted_slot_types = {name: select_retained(slot_type_versions[name], self.keep,
+                                                        referenced_slot_types.get(name, ()))[1]
+                                  for name in slot_type_names}
+            await self.delete('slot_type', deleted_slot_types, report)
+        logger.info("Deleted {} old versions of bot {}".format(
+            len([result for result in report.results if result.ok]), bot_name))
+        return report
+
+    async def list_all(self, kind, names):
+        """
+        :rtype: dict[str, list[str]]
+        """
+        versions = await asyncio.gather(*[aio.run_blocking(list_versions, self.client, kind, name)
+                                          for name in names])
+        return dict(zip(names, versions))
+
+    async def get_resources(self, kind, name, versions):
+        resources = await asyncio.gather(*[aio.run_blocking(get_version, self.client, kind, name, version)
+                                           for version in versions])
+        return [resource for resource in resources if resource is not None]
+
+    @staticmethod
+    def get_references(resources, key, name_key, version_key):
+        """
+        Versions referenced by resources, e.g. the intent versions of bots
+        :rtype: dict[str, set[str]]
+        """
+        references = {}
+        for resource in resources:
+            for item in resource.get(key) or ():
+                if item.get(version_key) and item[version_key] != LATEST:
+                    references.setdefault(item[name_key], set()).add(item[version_key])
+        return references
+
+    def delete_version(self, kind, name, version):
+        operation = OPERATIONS[kind][4]
+        try:
+            getattr(self.client, operation)(name=name, version=version)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ResourceInUseException':
+                raise
+            logger.info("{} {} version {} is in use, retaining it".format(kind, name, version))
+            return None
+        logger.debug("Deleted {} {} version {}".format(kind, name, version))
+        return version
+
+    async def delete(self, kind, deleted, report):
+        """
+        :param deleted: versions to delete by resource name
+        :type report: DeployReport
+        """
+        tasks = [('{}_version'.format(kind), '{}:{}'.format(name, version),
+                  lambda name=name, version=version: aio.run_blocking(self.delete_version, kind, name, version))
+                 for name, versions in deleted.items() for version in versions]
+        results = DeployReport()
+        await run_tasks_async(tasks, max_workers=self.max_workers, report=results)
+        for result in results.results:
+            # Versions in use were retained
+            if not result.ok or result.value is not None:
+                report.add(result)
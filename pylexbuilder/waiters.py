@@ -0,0 +1,164 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+
+from botocore.exceptions import ClientError
+
+from . import aio
+from .concurrency import DeployReport, ResourceResult
+
+logger = logging.getLogger(__name__)
+
+_clock = getattr(time, 'monotonic', time.time)
+
+THROTTLING_ERROR_CODES = ('Throttling', 'ThrottlingException', 'TooManyRequestsException', 'LimitExceededException',
+                          'RequestLimitExceeded')
+
+
+class WaitTimeout(Exception):
+    pass
+
+
+class Poller(object):
+    """
+    Polls a resource until it leaves its pending state, backing off exponentially between polls.
+
+    :param poll: callable returning the current description of the resource, e.g. a get_bot response
+    :param is_pending: callable(response) -> bool, may raise to fail the wait
+    :param get_status: callable(response) -> status passed to on_change
+    :param on_change: callable(poller, old_status, new_status, response), called whenever the status changes
+    :param delay: seconds before the first poll, doubled (times backoff) after every pending poll
+    :param max_delay: upper bound of the delay between polls
+    :param jitter: fraction of the delay randomly added or removed, so many waiters don't poll in lockstep
+    :param timeout: seconds after which WaitTimeout is raised, None waits forever
+    """
+
+    def __init__(self, kind, name, poll, is_pending, get_status=None, on_change=None, delay=0.5, max_delay=20.0,
+                 backoff=2.0, jitter=0.2, timeout=900):
+        self.kind = kind
+        self.name = name
+        self.poll = poll
+        self.is_pending = is_pending
+        self.get_status = get_status or (lambda response: response.get('status'))
+        self.on_change = on_change
+        self.delay = delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.timeout = timeout
+        self.status = None
+        self.response = None
+        self.attempts = 0
+        self.deadline = None
+
+    def start(self, now):
+        self.deadline = now + self.timeout if self.timeout is not None else None
+        return now + self.next_delay()
+
+    def next_delay(self):
+        delay = self.delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self.delay = min(self.delay * self.backoff, self.max_delay)
+        return delay
+
+    def step(self, now):
+        """
+        Polls once.
+        :return: time of the next poll, None once the resource is no longer pending
+        """
+        self.attempts += 1
+        try:
+            response = self.poll()
+        except ClientError as e:
+            if e.response['Error']['Code'] not in THROTTLING_ERROR_CODES:
+                raise
+            logger.debug("{} {} poll throttled, backing off".format(self.kind, self.name))
+            return self.schedule(now)
+
+        status = self.get_status(response)
+        self.response = response
+        if status != self.status:
+            old_status, self.status = self.status, status
+            logger.info("{} {} status: {}".format(self.kind, self.name, status))
+            if self.on_change:
+                self.on_change(self, old_status, status, response)
+        if self.is_pending(response):
+            return self.schedule(now)
+        return None
+
+    def schedule(self, now):
+        if self.deadline is not None and now >= self.deadline:
+            raise WaitTimeout("Timed out waiting for {} {} after {} polls. Last status: {}".format(
+                self.kind, self.name, self.attempts, self.status))
+        next_time = now + self.next_delay()
+        if self.deadline is not None:
+            next_time = min(next_time, self.deadline)
+        return next_time
+
+
+def wait_all(pollers, sleep=None, clock=None):
+    """
+    Waits for many resources from a single loop, always polling the one that is due first.
+
+    :type pollers: list[Poller]
+    :return: one result per poller, the value being its last response
+    :rtype: DeployReport
+    """
+    sleep = sleep or time.sleep
+    clock = clock or _clock
+    report = DeployReport()
+    now = clock()
+    queue = [(poller.start(now), i, poller) for i, poller in enumerate(pollers)]
+    heapq.heapify(queue)
+    while queue:
+        next_time, i, poller = heapq.heappop(queue)
+        remaining = next_time - clock()
+        if remaining > 0:
+            sleep(remaining)
+        try:
+            next_time = poller.step(clock())
+        except Exception as e:
+            report.add(ResourceResult(poller.kind, poller.name, error=e))
+            continue
+        if next_time is None:
+            report.add(ResourceResult(poller.kind, poller.name, value=poller.response))
+        else:
+            heapq.heappush(queue, (next_time, i, poller))
+    return report
+
+
+def wait(poller, sleep=None, clock=None):
+    """
+    Waits for a single resource.
+    :type poller: Poller
+    :return: the last response
+    """
+    result = wait_all([poller], sleep=sleep, clock=clock).results[0]
+    if not result.ok:
+        raise result.error
+    return result.value
+
+
+async def sleep_async(seconds):
+    """
+    Sleep of the asyncio waits, replaceable like time.sleep for the blocking ones
+    """
+    await asyncio.sleep(seconds)
+
+
+async def wait_async(poller, sleep=None, clock=None):
+    """
+    wait of the asyncio API: the event loop runs other coroutines between polls, which run on the blocking
+    executor. Await many of them together to wait for many resources
+    :type poller: Poller
+    :return: the last response
+    """
+    clock = clock or _clock
+    next_time = poller.start(clock())
+    while next_time is not None:
+        remaining = next_time - clock()
+        if remaining > 0:
+            await (sleep or sleep_async)(remaining)
+        next_time = await aio.run_blocking(poller.step, clock())
+    return poller.response
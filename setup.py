@@ -8,7 +8,12 @@ setup(name='pylexbuilder',
       author_email='',
       url='https://github.com/wavycloud/pylexbuilder',
       py_modules=['pylexbuilder'],
-      install_requires=['schematics==2.0.1'],
+      install_requires=['schematics==2.1.1',
+                        'boto3>=1.43,<2',
+                        # retries={'mode': ...} of the client config
+                        'botocore>=1.43,<2',
+                        'troposphere>=4,<5'],
+      python_requires='>=3.7',
       license='MIT License',
       zip_safe=True,
       keywords='aws python lex lambda automation',
@@ -0,0 +1,64 @@
+import pytest
+
+from order_flower_bot import bot
+from pylexbuilder import clients, waiters
+from pylexbuilder.fake import FakeBackend
+
+
+async def no_sleep(seconds):
+    pass
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """
+    FakeBackend installed for the test, polls of the waiters don't sleep
+    """
+    monkeypatch.setattr(waiters.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(waiters, 'sleep_async', no_sleep)
+    backend = FakeBackend().install()
+    yield backend
+    backend.uninstall()
+    clients.factory.clear()
+
+
+@pytest.fixture
+def make_bot(tmpdir):
+    """
+    Factory of OrderFlowersBot subclasses that deploy offline: a one file lambda package and a deploy state in tmpdir
+
+        make_bot(name='OrderGifts', intents=[OrderGiftsIntent()], deploy_state=False)
+
+    :param deploy_state: keep the deploy state in tmpdir/<name>.json, False disables change detection
+    :param intents: replace the intents of OrderFlowersBot
+    :param keep_versions: see BotProperty.keep_versions
+    """
+    package = tmpdir.join('package')
+    package.ensure('handler.py').write('def index(event, context):\n    return {}\n')
+
+    def make_bot(name='OrderFlowers', intents=None, deploy_state=True, keep_versions=None):
+        class OfflineBot(bot.OrderFlowersBot):
+            class IntentMeta(bot.OrderFlowersBot.IntentMeta):
+                pass
+
+            def initialize(self):
+                super(OfflineBot, self).initialize()
+                self.name = name
+
+            @property
+            def package_path(self):
+                return str(package)
+
+            @property
+            def deploy_state_path(self):
+                return str(tmpdir.join('{}.json'.format(name))) if deploy_state else None
+
+            @property
+            def keep_versions(self):
+                return keep_versions
+
+        if intents is not None:
+            OfflineBot.IntentMeta.intents = list(intents)
+        return OfflineBot()
+
+    return make_bot
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from pylexbuilder import aio, waiters
+from pylexbuilder.concurrency import run_tasks_async
+from pylexbuilder.waiters import Poller
+
+
+def test_bots_are_awaited_with_other_work(backend, make_bot):
+    flowers = make_bot(deploy_state=False)
+    progress = []
+
+    async def other_work():
+        for i in range(3):
+            progress.append(i)
+            await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(flowers.create_async(), other_work())
+
+    asyncio.run(main())
+    assert progress == [0, 1, 2]
+    lex = backend.get_client('lex-models')
+    assert lex.get_bot(name='OrderFlowers', versionOrAlias='prod')['version'] == flowers.version == '1'
+
+
+def test_create_without_wait_skips_build_and_aliases(backend, make_bot):
+    make_bot(deploy_state=False).create(wait=False)
+    assert backend.count('lex-models', 'create_bot_version') == 1
+    assert backend.count('lex-models', 'get_bot') == 0
+    assert backend.count('lex-models', 'put_bot_alias') == 0
+
+
+def test_blocking_create_refuses_running_loop(make_bot):
+    async def main():
+        make_bot(deploy_state=False).create()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(main())
+
+
+def test_wait_async_polls_until_done():
+    responses = iter([{'status': 'BUILDING'}, {'status': 'BUILDING'}, {'status': 'READY'}])
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+
+    poller = Poller('bot', 'OrderFlowers', poll=lambda: next(responses),
+                    is_pending=lambda response: response['status'] == 'BUILDING', jitter=0)
+    assert asyncio.run(waiters.wait_async(poller, sleep=sleep)) == {'status': 'READY'}
+    assert poller.attempts == 3
+    assert len(slept) == 3
+
+
+def test_run_tasks_async_bounds_concurrency():
+    running = []
+    peak = []
+
+    async def task():
+        running.append(1)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.pop()
+
+    async def fail():
+        raise ValueError("boom")
+
+    tasks = [('intent', str(i), task) for i in range(6)] + [('intent', 'bad', fail)]
+    report = asyncio.run(run_tasks_async(tasks, max_workers=2))
+    assert max(peak) == 2
+    assert report.failed_names('intent') == {'bad'}
+
+
+def test_run_blocking_uses_bounded_executor():
+    aio.configure(max_workers=3)
+    try:
+        assert asyncio.run(aio.run_blocking(lambda a, b=0: a + b, 1, b=2)) == 3
+        assert aio.executor.get()._max_workers == 3
+    finally:
+        aio.configure(max_workers=aio.DEFAULT_MAX_WORKERS)
@@ -0,0 +1,45 @@
+import json
+import os
+import tempfile
+
+from pylexbuilder import benchmark, clients, packaging, utils
+
+
+def test_alpha():
+    assert [benchmark.alpha(n) for n in (0, 25, 26, 27)] == ['A', 'Z', 'BA', 'BB']
+
+
+def test_run_records_every_phase():
+    try:
+        result = benchmark.run(3, max_slots=2, enumeration_size=5, utterances=3, package_files=2)
+    finally:
+        clients.factory.clear()
+    assert set(result['phases']) == {'build', 'serialize', 'prepare_package', 'zip', 'hash', 'deploy',
+                                     'redeploy'}
+    assert result['phases']['build']['call_count'] == 0
+    assert result['phases']['deploy']['calls']['lex-models.put_bot'] == 1
+    # Nothing changed, so nothing is put again
+    redeploy = result['phases']['redeploy']['calls']
+    assert not any(operation.startswith('lex-models.put') for operation in redeploy)
+    assert result['phases']['redeploy']['call_count'] < result['phases']['deploy']['call_count']
+    json.dumps(result)
+
+
+def test_isolated_caches_are_restored():
+    dependency_cache = utils.dependency_cache
+    with benchmark.isolated_caches() as directory:
+        assert packaging.ManifestCache.load().path.startswith(directory)
+        assert utils.dependency_cache.root.startswith(directory)
+        assert not tempfile.gettempdir().startswith(directory)
+    assert utils.dependency_cache is dependency_cache
+    assert packaging.cache_dir is None
+    assert not os.path.exists(directory)
+
+
+def test_compare_reports_regressions():
+    def results(seconds, calls):
+        return {'results': [{'intents': 10, 'phases': {'deploy': {'seconds': seconds, 'call_count': calls}}}]}
+
+    assert benchmark.compare(results(1.0, 5), results(1.1, 5)) == []
+    assert benchmark.compare(results(1.0, 5), results(2.0, 6)) == ['10 intents, deploy: 1.000s -> 2.000s',
+                                                                  '10 intents, deploy: 5 -> 6 calls']
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from pylexbuilder.caching import MemoCache, memoize
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    calls = []
+
+    @memoize(maxsize=2)
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    square(1), square(2), square(1), square(3), square(1), square(2)
+    assert calls == [1, 2, 3, 2]
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = MemoCache(ttl=10, clock=clock)
+    assert cache.get_or_compute('key', lambda: 1) == 1
+    clock.now = 5
+    assert cache.get_or_compute('key', lambda: 2) == 1
+    clock.now = 10
+    assert cache.get_or_compute('key', lambda: 3) == 3
+
+
+def test_key_function_and_invalidate():
+    calls = []
+
+    @memoize(key=lambda name, verbose=False: name)
+    def lookup(name, verbose=False):
+        calls.append(name)
+        return name.upper()
+
+    assert lookup('bot') == lookup('bot', verbose=True) == 'BOT'
+    lookup.invalidate('bot')
+    lookup('bot')
+    assert calls == ['bot', 'bot']
+
+
+def test_errors_are_not_cached():
+    results = iter([ValueError('boom'), 'ok'])
+
+    @memoize()
+    def flaky():
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    with pytest.raises(ValueError):
+        flaky()
+    assert flaky() == 'ok'
+
+
+def test_concurrent_callers_share_one_computation():
+    calls = []
+
+    @memoize()
+    def slow():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'account'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(slow())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['account'] * 8
+    assert calls == [1]
+
+
+def test_recursive_call_raises():
+    @memoize()
+    def recursive():
+        return recursive()
+
+    with pytest.raises(RuntimeError):
+        recursive()
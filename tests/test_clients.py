@@ -0,0 +1,22 @@
+from pylexbuilder import clients
+
+
+def test_clients_are_cached_per_service_region_and_profile():
+    factory = clients.ClientFactory(region='us-east-1', max_pool_connections=25)
+    lex = factory.get('lex-models')
+    assert factory.get('lex-models') is lex
+    assert factory.get('lex-models', region='eu-west-1') is not lex
+    assert lex.meta.config.max_pool_connections == 25
+    factory.configure(max_pool_connections=50)
+    assert factory.get('lex-models').meta.config.max_pool_connections == 50
+
+
+def test_lazy_client_resolves_through_factory(monkeypatch):
+    class Stub(object):
+        def get_bot(self, **kwargs):
+            return kwargs
+
+    factory = clients.ClientFactory(region='us-east-1')
+    factory.set('lex-models', Stub())
+    monkeypatch.setattr(clients, 'factory', factory)
+    assert clients.LazyClient('lex-models').get_bot(name='OrderFlowers') == {'name': 'OrderFlowers'}
@@ -0,0 +1,46 @@
+import pytest
+
+from order_flower_bot import bot
+from pylexbuilder import props
+from pylexbuilder.concurrency import DeployError, run_tasks
+
+
+def test_run_tasks_collects_every_failure():
+    def fail():
+        raise ValueError("boom")
+
+    tasks = [('intent', 'A', lambda: 'a'), ('intent', 'B', fail), ('intent', 'C', fail)]
+    report = run_tasks(tasks, max_workers=4)
+    assert report.get('intent', 'A').value == 'a'
+    assert report.failed_names('intent') == {'B', 'C'}
+    with pytest.raises(DeployError):
+        report.raise_for_failures()
+
+
+def test_create_all_intents_deploys_slot_types_first(monkeypatch):
+    calls = []
+
+    def create_slot_type(slot_type, **kwargs):
+        calls.append(('slot_type', slot_type.name))
+        slot_type.version = '7'
+
+    def create_intent(intent, with_slots=True, **kwargs):
+        assert not with_slots
+        calls.append(('intent', intent.name, intent.slots[0].slotTypeVersion))
+
+    monkeypatch.setattr(props.SlotProperty, 'create', create_slot_type)
+    monkeypatch.setattr(props.IntentProperty, 'create', create_intent)
+    report = bot.OrderFlowersBot().create_all_intents('arn', max_workers=4)
+    assert calls == [('slot_type', 'FlowerTypes'), ('intent', 'OrderFlowers', '7')]
+    assert not report.failures
+
+
+def test_create_all_intents_skips_intents_of_failed_slot_types(monkeypatch):
+    def create_slot_type(slot_type, **kwargs):
+        raise ValueError("boom")
+
+    monkeypatch.setattr(props.SlotProperty, 'create', create_slot_type)
+    with pytest.raises(DeployError) as e:
+        bot.OrderFlowersBot().create_all_intents('arn', max_workers=4)
+    assert e.value.report.failed_names('slot_type') == {'FlowerTypes'}
+    assert e.value.report.failed_names('intent') == {'OrderFlowers'}
@@ -0,0 +1,37 @@
+import io
+
+from pylexbuilder import props
+from pylexbuilder.enumerations import EnumerationStore
+
+
+def test_duplicates_are_merged():
+    store = EnumerationStore()
+    store.add('roses', ['rose']).add('tulips').add('roses', ['rose', 'red roses', 'roses'])
+    assert len(store) == 2
+    assert store.get_synonyms('roses') == ['rose', 'red roses']
+    assert store.to_primitive() == [{'value': 'roses', 'synonyms': ['rose', 'red roses']}, {'value': 'tulips'}]
+
+
+def test_load_csv_and_jsonl(tmpdir):
+    csv_path = str(tmpdir.join('flowers.csv'))
+    with io.open(csv_path, 'w', encoding='utf-8') as f:
+        f.write(u'value,synonym\nroses,rose, red roses\n\nlilies\n')
+    jsonl_path = str(tmpdir.join('flowers.jsonl'))
+    with io.open(jsonl_path, 'w', encoding='utf-8') as f:
+        f.write(u'"tulips"\n{"value": "lilies", "synonyms": ["lily"]}\n')
+
+    store = EnumerationStore().load(csv_path, header=True).load(jsonl_path)
+    assert list(store) == ['roses', 'lilies', 'tulips']
+    assert store.get_synonyms('roses') == ['rose', 'red roses']
+    assert store.get_synonyms('lilies') == ['lily']
+
+
+def test_slot_type_expands_enumerations_when_serialized():
+    slot_type = props.SlotProperty()
+    slot_type.name = 'FlowerTypes'
+    slot_type.enumerationValues = [{'value': 'roses'}]
+    slot_type.add_enumeration('roses').add_enumeration('tulips', ['tulip'])
+    slot_type.load_enumerations(('flower {}'.format(i) for i in range(1000)))
+    values = slot_type.to_primitive()['enumerationValues']
+    assert values[:2] == [{'value': 'roses'}, {'value': 'tulips', 'synonyms': ['tulip']}]
+    assert len(values) == 1002
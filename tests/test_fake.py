@@ -0,0 +1,66 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from pylexbuilder.fake import FakeBackend
+
+
+def test_bot_deploys_offline(backend, make_bot):
+    flower_bot = make_bot()
+    flower_bot.create()
+    lex = backend.get_client('lex-models')
+    assert lex.get_bot(name='OrderFlowers', versionOrAlias='prod')['version'] == '1'
+    assert lex.get_intent(name='OrderFlowers', version='1')['slots'][0]['slotTypeVersion'] == '1'
+    assert backend.count('lambda', 'add_permission') == 1
+    assert backend.count('cloudformation', 'execute_change_set') == 1
+
+    calls = backend.count()
+    make_bot().create()
+    # Unchanged: no stack update, no put
+    assert backend.count('cloudformation', 'create_change_set') == 1
+    assert backend.count('lex-models', 'put_intent') == 1
+    assert backend.count() - calls < 15
+
+
+def test_checksums_and_versions(backend):
+    lex = backend.get_client('lex-models')
+    created = lex.put_slot_type(name='FlowerTypes', enumerationValues=[{'value': 'roses'}])
+    with pytest.raises(ClientError) as error:
+        lex.put_slot_type(name='FlowerTypes', enumerationValues=[])
+    assert error.value.response['Error']['Code'] == 'PreconditionFailedException'
+    first = lex.create_slot_type_version(name='FlowerTypes', checksum=created['checksum'])
+    assert first['version'] == '1'
+    assert lex.create_slot_type_version(name='FlowerTypes')['version'] == '1'
+
+
+def test_lex_defaults_and_versions_in_use(backend):
+    lex = backend.get_client('lex-models')
+    lex.put_slot_type(name='FlowerTypes', enumerationValues=[{'value': 'roses'}])
+    slot_type = lex.get_slot_type(name='FlowerTypes', version='$LATEST')
+    assert slot_type['enumerationValues'] == [{'value': 'roses', 'synonyms': []}]
+    assert slot_type['valueSelectionStrategy'] == 'ORIGINAL_VALUE'
+    lex.create_slot_type_version(name='FlowerTypes')
+    lex.put_intent(name='OrderFlowers', slots=[{'name': 'FlowerType', 'slotType': 'FlowerTypes',
+                                                'slotTypeVersion': '1', 'slotConstraint': 'Required'}])
+    slot = lex.get_intent(name='OrderFlowers', version='$LATEST')['slots'][0]
+    assert (slot['priority'], slot['obfuscationSetting']) == (1, 'NONE')
+    lex.create_intent_version(name='OrderFlowers')
+    lex.put_bot(name='OrderFlowers', intents=[{'intentName': 'OrderFlowers', 'intentVersion': '1'}],
+                processBehavior='SAVE', locale='en-US', childDirected=False)
+    assert 'processBehavior' not in lex.get_bot(name='OrderFlowers', versionOrAlias='$LATEST')
+
+    for delete in (lambda: lex.delete_slot_type_version(name='FlowerTypes', version='1'),
+                   lambda: lex.delete_intent_version(name='OrderFlowers', version='1')):
+        with pytest.raises(ClientError) as error:
+            delete()
+        assert error.value.response['Error']['Code'] == 'ResourceInUseException'
+
+
+def test_throttling_and_latency():
+    slept = []
+    backend = FakeBackend(throttle_rate=1.0, latencies={'sts': 0.25}, sleep=slept.append)
+    with pytest.raises(ClientError) as error:
+        backend.get_client('lex-models').get_bots()
+    assert error.value.response['Error']['Code'] == 'LimitExceededException'
+    backend.throttle_rate = 0
+    assert backend.get_client('sts').get_caller_identity()['Account'] == '123456789012'
+    assert slept == [0.25]
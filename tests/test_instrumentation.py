@@ -0,0 +1,73 @@
+import json
+import logging
+import tempfile
+
+import pytest
+from botocore.exceptions import ClientError
+
+from pylexbuilder import instrumentation
+from pylexbuilder.instrumentation import Tracer
+
+
+def test_deploy_records_phases_and_calls(backend, make_bot, tmpdir, monkeypatch):
+    # Fresh package manifest, so the package is zipped and uploaded
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmpdir.mkdir('tmp')))
+    with Tracer() as tracer:
+        make_bot().create()
+    assert instrumentation.get_tracer() is None
+
+    summary = tracer.summary()
+    for phase in ('deploy', 'package', 'hash', 'zip', 'upload', 'stack_deploy', 'lambda_permissions',
+                  'slot_types', 'intents', 'put_bot', 'build_wait', 'aliases'):
+        assert summary[phase]['category'] == 'phase'
+    assert summary['intent']['category'] == 'task'
+    put_bot = summary['lex-models.put_bot']
+    assert put_bot['count'] == 1
+    assert put_bot['request_bytes'] > 0 and put_bot['response_bytes'] > 0
+    assert sum(total['count'] for total in summary.values() if total['category'] == 'api') == backend.count()
+
+    trace = json.loads(json.dumps(tracer.to_chrome_trace()))
+    deploy = [event for event in trace['traceEvents'] if event['name'] == 'deploy']
+    assert deploy[0]['ph'] == 'X' and deploy[0]['dur'] > 0
+    tracer.write_json(str(tmpdir.join('deploy.json')))
+
+
+def test_call_records_retries_and_errors():
+    tracer = Tracer()
+
+    def throttled(**kwargs):
+        raise ClientError({'Error': {'Code': 'ThrottlingException'}, 'ResponseMetadata': {'RetryAttempts': 4}},
+                          'GetBot')
+
+    with pytest.raises(ClientError):
+        tracer.call('lex-models', 'get_bot', throttled, name='OrderFlowers')
+    assert tracer.call('sts', 'get_caller_identity',
+                       lambda: {'Account': '1', 'ResponseMetadata': {'RetryAttempts': 1}}) is not None
+    failed, succeeded = tracer.get_spans('api')
+    assert failed.args == {'request_bytes': len('name') + len('OrderFlowers'), 'error': 'ThrottlingException',
+                           'retries': 4}
+    assert succeeded.args['retries'] == 1
+    assert tracer.summary()['lex-models.get_bot']['errors'] == 1
+
+
+def test_nothing_is_recorded_without_tracer():
+    client = object()
+    assert instrumentation.instrument(client, 'sts') is client
+    with instrumentation.span('zip') as details:
+        details['bytes'] = 1
+
+
+def test_pretty_is_formatted_only_when_logged(caplog):
+    class Response(dict):
+        formatted = 0
+
+        def __repr__(self):
+            Response.formatted += 1
+            return 'response'
+
+    with caplog.at_level(logging.WARNING):
+        logging.info("put_bot: %s", instrumentation.Pretty(Response()))
+    assert Response.formatted == 0
+    with caplog.at_level(logging.INFO):
+        logging.info("put_bot: %s", instrumentation.Pretty(Response()))
+    assert 'put_bot: response' in caplog.text
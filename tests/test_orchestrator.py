@@ -0,0 +1,56 @@
+import tempfile
+
+import pytest
+
+from order_flower_bot import bot
+from pylexbuilder.instrumentation import Tracer
+from pylexbuilder.orchestrator import Orchestrator, ResourceConflictError
+
+
+@pytest.fixture(autouse=True)
+def fresh_tempdir(monkeypatch, tmpdir):
+    # Fresh package manifest, so the package is zipped and uploaded
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmpdir.mkdir('tmp')))
+
+
+class OrderGiftsIntent(bot.OrderFlowersIntent):
+    def initialize(self):
+        super(OrderGiftsIntent, self).initialize()
+        self.name = 'OrderGifts'
+
+
+class ConflictingIntent(bot.OrderFlowersIntent):
+    def initialize(self):
+        super(ConflictingIntent, self).initialize()
+        self.description = 'Order flowers, described differently'
+
+
+def test_bots_share_package_and_slot_types(backend, make_bot):
+    bots = [make_bot(intents=[bot.OrderFlowersIntent()]),
+            make_bot(name='OrderGifts', intents=[OrderGiftsIntent()])]
+    with Tracer() as tracer:
+        report = Orchestrator(bots, max_workers=2).deploy()
+
+    assert report.failures == []
+    assert sorted(result.value['version'] for result in report.results) == ['1', '1']
+    assert tracer.summary()['zip']['count'] == 1
+    # One upload per bucket
+    assert backend.count('s3', 'upload_file') == 2
+    assert backend.count('lex-models', 'put_slot_type') == 1
+    assert backend.count('lex-models', 'put_intent') == 2
+    assert backend.count('cloudformation', 'describe_stacks') < 2 + 2 * 3
+    for deployed in bots:
+        assert deployed.IntentMeta.intents[0].slots[0].slotTypeVersion == '1'
+
+
+def test_conflicting_definitions_fail_one_bot(backend, make_bot):
+    report = Orchestrator([make_bot(intents=[bot.OrderFlowersIntent()]),
+                           make_bot(name='OrderMoreFlowers', intents=[ConflictingIntent()])], max_workers=1).deploy()
+    assert [result.name for result in report.failures] == ['OrderMoreFlowers']
+    assert isinstance(report.failures[0].error.report.failures[0].error, ResourceConflictError)
+    assert report.get('bot', 'OrderFlowers').ok
+
+
+def test_bot_names_must_be_unique(make_bot):
+    with pytest.raises(ValueError):
+        Orchestrator([make_bot(intents=[bot.OrderFlowersIntent()]), make_bot(intents=[OrderGiftsIntent()])])
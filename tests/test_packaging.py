@@ -0,0 +1,191 @@
+import os
+import tempfile
+import zipfile
+
+from pylexbuilder import packaging, utils
+from pylexbuilder.packaging import ManifestCache
+
+
+def write(path, content):
+    with open(str(path), 'w') as f:
+        f.write(content)
+
+
+def test_fingerprint_follows_content_not_mtime(tmpdir):
+    write(tmpdir.join('handler.py'), 'print(1)')
+    tmpdir.mkdir('packages')
+    write(tmpdir.join('packages', 'lib.py'), 'x = 1')
+    manifest = ManifestCache(str(tmpdir.join('manifest.json')))
+    fingerprint = manifest.fingerprint(str(tmpdir))
+
+    os.utime(str(tmpdir.join('handler.py')), (1, 1))
+    assert manifest.fingerprint(str(tmpdir)) == fingerprint
+    write(tmpdir.join('packages', 'lib.py'), 'x = 2')
+    assert manifest.fingerprint(str(tmpdir)) != fingerprint
+
+
+def test_upload_lambda_skips_known_fingerprint(tmpdir, monkeypatch):
+    source = tmpdir.mkdir('bot')
+    write(source.join('handler.py'), 'print(1)')
+    manifest = ManifestCache(str(tmpdir.join('manifest.json')))
+    manifest.set_artifact(manifest.fingerprint(str(source)), 'bucket', 'bot_abc.zip')
+
+    def fail(*args, **kwargs):
+        raise AssertionError("unexpected packaging")
+
+    monkeypatch.setattr(utils, 'prepare_python_package', lambda directory, **kwargs: None)
+    monkeypatch.setattr(utils, 'zipdir_and_upload_to_s3', fail)
+    monkeypatch.setattr(utils, 's3', None)
+    assert utils.upload_lambda('bucket', str(source), manifest=manifest) == 'bot_abc.zip'
+    assert ManifestCache.load(manifest.path).get_artifact(manifest.fingerprint(str(source)), 'bucket')
+
+
+def test_serial_and_parallel_zips_are_identical(tmpdir):
+    source = tmpdir.mkdir('bot')
+    for i in range(10):
+        write(source.join('module{}.py'.format(i)), 'value = {}\n'.format(i) * (i * 100))
+    write(source.join('wheel.whl'), 'already compressed')
+    write(source.join(u'caf\u00e9.py'), 'x = 1')
+    digests = []
+    for workers in (1, 4):
+        zip_path = str(tmpdir.join('{}.zip'.format(workers)))
+        digest = packaging.write_zip(zip_path, packaging.walk_files(str(source)), workers=workers)
+        assert digest == packaging.hash_file(zip_path).digest()
+        digests.append(digest)
+    assert digests[0] == digests[1]
+    assert zipfile.ZipFile(str(tmpdir.join('1.zip'))).testzip() is None
+
+
+def test_manifests_saved_one_after_the_other_keep_each_others_entries(tmpdir):
+    path = str(tmpdir.join('cache', 'manifest.json'))
+    for name in ('a', 'b'):
+        write(tmpdir.ensure_dir(name).join('handler.py'), name)
+    first = ManifestCache.load(path)
+    second = ManifestCache.load(path)
+    first.set_artifact(first.fingerprint(str(tmpdir.join('a'))), 'bucket', 'a.zip')
+    second.set_artifact(second.fingerprint(str(tmpdir.join('b'))), 'bucket', 'b.zip')
+    first.save()
+    second.save()
+
+    loaded = ManifestCache.load(path)
+    assert loaded.get_artifact(loaded.fingerprint(str(tmpdir.join('a'))), 'bucket') == 'a.zip'
+    assert loaded.get_artifact(loaded.fingerprint(str(tmpdir.join('b'))), 'bucket') == 'b.zip'
+    assert os.listdir(str(tmpdir.join('cache'))) == ['manifest.json']
+
+    # A file deleted from a tree is not brought back by the merge
+    tmpdir.join('a', 'handler.py').remove()
+    first.fingerprint(str(tmpdir.join('a')))
+    first.save()
+    assert str(tmpdir.join('a', 'handler.py')) not in ManifestCache.load(path).files
+
+
+def test_write_zip_is_reproducible(tmpdir):
+    for name in ('a', 'b'):
+        source = tmpdir.mkdir(name)
+        write(source.join('handler.py'), 'print(1)')
+        source.mkdir('packages')
+        write(source.join('packages', 'lib.py'), 'x = 1')
+    os.utime(str(tmpdir.join('b', 'handler.py')), (1, 1))
+    archives = []
+    for name in ('a', 'b'):
+        zip_path = str(tmpdir.join('{}.zip'.format(name)))
+        packaging.write_zip(zip_path, packaging.walk_files(str(tmpdir.join(name))))
+        with open(zip_path, 'rb') as f:
+            archives.append(f.read())
+    assert archives[0] == archives[1]
+    assert zipfile.ZipFile(str(tmpdir.join('a.zip'))).namelist() == ['handler.py', 'packages/lib.py']
+
+
+def test_zipdir_hash_matches_written_archive(tmpdir):
+    source = tmpdir.mkdir('bot')
+    write(source.join('handler.py'), 'print(1)' * 1000)
+    zip_path, sha256 = utils.zipdir_with_sha256(str(source))
+    assert sha256 == utils.hashfile(zip_path)
+    assert zipfile.ZipFile(zip_path).testzip() is None
+
+
+def test_parallel_zip_is_valid_and_deterministic(tmpdir):
+    source = tmpdir.mkdir('bot')
+    for i in range(20):
+        write(source.join('module{}.py'.format(i)), 'value = {}\n'.format(i) * (i * 100))
+    write(source.join('wheel.whl'), 'already compressed')
+    digests = [packaging.write_zip(str(tmpdir.join('{}.zip'.format(workers))), packaging.walk_files(str(source)),
+                                   workers=workers)
+               for workers in (4, 8)]
+    assert digests[0] == digests[1]
+    archive = zipfile.ZipFile(str(tmpdir.join('4.zip')))
+    assert archive.testzip() is None
+    assert archive.read('module3.py') == b'value = 3\n' * 300
+    assert archive.getinfo('wheel.whl').compress_type == zipfile.ZIP_STORED
+    assert archive.getinfo('module3.py').compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_dependency_cache_builds_once_and_restores(tmpdir):
+    builds = []
+
+    def build(directory):
+        builds.append(directory)
+        os.mkdir(os.path.join(directory, 'pylexo'))
+        write(os.path.join(directory, 'pylexo', '__init__.py'), 'VERSION = 1')
+
+    cache = packaging.DependencyCache(str(tmpdir.join('cache')))
+    for name in ('a', 'b'):
+        cache.restore('key', str(tmpdir.join(name, 'packages')), build)
+    assert len(builds) == 1
+    assert tmpdir.join('b', 'packages', 'pylexo', '__init__.py').read() == 'VERSION = 1'
+    assert cache.is_restored('key', str(tmpdir.join('a', 'packages')))
+    assert not cache.is_restored('other', str(tmpdir.join('a', 'packages')))
+    # Only the dependencies are in the target
+    assert os.listdir(str(tmpdir.join('a', 'packages'))) == ['pylexo']
+
+
+def test_dependency_cache_restore_replaces_target(tmpdir):
+    def build(version):
+        def build(directory):
+            write(os.path.join(directory, 'pylexo{}.py'.format(version)), 'VERSION = {}'.format(version))
+        return build
+
+    cache = packaging.DependencyCache(str(tmpdir.join('cache')))
+    target = tmpdir.join('packages')
+    cache.restore('v1', str(target), build(1))
+    # Editing the restored files leaves the cache alone
+    write(str(target.join('pylexo1.py')), 'VERSION = 0')
+    assert tmpdir.join('cache', 'v1', 'pylexo1.py').read() == 'VERSION = 1'
+
+    write(str(target.join('vendored.py')), 'print(1)')
+    cache.restore('v2', str(target), build(2))
+    # Dependencies of the previous requirements are removed, files restores didn't add are left alone
+    assert sorted(os.listdir(str(target))) == ['pylexo2.py', 'vendored.py']
+    target.remove()
+    assert not cache.is_restored('v2', str(target))
+
+
+def test_restore_into_source_directory_keeps_its_files(tmpdir, monkeypatch):
+    def pip_install(requirements, target_directory, cwd=None):
+        write(os.path.join(target_directory, 'pylexo.py'), 'VERSION = 1')
+
+    monkeypatch.setattr(utils, 'pip_install', pip_install)
+    monkeypatch.setattr(utils, 'dependency_cache', packaging.DependencyCache(str(tmpdir.join('cache'))))
+    source = tmpdir.mkdir('src')
+    write(source.join('handler.py'), 'print(1)')
+    write(source.join('requirements.txt'), 'pylexo==0.4.0')
+    source.mkdir('packages')
+    write(source.join('packages', 'vendored.py'), 'print(2)')
+
+    utils.prepare_python_package(str(source), subfolder=None)
+    assert sorted(os.listdir(str(source))) == ['handler.py', 'packages', 'pylexo.py', 'requirements.txt']
+    utils.prepare_python_package(str(source))
+    assert sorted(os.listdir(str(source.join('packages')))) == ['pylexo.py', 'vendored.py']
+
+
+def test_dependency_cache_root_follows_tempdir(tmpdir, monkeypatch):
+    cache = packaging.DependencyCache()
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmpdir))
+    assert cache.root == str(tmpdir.join('pylexbuilder', 'dependencies'))
+
+
+def test_requirements_key_depends_on_runtime(tmpdir):
+    requirements = tmpdir.join('requirements.txt')
+    write(requirements, 'pylexo==0.4.0')
+    assert packaging.requirements_key(str(requirements), 'python2.7') != \
+        packaging.requirements_key(str(requirements), 'python3.6')
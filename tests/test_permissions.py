@@ -0,0 +1,56 @@
+import json
+
+from botocore.exceptions import ClientError
+
+from pylexbuilder.permissions import PermissionReconciler, get_intent_arn, get_statement_id
+
+FUNCTION = 'arn:aws:lambda:us-east-1:123456789012:function:OrderFlowers:prod'
+
+
+def statement(intent_name, account='123456789012'):
+    return {'Sid': get_statement_id(intent_name), 'Effect': 'Allow',
+            'Principal': {'Service': 'lex.amazonaws.com'}, 'Action': 'lambda:InvokeFunction',
+            'Condition': {'ArnLike': {'AWS:SourceArn': get_intent_arn('us-east-1', account, intent_name)}}}
+
+
+class FakeLambda(object):
+    def __init__(self, statements=None):
+        self.statements = statements
+        self.calls = []
+
+    def get_policy(self, FunctionName):
+        self.calls.append(('get_policy', None))
+        if self.statements is None:
+            raise ClientError({'Error': {'Code': 'ResourceNotFoundException', 'Message': 'No policy'}}, 'GetPolicy')
+        return {'Policy': json.dumps({'Statement': self.statements})}
+
+    def add_permission(self, FunctionName, StatementId, **kwargs):
+        self.calls.append(('add_permission', StatementId))
+        return {}
+
+    def remove_permission(self, FunctionName, StatementId):
+        self.calls.append(('remove_permission', StatementId))
+
+
+def test_only_missing_permissions_are_added():
+    client = FakeLambda([statement('OrderFlowers')])
+    reconciler = PermissionReconciler(client, FUNCTION, 'us-east-1', '123456789012')
+    report = reconciler.reconcile(['OrderFlowers', 'BookHotel'], max_workers=4)
+    assert not report.failures
+    assert client.calls == [('get_policy', None), ('add_permission', get_statement_id('BookHotel'))]
+
+
+def test_function_without_policy_gets_every_permission():
+    client = FakeLambda()
+    reconciler = PermissionReconciler(client, FUNCTION, 'us-east-1', '123456789012')
+    reconciler.reconcile(['OrderFlowers', 'BookHotel'])
+    assert [name for call, name in client.calls if call == 'add_permission'] == [
+        get_statement_id('OrderFlowers'), get_statement_id('BookHotel')]
+
+
+def test_outdated_statement_is_replaced():
+    client = FakeLambda([statement('OrderFlowers', account='210987654321')])
+    reconciler = PermissionReconciler(client, FUNCTION, 'us-east-1', '123456789012')
+    reconciler.reconcile(['OrderFlowers'])
+    assert client.calls[1:] == [('remove_permission', get_statement_id('OrderFlowers')),
+                                ('add_permission', get_statement_id('OrderFlowers'))]
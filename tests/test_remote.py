@@ -0,0 +1,43 @@
+from pylexbuilder.remote import RemoteState, paginate
+
+
+class ListingLexModel(object):
+    def __init__(self):
+        self.calls = []
+
+    def get_intents(self, maxResults, nextToken=None):
+        self.calls.append(('get_intents', nextToken))
+        if nextToken is None:
+            return {'intents': [{'name': 'OrderFlowers'}], 'nextToken': 'page2'}
+        return {'intents': [{'name': 'BookHotel'}]}
+
+    def get_slot_types(self, maxResults, nextToken=None):
+        return {'slotTypes': [{'name': 'FlowerTypes'}]}
+
+    def get_bots(self, maxResults, nextToken=None):
+        return {'bots': [{'name': 'OrderFlowers'}]}
+
+    def get_bot_aliases(self, botName, maxResults, nextToken=None):
+        return {'BotAliases': [{'name': 'prod', 'botName': botName, 'checksum': 'alias-checksum'}]}
+
+    def get_intent(self, name, version):
+        self.calls.append(('get_intent', name))
+        return {'name': name, 'checksum': '{}-checksum'.format(name)}
+
+
+def test_paginate_follows_next_token():
+    client = ListingLexModel()
+    assert [item['name'] for item in paginate(client.get_intents, 'intents')] == ['OrderFlowers', 'BookHotel']
+    assert client.calls == [('get_intents', None), ('get_intents', 'page2')]
+
+
+def test_checksums_only_fetched_for_existing_resources():
+    client = ListingLexModel()
+    remote = RemoteState.fetch(client, bot_names=['OrderFlowers'])
+    del client.calls[:]
+    assert remote.get_checksum('intent', 'NewIntent') is None
+    assert remote.get_checksum('intent', 'OrderFlowers') == 'OrderFlowers-checksum'
+    assert remote.get_checksum('intent', 'OrderFlowers') == 'OrderFlowers-checksum'
+    assert client.calls == [('get_intent', 'OrderFlowers')]
+    assert remote.get_alias_checksum('OrderFlowers', 'prod') == 'alias-checksum'
+    assert remote.get_alias_checksum('OrderFlowers', 'dev') is None
@@ -0,0 +1,39 @@
+from schematics import models
+
+from order_flower_bot import bot
+from pylexbuilder import props
+
+
+def slow_primitive(model):
+    return models.Model.to_primitive(model)
+
+
+def test_compiled_serializer_matches_schematics():
+    order_flowers_bot = bot.OrderFlowersBot()
+    order_flowers_bot.add_intent('OrderFlowers', '1')
+    intent = bot.OrderFlowersIntent()
+    intent.update_uri('arn:aws:lambda:us-east-1:123456789012:function:OrderFlowers')
+    slot_type = intent.slots[0].get_slot_type()
+    for model in (order_flowers_bot, intent, intent.slots[0], slot_type):
+        assert model.to_primitive() == slow_primitive(model)
+    assert slot_type.to_primitive()['enumerationValues'][0] == {'value': 'roses'}
+
+
+def test_defaults_match_schematics_conversion():
+    for model_class in (props.SlotProperty, props.IntentSlotPropertyBase, props.IntentProperty,
+                        props.BotProperty, props.MessageProperty, props.FollowUpPromptProperty):
+        assert model_class().to_primitive() == slow_primitive(model_class({}))
+
+
+def test_defaults_are_copied_per_instance():
+    first, second = props.IntentProperty(), props.IntentProperty()
+    first.fulfillmentActivity.codeHook.uri = 'arn'
+    first.add_slot(props.AmazonSlotProperty('AMAZON.NUMBER', name='Count'))
+    assert second.fulfillmentActivity.codeHook.uri is None
+    assert second.slots == []
+
+
+def test_slot_type_is_built_once_per_slot():
+    slot = bot.FlowerTypeIntentSlot()
+    assert slot.get_slot_type() is slot.get_slot_type()
+    assert slot.slotType == 'FlowerTypes'
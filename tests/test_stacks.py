@@ -0,0 +1,92 @@
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from pylexbuilder import stacks, utils
+
+TEMPLATE = {'Resources': {'Topic': {'Type': 'AWS::SNS::Topic'}}}
+
+
+class FakeCloudFormation(object):
+    def __init__(self, template=None):
+        self.template = template
+        self.calls = []
+
+    def describe_stacks(self, StackName):
+        self.calls.append('describe_stacks')
+        if self.template is None:
+            raise ClientError({'Error': {'Code': 'ValidationError',
+                                         'Message': 'Stack with id {} does not exist'.format(StackName)}},
+                              'DescribeStacks')
+        return {'Stacks': [{'StackName': StackName, 'StackStatus': 'CREATE_COMPLETE'}]}
+
+    def get_template(self, StackName, TemplateStage):
+        self.calls.append('get_template')
+        return {'TemplateBody': self.template}
+
+    def create_change_set(self, ChangeSetType, TemplateBody, **kwargs):
+        self.calls.append(('create_change_set', ChangeSetType))
+        self.template = json.loads(TemplateBody)
+
+    def describe_change_set(self, ChangeSetName, StackName):
+        return {'Status': 'CREATE_COMPLETE', 'Changes': []}
+
+    def execute_change_set(self, ChangeSetName, StackName):
+        self.calls.append('execute_change_set')
+
+
+def test_deploy_stack_creates_missing_stack(monkeypatch):
+    cloudformation = FakeCloudFormation()
+    monkeypatch.setattr(utils, 'cloudformation', cloudformation)
+    monkeypatch.setattr(stacks.waiters.time, 'sleep', lambda seconds: None)
+    assert stacks.deploy_stack('Stack', json.dumps(TEMPLATE))['StackStatus'] == 'CREATE_COMPLETE'
+    assert ('create_change_set', 'CREATE') in cloudformation.calls
+    assert 'execute_change_set' in cloudformation.calls
+
+
+def test_deploy_stack_skips_unchanged_template(monkeypatch):
+    cloudformation = FakeCloudFormation(template=TEMPLATE)
+    monkeypatch.setattr(utils, 'cloudformation', cloudformation)
+    assert stacks.deploy_stack('Stack', json.dumps(TEMPLATE, indent=4)) is None
+    assert cloudformation.calls == ['describe_stacks', 'get_template']
+
+
+def test_deploy_stack_fails_when_ongoing_creation_rolls_back(monkeypatch):
+    class RollingBackCloudFormation(FakeCloudFormation):
+        statuses = ['CREATE_IN_PROGRESS', 'CREATE_IN_PROGRESS', 'ROLLBACK_COMPLETE']
+
+        def describe_stacks(self, StackName):
+            self.calls.append('describe_stacks')
+            status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+            return {'Stacks': [{'StackName': StackName, 'StackStatus': status}]}
+
+    cloudformation = RollingBackCloudFormation(template=TEMPLATE)
+    monkeypatch.setattr(utils, 'cloudformation', cloudformation)
+    monkeypatch.setattr(stacks.waiters.time, 'sleep', lambda seconds: None)
+    with pytest.raises(stacks.StackDeployError):
+        stacks.deploy_stack('Stack', json.dumps(TEMPLATE))
+    assert not any(isinstance(call, tuple) for call in cloudformation.calls)
+
+
+def test_stack_index_caches_lookups(monkeypatch):
+    cloudformation = FakeCloudFormation(template=TEMPLATE)
+    monkeypatch.setattr(utils, 'cloudformation', cloudformation)
+    index = stacks.StackIndex()
+    assert index.exists('Stack')
+    assert index.get_status('Stack') == 'CREATE_COMPLETE'
+    assert cloudformation.calls == ['describe_stacks']
+    index.invalidate('Stack')
+    assert index.exists('Stack')
+    assert cloudformation.calls == ['describe_stacks', 'describe_stacks']
+
+
+def test_list_stacks_follows_next_token(monkeypatch):
+    class Listing(object):
+        def list_stacks(self, StackStatusFilter, NextToken=None):
+            if NextToken is None:
+                return {'StackSummaries': [{'StackName': 'A'}], 'NextToken': 'next'}
+            return {'StackSummaries': [{'StackName': 'B'}]}
+
+    monkeypatch.setattr(utils, 'cloudformation', Listing())
+    assert utils.get_stacks_by() == ['A', 'B']
@@ -0,0 +1,82 @@
+import os
+
+from order_flower_bot import bot
+from pylexbuilder import props
+from pylexbuilder.fake import FakeBackend
+from pylexbuilder.remote import RemoteState
+from pylexbuilder.state import DeployState, content_hash
+
+
+class FailingLexModel(object):
+    def __getattr__(self, item):
+        raise AssertionError("Unexpected lex-models call: {}".format(item))
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({'a': 1, 'b': [1, 2]}) == content_hash({'b': [1, 2], 'a': 1})
+    assert content_hash({'a': 1}) != content_hash({'a': 2})
+
+
+def test_state_round_trip(tmpdir):
+    path = str(tmpdir.join('state', 'bot.json'))
+    state = DeployState.load(path)
+    state.record('intent', 'OrderFlowers', 'abc', 'checksum', '4')
+    state.save()
+    loaded = DeployState.load(path)
+    assert loaded.get_unchanged('intent', 'OrderFlowers', 'abc')['version'] == '4'
+    assert loaded.get_unchanged('intent', 'OrderFlowers', 'def') is None
+
+
+def test_unchanged_slot_type_skips_lex(monkeypatch):
+    slot = props.SlotProperty()
+    slot.name = 'YesNo'
+    slot.add_enumeration('Yes')
+    state = DeployState()
+    state.record('slot_type', 'YesNo', slot.get_content_hash(), 'checksum', '2')
+    monkeypatch.setattr(props, 'lex_model', FailingLexModel())
+    slot.create(state=state)
+    assert slot.version == '2'
+    assert slot.checksum == 'checksum'
+
+
+def test_record_only_trusted_when_lex_has_it(backend):
+    state = DeployState()
+    state.record('intent', 'OrderFlowers', 'abc', 'checksum', '1')
+    remote = RemoteState(backend.get_client('lex-models'))
+    assert state.get_unchanged('intent', 'OrderFlowers', 'abc', remote) is None
+    remote.resources['intent']['OrderFlowers'] = {'name': 'OrderFlowers'}
+    assert state.get_unchanged('intent', 'OrderFlowers', 'abc', remote)['version'] == '1'
+
+    state.record('bot', 'OrderFlowers', 'def', 'checksum', '2')
+    remote.resources['bot']['OrderFlowers'] = {'name': 'OrderFlowers'}
+    remote.bot_aliases['OrderFlowers'] = {'prod': {'name': 'prod', 'botVersion': '1'}}
+    assert state.get_unchanged('bot', 'OrderFlowers', 'def', remote) is None
+    remote.bot_aliases['OrderFlowers']['prod']['botVersion'] = '2'
+    assert state.get_unchanged('bot', 'OrderFlowers', 'def', remote)['version'] == '2'
+
+
+def test_state_path_is_per_account_and_region(backend):
+    other = FakeBackend(account='210987654321', region='eu-west-1')
+    assert bot.OrderFlowersBot().deploy_state_path == os.path.join(
+        '.pylexbuilder', backend.account, backend.region, 'OrderFlowers.json')
+    other.install()
+    try:
+        assert bot.OrderFlowersBot().deploy_state_path == os.path.join(
+            '.pylexbuilder', '210987654321', 'eu-west-1', 'OrderFlowers.json')
+    finally:
+        other.uninstall()
+
+
+def test_deploy_elsewhere_ignores_the_state(backend, make_bot):
+    make_bot().create()
+    # Same state file, a Lex that has never seen the bot
+    other = FakeBackend(account='210987654321', region='eu-west-1').install()
+    try:
+        deployed = make_bot()
+        deployed.create()
+        assert other.count('lex-models', 'put_slot_type') == 1
+        assert other.count('lex-models', 'put_intent') == 1
+        assert other.count('lex-models', 'put_bot') == 1
+        assert deployed.version == '1'
+    finally:
+        other.uninstall()
@@ -0,0 +1,45 @@
+from botocore.exceptions import ClientError
+
+from pylexbuilder import transfer, utils
+
+
+class FakeS3(object):
+    def __init__(self, keys=()):
+        self.keys = set(keys)
+        self.uploads = []
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.keys:
+            raise ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+        return {}
+
+    def upload_file(self, path, bucket, key, Config=None, Callback=None):
+        self.uploads.append((bucket, key, Config.multipart_chunksize))
+        Callback(3)
+        Callback(2)
+        self.keys.add((bucket, key))
+
+
+def test_upload_file_reports_progress(tmpdir):
+    path = tmpdir.join('package.zip')
+    path.write('12345')
+    progress = []
+    client = FakeS3()
+    config = transfer.get_transfer_config(multipart_chunksize=5 * transfer.MB)
+    transfer.upload_file(client, str(path), 'bucket', 'key', config,
+                         lambda path, sent, total: progress.append((sent, total)))
+    assert progress == [(3, 5), (5, 5)]
+    assert client.uploads == [('bucket', 'key', 5 * transfer.MB)]
+    assert transfer.object_exists(client, 'bucket', 'key')
+    assert not transfer.object_exists(client, 'bucket', 'other')
+
+
+def test_zip_and_upload_file_to_skips_existing_key(tmpdir, monkeypatch):
+    path = tmpdir.join('template.json')
+    path.write('{}')
+    client = FakeS3()
+    monkeypatch.setattr(utils, 's3', client)
+    first = utils.zip_and_upload_file_to('bucket', str(path))
+    second = utils.zip_and_upload_file_to('bucket', str(path))
+    assert first == second
+    assert len(client.uploads) == 1
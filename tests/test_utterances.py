@@ -0,0 +1,42 @@
+import itertools
+
+from pylexbuilder import props, utterances
+
+
+def test_template_keeps_slots_and_expands_alternatives():
+    template = utterances.Template("I'd like {to order|to buy|} {@flowers} {FlowerType}",
+                                   synonyms={'flowers': ['flowers', 'a bouquet']})
+    assert template.count == 6
+    expanded = list(template)
+    assert expanded[0] == "I'd like to order flowers {FlowerType}"
+    assert "I'd like a bouquet {FlowerType}" in expanded
+    assert [template.get(i) for i in range(template.count)] == expanded
+
+
+def test_generate_is_lazy_deduplicated_and_capped():
+    huge = '{a|b|c|d|e|f|g|h|i|j} ' * 30
+    generated = utterances.generate(['order {FlowerType}', 'order  {FlowerType}', huge], limit=5)
+    assert list(generated) == ['order {FlowerType}', 'a a a a a a a a a a a a a a a a a a a a a a a a a a a a a a',
+                               'a a a a a a a a a a a a a a a a a a a a a a a a a a a a a b',
+                               'a a a a a a a a a a a a a a a a a a a a a a a a a a a a a c',
+                               'a a a a a a a a a a a a a a a a a a a a a a a a a a a a a d']
+
+
+def test_sampling_is_reproducible():
+    templates = ['{a|b|c|d|e|f|g|h|i|j} ' * 30]
+    first = list(utterances.generate(templates, sample_size=50, seed=1))
+    assert len(first) == 50
+    assert first == list(utterances.generate(templates, sample_size=50, seed=1))
+
+
+def test_bulk_assign_to_intent():
+    intent = props.IntentProperty()
+    intent.add_utterance('order flowers')
+    intent.generate_utterances(['order {flowers|roses}', '{buy|get} {FlowerType}'], limit=3)
+    # The limit counts added utterances, 'order flowers' was already there
+    assert intent.sampleUtterances == ['order flowers', 'order roses', 'buy {FlowerType}', 'get {FlowerType}']
+    assert list(utterances.generate(['{Order|order} flowers', 'buy flowers'], key=str.lower, limit=1,
+                                    exclude=['order flowers'])) == ['buy flowers']
+    slot = props.AmazonSlotProperty('AMAZON.NUMBER', name='Count')
+    slot.add_utterance('{Count}').add_utterances(itertools.repeat('{Count}', 3))
+    assert slot.sampleUtterances == ['{Count}']
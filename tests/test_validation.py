@@ -0,0 +1,63 @@
+import pytest
+from schematics.exceptions import DataError
+
+from order_flower_bot import bot
+from pylexbuilder import props
+from pylexbuilder.validation import ValidationError, validate_bot
+
+
+class BrokenIntent(bot.OrderFlowersIntent):
+    def initialize(self):
+        super(BrokenIntent, self).initialize()
+        self.add_slot(bot.FlowerTypeIntentSlot())
+        self.add_utterance('Deliver {PickupDate}')
+        self.add_utterance('i would like to order {FlowerType}')
+        self.add_utterance('x' * 201)
+        self.conclusionStatement = props.StatmentProperty()
+        self.conclusionStatement.add_message('Done', content_type='HTML')
+
+
+def test_valid_bot_has_no_problems():
+    assert validate_bot(bot.OrderFlowersBot()) == []
+
+
+def test_every_problem_is_reported(make_bot):
+    problems = [str(problem) for problem in validate_bot(make_bot(intents=[BrokenIntent()]))]
+    path = 'bot OrderFlowers > intent OrderFlowers'
+    assert '{}: slot FlowerType is defined more than once'.format(path) in problems
+    assert "{}: utterance 'Deliver {{PickupDate}}' references the undefined slot {{PickupDate}}".format(
+        path) in problems
+    assert "{}: utterance 'i would like to order {{FlowerType}}' is duplicated".format(path) in problems
+    assert "{}: utterance '{}' is longer than 200 characters".format(path, 'x' * 201) in problems
+    assert ("{} conclusionStatement: message 1 has the invalid contentType 'HTML', "
+            "expected one of PlainText, SSML, CustomPayload".format(path)) in problems
+    assert len(problems) == 5
+
+
+def test_limits_and_duplicate_intents(make_bot):
+    duplicated = make_bot(intents=[bot.OrderFlowersIntent(), bot.OrderFlowersIntent()])
+    problems = [str(problem) for problem in validate_bot(duplicated, limits={'utterances_per_intent': 1})]
+    assert problems == ['bot OrderFlowers > intent OrderFlowers: has 2 sample utterances, more than 1',
+                        'bot OrderFlowers: intent OrderFlowers is defined more than once']
+
+
+def test_content_type_validator():
+    with pytest.raises(DataError):
+        props.MessageProperty({'content': 'Hi', 'contentType': 'HTML'}).validate()
+    props.MessageProperty({'content': 'Hi', 'contentType': 'SSML'}).validate()
+
+
+def test_bot_keeps_schematics_validation():
+    flowers = bot.OrderFlowersBot()
+    assert flowers.check() == []
+    assert flowers.serialize()['name'] == 'OrderFlowers'
+    flowers.validate()
+    flowers.abortStatement.add_message('Sorry', content_type='HTML')
+    with pytest.raises(DataError):
+        flowers.validate()
+
+
+def test_invalid_bot_fails_before_any_call(backend, make_bot):
+    with pytest.raises(ValidationError):
+        make_bot(intents=[BrokenIntent()]).create()
+    assert backend.count() == 0
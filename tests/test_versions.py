@@ -0,0 +1,116 @@
+from datetime import datetime
+
+import pytest
+
+from order_flower_bot import bot
+from pylexbuilder.versions import VersionCollector, list_versions, matches, select_retained
+
+
+def flowers_bot(make_bot, description, keep_versions=None):
+    """
+    OrderFlowersBot whose intent has description, without deploy state so every deploy asks Lex
+    """
+    intent = bot.OrderFlowersIntent()
+    intent.description = description
+    return make_bot(intents=[intent], deploy_state=False, keep_versions=keep_versions)
+
+
+def test_select_retained_keeps_newest_and_referenced():
+    assert select_retained(['1', '2', '3', '4', '5'], 2, {'1'}) == (['1', '4', '5'], ['2', '3'])
+    assert select_retained(['1'], 3) == (['1'], [])
+
+
+def test_matches_ignores_what_lex_adds():
+    definition = bot.OrderFlowersIntent().to_primitive()
+    slot = definition['slots'][0]
+    # GetIntent response of the definition: metadata, and defaults on the slots
+    response = dict(definition, version='3', checksum='c3', createdDate=datetime(2018, 1, 1),
+                    lastUpdatedDate=datetime(2018, 1, 2), ResponseMetadata={'HTTPStatusCode': 200},
+                    slots=[dict(slot, priority=1, obfuscationSetting='NONE')])
+    assert matches('intent', response, definition)
+    obfuscated = dict(slot, priority=1, obfuscationSetting='DEFAULT_OBFUSCATION')
+    assert not matches('intent', dict(response, slots=[obfuscated]), definition)
+    # A field removed from the definition is a change
+    assert not matches('intent', response, dict(definition, description=None))
+    without_description = dict(definition)
+    del without_description['description']
+    assert not matches('intent', response, without_description)
+
+    slot_type = {'name': 'FlowerTypes', 'enumerationValues': [{'value': 'roses'}]}
+    response = {'name': 'FlowerTypes', 'enumerationValues': [{'value': 'roses', 'synonyms': []}],
+                'valueSelectionStrategy': 'ORIGINAL_VALUE', 'version': '$LATEST', 'checksum': 'c'}
+    assert matches('slot_type', response, slot_type)
+    assert not matches('slot_type', dict(response, valueSelectionStrategy='TOP_RESOLUTION'), slot_type)
+
+
+def test_unchanged_resources_reuse_their_newest_version(backend, make_bot):
+    flowers_bot(make_bot, 'Order flowers').create()
+    before = {operation: backend.count('lex-models', operation)
+              for operation in ('put_slot_type', 'put_intent', 'put_bot', 'create_bot_version')}
+
+    redeployed = flowers_bot(make_bot, 'Order flowers')
+    redeployed.create()
+    for operation, count in before.items():
+        assert backend.count('lex-models', operation) == count
+    assert redeployed.version == '1'
+    assert redeployed.IntentMeta.intents[0].version == '1'
+
+    changed = flowers_bot(make_bot, 'Order flowers, changed')
+    changed.create()
+    assert changed.IntentMeta.intents[0].version == '2'
+    assert changed.version == '2'
+    # The slot type didn't change
+    assert backend.count('lex-models', 'put_slot_type') == before['put_slot_type']
+
+
+def test_old_versions_are_collected(backend, make_bot):
+    for i in range(4):
+        flowers_bot(make_bot, 'Order flowers {}'.format(i)).create()
+    lex = backend.get_client('lex-models')
+    # An alias keeps an old bot version, and the intent version it uses
+    lex.put_bot_alias(name='old', botName='OrderFlowers', botVersion='1')
+    assert list_versions(lex, 'intent', 'OrderFlowers') == ['1', '2', '3', '4']
+
+    report = flowers_bot(make_bot, 'Order flowers 4', keep_versions=2).collect_versions(max_workers=4)
+
+    assert report.failures == []
+    assert sorted(result.name for result in report.results) == ['OrderFlowers:2', 'OrderFlowers:2']
+    assert list_versions(lex, 'bot', 'OrderFlowers') == ['1', '3', '4']
+    assert list_versions(lex, 'intent', 'OrderFlowers') == ['1', '3', '4']
+    assert list_versions(lex, 'slot_type', 'FlowerTypes') == ['1']
+
+
+def test_versions_in_use_are_retained(backend, make_bot):
+    flowers_bot(make_bot, 'first').create()
+    flowers_bot(make_bot, 'second').create()
+    lex = backend.get_client('lex-models')
+    lex.put_bot_alias(name='old', botName='OrderFlowers', botVersion='1')
+
+    collector = VersionCollector(lex, keep=1)
+    # Lex refuses to delete a version an alias uses
+    assert collector.delete_version('bot', 'OrderFlowers', '1') is None
+    assert list_versions(lex, 'bot', 'OrderFlowers') == ['1', '2']
+    with pytest.raises(ValueError):
+        VersionCollector(lex, keep=0)
+
+
+def test_versions_other_bots_use_are_retained(backend, make_bot):
+    flowers_bot(make_bot, 'first').create()
+    flowers_bot(make_bot, 'second').create()
+    lex = backend.get_client('lex-models')
+    lex.put_bot(name='OrderMoreFlowers', intents=[{'intentName': 'OrderFlowers', 'intentVersion': '1'}],
+                locale='en-US', childDirected=False)
+
+    report = flowers_bot(make_bot, 'second', keep_versions=1).collect_versions()
+
+    assert report.failures == []
+    assert [(result.kind, result.name) for result in report.results] == [('bot_version', 'OrderFlowers:1')]
+    assert list_versions(lex, 'intent', 'OrderFlowers') == ['1', '2']
+
+
+def test_deploy_collects_versions_when_configured(backend, make_bot):
+    for i in range(3):
+        flowers_bot(make_bot, 'Order flowers {}'.format(i), keep_versions=1).create()
+    lex = backend.get_client('lex-models')
+    assert list_versions(lex, 'bot', 'OrderFlowers') == ['3']
+    assert list_versions(lex, 'intent', 'OrderFlowers') == ['3']
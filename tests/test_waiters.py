@@ -0,0 +1,48 @@
+import pytest
+
+from pylexbuilder import waiters
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def statuses(*values):
+    values = list(values)
+    return lambda: {'status': values.pop(0) if len(values) > 1 else values[0]}
+
+
+def building(response):
+    return response['status'] == 'BUILDING'
+
+
+def test_wait_backs_off_and_reports_changes():
+    clock = FakeClock()
+    changes = []
+    poller = waiters.Poller('bot', 'A', statuses('BUILDING', 'BUILDING', 'BUILDING', 'READY'), building,
+                            on_change=lambda p, old, new, response: changes.append((old, new)),
+                            delay=1, jitter=0)
+    assert waiters.wait(poller, sleep=clock.sleep, clock=clock)['status'] == 'READY'
+    assert clock.sleeps == [1, 2, 4, 8]
+    assert changes == [(None, 'BUILDING'), ('BUILDING', 'READY')]
+
+
+def test_wait_all_polls_from_one_loop_and_collects_errors():
+    clock = FakeClock()
+    pollers = [
+        waiters.Poller('bot', 'fast', statuses('READY'), building, delay=1, jitter=0),
+        waiters.Poller('bot', 'slow', statuses('BUILDING'), building, delay=1, jitter=0, timeout=10),
+    ]
+    report = waiters.wait_all(pollers, sleep=clock.sleep, clock=clock)
+    assert report.get('bot', 'fast').ok
+    assert isinstance(report.get('bot', 'slow').error, waiters.WaitTimeout)
+    assert clock.now == pytest.approx(10)